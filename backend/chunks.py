@@ -0,0 +1,126 @@
+import os
+import gzip
+import hashlib
+import json
+from typing import Dict, Any, Optional
+
+from elasticsearch import NotFoundError
+from fastapi import Request, Response
+
+from indexing.create_index import get_async_es, INDEX_NAME
+from utils.chunk_html import chunk_to_html
+
+try:
+    import brotli  # optional: br is only offered when installed
+except ImportError:
+    brotli = None
+
+# =========================
+# Config
+# =========================
+
+CHUNK_CACHE_MAX_AGE = int(os.getenv("CHUNK_CACHE_MAX_AGE", "3600"))  # seconds, revalidated via ETag after
+CHUNK_COMPRESS_MIN_BYTES = 512  # smaller bodies are not worth compressing
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+CHUNK_FIELDS = ["chunk_text", "title", "doc_id", "chunk_index", "page_start", "page_end", "text_hash"]
+
+MEDIA_TYPES = {
+    "html": "text/html; charset=utf-8",
+    "text": "text/plain; charset=utf-8",
+    "json": "application/json",
+}
+
+# =========================
+# Fetch
+# =========================
+
+async def fetch_chunk(chunk_id: str, index: str = INDEX_NAME) -> Optional[Dict[str, Any]]:
+    try:
+        res = await get_async_es().get(index=index, id=chunk_id, source_includes=CHUNK_FIELDS)
+    except NotFoundError:
+        return None
+    return res["_source"]
+
+# =========================
+# Encoding
+# =========================
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best content-coding we can produce for an Accept-Encoding header (br > gzip)."""
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", offered.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+# =========================
+# Response
+# =========================
+
+def render_chunk(src: Dict[str, Any], fmt: str) -> bytes:
+    text = src.get("chunk_text", "")
+    if fmt == "text":
+        return text.encode("utf-8")
+    if fmt == "json":
+        return json.dumps(src, ensure_ascii=False).encode("utf-8")
+    return chunk_to_html(text).encode("utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def chunk_response(request: Request, src: Dict[str, Any], fmt: str = "html") -> Response:
+    """
+    Chunk body with an ETag hashed from the body itself (304 on
+    If-None-Match), a Cache-Control max-age, and br/gzip compression
+    when accepted.
+    Chunk ids can be reused by a reindex, so responses are revalidated
+    rather than cached forever.
+    """
+    body = render_chunk(src, fmt)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if len(body) < CHUNK_COMPRESS_MIN_BYTES:
+        encoding = None
+
+    # the rendered body covers every field the format serves (json: all of
+    # CHUNK_FIELDS, e.g. a retitled document) and the html template;
+    # one ETag per representation (format + content-coding)
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}-{fmt}-{encoding or "identity"}"'
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CHUNK_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=compress(body, encoding), media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,62 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Dict, Any, Optional
+
+from indexing.create_index import get_index_meta, async_get_index_meta, INDEX_NAME
+
+# How long index _meta read from ES is trusted before asking again
+INDEX_META_CHECK_INTERVAL = float(
+    os.getenv("INDEX_META_CHECK_INTERVAL", os.getenv("GENERATION_CHECK_INTERVAL", "2"))
+)
+
+
+class IndexMetaTracker:
+    """
+    Caches the live index `_meta` (generation, pca_file) for a short
+    interval so per-request lookups stay cheap. After an alias swap or a
+    reindex, workers pick up the new values within `interval` seconds.
+    """
+
+    def __init__(self, index: str = INDEX_NAME, interval: float = INDEX_META_CHECK_INTERVAL):
+        self.index = index
+        self.interval = interval
+        self._meta: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._async_lock = asyncio.Lock()
+        self._sync_lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        return self._meta is not None and time.monotonic() - self._checked_at < self.interval
+
+    def _store(self, meta: Dict[str, Any]):
+        self._meta = meta
+        self._checked_at = time.monotonic()
+
+    async def current(self) -> Dict[str, Any]:
+        if self._fresh():
+            return self._meta
+
+        async with self._async_lock:
+            # another request may have refreshed it while we waited
+            if not self._fresh():
+                self._store(await async_get_index_meta(self.index))
+
+        return self._meta
+
+    def current_sync(self) -> Dict[str, Any]:
+        if self._fresh():
+            return self._meta
+
+        with self._sync_lock:
+            if not self._fresh():
+                self._store(get_index_meta(self.index))
+
+        return self._meta
+
+    async def generation(self) -> str:
+        return str((await self.current()).get("generation", "0"))
+
+
+index_meta = IndexMetaTracker()
@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+# =========================
+# Config
+# =========================
+
+SEARCH_BUDGET_MS = int(os.getenv("SEARCH_BUDGET_MS", "0"))  # default per-request budget, 0 -> none
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "30"))  # seconds, upper bound for any single ES call
+FETCH_MIN_TIMEOUT = 0.1  # seconds the final source fetch always gets
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))  # consecutive failures before a leg is skipped
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))  # open time before one probe request
+# Deadline misses under tighter budgets say more about the caller than the leg
+BREAKER_MIN_BUDGET_MS = int(os.getenv("BREAKER_MIN_BUDGET_MS", "100"))
+
+
+# =========================
+# Deadline
+# =========================
+
+class Deadline:
+    """One budget shared by every stage of a request; budget_ms=None or 0 never expires."""
+
+    def __init__(self, budget_ms: Optional[int] = None):
+        self.budget_ms = budget_ms or None
+        self.expires_at = time.monotonic() + budget_ms / 1000 if budget_ms else None
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def request_timeout(self, floor: float = 0.001) -> float:
+        # ES stops waiting when the request's budget does
+        remaining = self.remaining()
+        if remaining is None:
+            return ES_REQUEST_TIMEOUT
+        return min(max(remaining, floor), ES_REQUEST_TIMEOUT)
+
+    def counts_for_breaker(self) -> bool:
+        return self.budget_ms is None or self.budget_ms >= BREAKER_MIN_BUDGET_MS
+
+
+# =========================
+# Circuit Breaker
+# =========================
+
+class CircuitBreaker:
+    """
+    closed -> open after `failures` consecutive failures; while open the
+    leg is skipped outright. After `reset_seconds` one request is let
+    through (half-open): success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._counts = {"success": 0, "failure": 0, "skipped": 0, "opened": 0}
+
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+
+            self._counts["skipped"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._counts["success"] += 1
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self, reason: str = ""):
+        with self._lock:
+            self._counts["failure"] += 1
+            self._consecutive += 1
+
+            if self._probing or self._consecutive >= self.failures:
+                if self._opened_at is None or self._probing:
+                    self._counts["opened"] += 1
+                    print(f"[BREAKER] {self.name} open for {self.reset_seconds:.0f}s after {self._consecutive} failures: {reason}")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        # a probe that ended without a verdict (e.g. request cancelled)
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state(), "consecutive_failures": self._consecutive, **self._counts}
+
+
+# One per retrieval leg ("knn" covers embedding the query and the kNN
+# search), plus the phase-two source fetch (mget)
+breakers = {
+    "bm25": CircuitBreaker("bm25"),
+    "knn": CircuitBreaker("knn"),
+    "fetch": CircuitBreaker("fetch"),
+}
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.stats() for name, breaker in breakers.items()}
@@ -1,26 +1,108 @@
-from fastapi import FastAPI, Query, Request
+from fastapi import FastAPI, Query, Request, Response, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+import asyncio
+import json
 import time
+from contextlib import asynccontextmanager
 from typing import Optional, List
-from backend.search import hybrid_document_search_rrf
+from backend.search import (
+    cached_hybrid_document_search_rrf, async_batch_search, async_query_vectors_for, contributing_legs, SearchUnavailable,
+    NUM_CANDIDATES, BATCH_MAX_QUERIES
+)
+from backend.latency_budget import breaker_stats, BREAKER_RESET_SECONDS
+from backend.metrics import (
+    start_request, log_request, record_search, metrics_payload, HTTP_REQUEST_SECONDS, SERVER_TIMING
+)
+from backend.result_cache import result_cache
+from backend.chunks import fetch_chunk, chunk_response
+from indexing.create_index import get_async_es, close_async_es
+from indexing.embeddings import embedding_cache_stats, embedding_scheduler_stats, warmup
+
+
+class BatchQuery(BaseModel):
+    query: str
+    top_n: int = Field(10, ge=1, description="Number of results to return")
+    document_type: Optional[str] = Field(None, description="Filter by document type")
+    num_candidates: int = Field(NUM_CANDIDATES, ge=1, le=10000, description="kNN candidates per shard")
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery]
+
+
+# Flipped once the model is loaded and warmed up (see /ready)
+warm_state = {"ready": False, "warmup_ms": None, "error": None}
+
+
+async def warm_up_worker():
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(warmup)
+        get_async_es()
+    except Exception as e:
+        warm_state["error"] = str(e)
+        print(f"[WARMUP] failed: {e}")
+        return
+
+    warm_state["warmup_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    warm_state["ready"] = True
+    print(f"[WARMUP] model ready in {warm_state['warmup_ms']} ms")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: the process answers `/` right away,
+    # `/ready` only turns 200 once the model has served dummy queries
+    warmup_task = asyncio.create_task(warm_up_worker())
+    yield
+    warmup_task.cancel()
+    await result_cache.close()
+    await close_async_es()
 
 
 app = FastAPI(
     title="Document Search API",
     description="BM25 + Vector Hybrid Search  + RRF Fusion",
+    lifespan=lifespan,
 )
 
 
+def route_path(request: Request) -> str:
+    # route template, not the raw path, so /chunks/<id> is one series
+    return getattr(request.scope.get("route"), "path", "unmatched")
+
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    start_time = time.perf_counter()
-    response = await call_next(request)
-    process_time = (time.perf_counter() - start_time) * 1000  # ms
+    # stages timed anywhere below (search.py) are collected here
+    timings = start_request()
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        log_request(route_path(request), 500, timings.elapsed_ms(), timings, error=repr(e))
+        raise
+    process_time = timings.elapsed_ms()
 
-    response.headers["X-Process-Time-ms"] = f"{process_time:.2f}"
-    print(f"[API LATENCY] {request.url.path} = {process_time:.2f} ms")
+    # Set by /search: hit / miss / off
+    cache_status = getattr(request.state, "cache_status", None)
 
-    return response
+    if cache_status:
+        response.headers["X-Process-Time-ms"] = f"{process_time:.2f}; cache={cache_status}"
+        response.headers["X-Cache"] = cache_status.upper()
+    else:
+        response.headers["X-Process-Time-ms"] = f"{process_time:.2f}"
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = timings.server_timing()
 
+    path = route_path(request)
+    HTTP_REQUEST_SECONDS.labels(path, str(response.status_code)).observe(process_time / 1000)
+    log_request(
+        path, response.status_code, process_time, timings,
+        cache=cache_status, legs=getattr(request.state, "search_legs", None)
+    )
+
+    return response
 
 
 @app.get("/")
@@ -28,24 +110,118 @@ def health_check():
     return {"status": "ok", "service": "ecommerce-search"}
 
 
+@app.get("/ready")
+def readiness_check():
+    # For the load balancer: only route to workers with a warm model
+    status_code = 200 if warm_state["ready"] else 503
+    return JSONResponse(status_code=status_code, content=warm_state)
+
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus scrape endpoint
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "embedding_cache": embedding_cache_stats(),
+        "result_cache": result_cache.stats(),
+        "embedding_scheduler": embedding_scheduler_stats(),
+        "search_breakers": breaker_stats(),
+    }
+
+
 @app.get("/search")
-def search_products(
+async def search_products(
+    request: Request,
+    response: Response,
     query: str = Query(..., description="User search query"),
     top_n: int = Query(10, description="Number of results to return"),
-    document_type: Optional[str] = Query(None, description="Filter by document type")
+    document_type: Optional[str] = Query(None, description="Filter by document type"),
+    num_candidates: int = Query(NUM_CANDIDATES, ge=1, le=10000, description="kNN candidates per shard (recall vs latency)"),
+    budget_ms: Optional[int] = Query(None, ge=1, le=30000, description="Latency budget; legs still running after it are dropped")
 ):
     """
     Hybrid search endpoint:
     - query: user query text
     - top_n: number of results to return
     - ducument_type: optional document type filter
+    - num_candidates: kNN candidates per shard
+    - budget_ms: deadline shared by embedding, BM25 and kNN
+
+    X-Search-Legs lists the legs (bm25, knn) the results were fused from;
+    when one was dropped, X-Search-Degraded says why (timeout / error / open).
     """
 
-    # Call your hybrid search
-    res = hybrid_document_search_rrf(
-        query=query,
-        top_n=top_n,
-        document_type=document_type
-    )
+    # Call your hybrid search (BM25 + embed/kNN run concurrently)
+    # Cache hits skip Elasticsearch and the model entirely
+    try:
+        res, cache_status, legs = await cached_hybrid_document_search_rrf(
+            query=query,
+            top_n=top_n,
+            document_type=document_type,
+            num_candidates=num_candidates,
+            budget_ms=budget_ms
+        )
+    except SearchUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(BREAKER_RESET_SECONDS))})
+    request.state.cache_status = cache_status
+    request.state.search_legs = legs
+    record_search(cache_status, len(contributing_legs(legs)) < len(legs))
+
+    response.headers["X-Search-Legs"] = ",".join(contributing_legs(legs))
+    dropped = {name: status for name, status in legs.items() if status != "ok"}
+    if dropped:
+        response.headers["X-Search-Degraded"] = ",".join(f"{name}={status}" for name, status in dropped.items())
 
     return res
+
+
+@app.get("/chunks/{chunk_id}")
+async def get_chunk(
+    request: Request,
+    chunk_id: str,
+    format: str = Query("html", pattern="^(html|text|json)$", description="html page, plain text or json")
+):
+    """
+    Full text of one chunk, served from Elasticsearch (what chunk_url
+    points to when the indexer runs with CHUNK_URLS=local).
+    Compressed (br/gzip), with ETag + Cache-Control.
+    """
+    src = await fetch_chunk(chunk_id)
+    if src is None:
+        raise HTTPException(status_code=404, detail=f"Unknown chunk '{chunk_id}'")
+
+    return chunk_response(request, src, format)
+
+
+@app.post("/search/batch")
+async def batch_search(body: BatchSearchRequest):
+    """
+    Many queries in one request, same options per query as /search.
+    Streams NDJSON, one line per query as soon as its group is done:
+    {"index": <position in queries>, "query": ..., "results": [...]}
+    or {"index", "query", "error"} if that query failed.
+    """
+    if not body.queries:
+        raise HTTPException(status_code=422, detail="queries must not be empty")
+    if len(body.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+
+    queries = [query.model_dump() for query in body.queries]
+
+    # embed before the stream starts: once it has, the status is already 200
+    try:
+        vectors = await async_query_vectors_for([query["query"] for query in queries])
+    except Exception as e:
+        print(f"[SEARCH] batch query embedding failed: {e!r}")
+        raise HTTPException(status_code=503, detail=f"query embedding failed: {e!r}", headers={"Retry-After": str(int(BREAKER_RESET_SECONDS))})
+
+    async def lines():
+        async for line in async_batch_search(queries, vectors):
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,200 @@
+"""
+Per-stage search timings, exported three ways:
+
+    /metrics       -> Prometheus histograms (all requests, every worker process)
+    Server-Timing  -> the stages of this one request, for browser devtools / clients
+    access log     -> one JSON line per request, sampled, written off the request path
+
+Stages are timed with `with timed("bm25"):` anywhere under a request;
+the durations land in a RequestTimings held in a context variable, so
+search code does not need the request object. Outside a request only
+the histograms are updated.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, List, Tuple
+
+from prometheus_client import Histogram, Counter, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+
+# =========================
+# Config
+# =========================
+
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))  # share of requests logged
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))  # slower requests (and 5xx) are always logged
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HIT_BUCKETS = (0, 1, 5, 10, 20, 30, 40, 50, 100)
+
+
+# =========================
+# Prometheus Metrics
+# =========================
+
+SEARCH_STAGE_SECONDS = Histogram(
+    "search_stage_seconds",
+    "Client-side time per search stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+ES_TOOK_SECONDS = Histogram(
+    "search_es_took_seconds",
+    "Server-side time Elasticsearch reports (`took`) per search request",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+SEARCH_HITS = Histogram(
+    "search_hits",
+    "Hits returned per retrieval leg",
+    ["leg"],
+    buckets=HIT_BUCKETS,
+)
+SEARCH_REQUESTS = Counter(
+    "search_requests",
+    "Search requests by result-cache status and whether a leg was dropped",
+    ["cache", "degraded"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds",
+    "End-to-end request latency",
+    ["path", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    # with several uvicorn workers, each writes to PROMETHEUS_MULTIPROC_DIR
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+# =========================
+# Request Timings
+# =========================
+
+class RequestTimings:
+    """What one request spent per stage, plus ES took and hit counts."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []  # (stage, ms), in completion order
+        self.es_took: Dict[str, float] = {}  # stage -> ms
+        self.hits: Dict[str, int] = {}
+
+    def add(self, stage: str, ms: float):
+        self.stages.append((stage, ms))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def server_timing(self) -> str:
+        entries = [f"{stage};dur={ms:.1f}" for stage, ms in self.stages]
+        entries += [f"es-{stage};dur={ms:.0f};desc=\"es took\"" for stage, ms in self.es_took.items()]
+        entries.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(entries)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stages_ms": {stage: round(ms, 2) for stage, ms in self.stages},
+            "es_took_ms": self.es_took,
+            "hits": self.hits,
+        }
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings()
+    _current.set(timings)
+    return timings
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        SEARCH_STAGE_SECONDS.labels(stage).observe(seconds)
+
+        timings = _current.get()
+        if timings is not None:
+            timings.add(stage, seconds * 1000)
+
+
+def record_es_response(stage: str, res, leg: Optional[str] = None):
+    """ES `took` (server time, ms) for a search response; hit count when it is a retrieval leg."""
+    took = res.get("took")
+    timings = _current.get()
+
+    if took is not None:
+        ES_TOOK_SECONDS.labels(stage).observe(took / 1000)
+        if timings is not None:
+            timings.es_took[stage] = took
+
+    if leg is not None:
+        record_hits(leg, len(res["hits"]["hits"]))
+
+
+def record_hits(leg: str, count: int):
+    SEARCH_HITS.labels(leg).observe(count)
+    timings = _current.get()
+    if timings is not None:
+        timings.hits[leg] = count
+
+
+def record_search(cache_status: str, degraded: bool):
+    SEARCH_REQUESTS.labels(cache_status, str(degraded).lower()).inc()
+
+
+# =========================
+# Access Log
+# =========================
+
+def _build_access_logger() -> logging.Logger:
+    # records go through a queue; a listener thread does the stdout writes
+    records: "queue.Queue" = queue.Queue(-1)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+
+    logger = logging.getLogger("search.access")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    return logger
+
+
+access_logger = _build_access_logger()
+
+
+def log_request(path: str, status: int, duration_ms: float, timings: RequestTimings, **fields):
+    """One JSON line per request: all errors and slow requests, a sample of the rest."""
+    if status < 500 and duration_ms < SLOW_REQUEST_MS and random.random() >= ACCESS_LOG_SAMPLE_RATE:
+        return
+
+    access_logger.info(json.dumps({
+        "ts": round(time.time(), 3),
+        "path": path,
+        "status": status,
+        "duration_ms": round(duration_ms, 2),
+        **fields,
+        **timings.as_dict(),
+    }, default=str))
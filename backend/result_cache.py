@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from backend.index_meta import index_meta
+from indexing.embeddings import normalize_query
+
+# =========================
+# Config
+# =========================
+
+# memory -> per-process LRU, redis -> shared across uvicorn workers, none -> off
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "5000"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "600"))  # seconds
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+# =========================
+# Backends
+# =========================
+
+class ResultCacheBackend:
+    """Minimal async key/value interface the search cache needs."""
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: List[Dict[str, Any]], ttl: int):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InProcessResultBackend(ResultCacheBackend):
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if time.time() > expires_at:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: List[Dict[str, Any]], ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class RedisResultBackend(ResultCacheBackend):
+    """Shared backend so every uvicorn worker sees the same cached results."""
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis  # optional dependency
+
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        raw = await self.client.get(key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: List[Dict[str, Any]], ttl: int):
+        await self.client.set(key, json.dumps(value), ex=ttl)
+
+    async def close(self):
+        await self.client.close()
+
+
+def make_backend(name: str = RESULT_CACHE_BACKEND) -> Optional[ResultCacheBackend]:
+    if name == "none":
+        return None
+    if name == "memory":
+        return InProcessResultBackend()
+    if name == "redis":
+        return RedisResultBackend()
+    raise ValueError(f"Unknown RESULT_CACHE_BACKEND '{name}'")
+
+
+# =========================
+# Search Result Cache
+# =========================
+
+def make_cache_key(generation: str, query: str, top_n: int, document_type: Optional[str], params: Dict[str, Any]) -> str:
+    raw = json.dumps(
+        {
+            "q": normalize_query(query),
+            "top_n": top_n,
+            "document_type": document_type,
+            "params": params,
+        },
+        sort_keys=True
+    )
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return f"search:{generation}:{digest}"
+
+
+class SearchResultCache:
+    def __init__(self, backend: Optional[ResultCacheBackend], ttl: int = RESULT_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def key_for(self, query: str, top_n: int, document_type: Optional[str], params: Dict[str, Any]) -> str:
+        generation = await index_meta.generation()
+        return make_cache_key(generation, query, top_n, document_type, params)
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: List[Dict[str, Any]]):
+        await self.backend.set(key, value, self.ttl)
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": RESULT_CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+result_cache = SearchResultCache(make_backend())
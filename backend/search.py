@@ -1,20 +1,81 @@
-from typing import List, Dict, Any, Optional
+import os
+import re
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 
-from indexing.embeddings import embed_text
-from indexing.create_index import es, INDEX_NAME
+import numpy as np
+from elasticsearch import ApiError, ConnectionTimeout, TransportError
+
+from indexing.embeddings import embed_text, async_embed_text, async_embed_queries
+from indexing.create_index import get_es, get_async_es, INDEX_NAME
+from backend.result_cache import result_cache
+from backend.index_meta import index_meta
+from backend.metrics import timed, record_es_response
+from backend.latency_budget import Deadline, breakers, SEARCH_BUDGET_MS, ES_REQUEST_TIMEOUT, FETCH_MIN_TIMEOUT
+from indexing.pca import load_projection
 
 
 # =========================
-# BM25 Search
+# Config
 # =========================
 
-def bm25_search(query: str, size: int = 50, document_type: Optional[str] = None):
+# How BM25 + kNN are retrieved and fused:
+#   client  -> two es.search calls, RRF in Python (default)
+#   msearch -> both sub-queries in one _msearch request, RRF in Python
+#   es_rrf  -> one request using the ES `rrf` retriever, fusion on the server
+HYBRID_MODE = os.getenv("HYBRID_MODE", "client")
+HYBRID_MODES = ("client", "msearch", "es_rrf")
+
+RETRIEVAL_SIZE = 50
+RRF_K = 60
+NUM_CANDIDATES = int(os.getenv("NUM_CANDIDATES", "200"))  # default kNN candidates per shard
+
+# Fields the API actually returns; `embedding` is never fetched
+RESULT_SOURCE_FIELDS = [
+    "chunk_text",
+    "snippet",
+    "chunk_url",
+    "title",
+    "doc_id",
+    "chunk_index",
+    "page_start",
+    "page_end",
+    "document_type",
+]
+
+# Two-phase fetch: retrieval returns ids only, the final top_n
+# sources are loaded with a single mget
+TWO_PHASE_FETCH = os.getenv("TWO_PHASE_FETCH", "true").lower() == "true"
+
+# POST /search/batch: queries per _msearch (two sub-searches each), and
+# how many of those requests are in flight at once
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+BATCH_MSEARCH_QUERIES = int(os.getenv("BATCH_MSEARCH_QUERIES", "50"))
+BATCH_MSEARCH_CONCURRENCY = int(os.getenv("BATCH_MSEARCH_CONCURRENCY", "4"))
+
+# Flipped off the first time the cluster rejects the rrf retriever
+_es_rrf_supported = True
+
+
+# =========================
+# Query Bodies
+# =========================
+
+def retrieval_source():
+    # ids + scores only when sources are fetched later with mget
+    if TWO_PHASE_FETCH:
+        return False
+    return {"includes": RESULT_SOURCE_FIELDS, "excludes": ["embedding"]}
+
+
+def build_bm25_body(query: str, size: int = 50, document_type: Optional[str] = None) -> Dict[str, Any]:
     filters = []
     if document_type:
         filters.append({"term": {"document_type": document_type}})
 
-    body = {
+    return {
         "size": size,
+        "_source": retrieval_source(),
         "query": {
             "bool": {
                 "filter": filters,
@@ -32,35 +93,289 @@ def bm25_search(query: str, size: int = 50, document_type: Optional[str] = None)
         }
     }
 
-    return es.search(index=INDEX_NAME, body=body, request_timeout=30)
-
 
-# =========================
-# Vector Search
-# =========================
-
-def vector_search(
+def build_vector_body(
     query_vector,
     k: int = 50,
-    num_candidates: int = 200,
+    num_candidates: int = NUM_CANDIDATES,
     document_type: Optional[str] = None
-):
+) -> Dict[str, Any]:
     filters = []
     if document_type:
         filters.append({"term": {"document_type": document_type}})
 
-    body = {
+    return {
         "size": k,
+        "_source": retrieval_source(),
         "knn": {
             "field": "embedding",
             "query_vector": query_vector,
             "k": k,
-            "num_candidates": num_candidates,
+            "num_candidates": max(num_candidates, k),  # ES rejects num_candidates < k
             "filter": filters
         }
     }
 
-    return es.search(index=INDEX_NAME, body=body, request_timeout=30)
+
+def build_msearch_body(
+    query: str,
+    query_vector,
+    size: int = RETRIEVAL_SIZE,
+    document_type: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES
+) -> List[Dict[str, Any]]:
+    # header/body pairs: [BM25, kNN]
+    return [
+        {"index": INDEX_NAME},
+        build_bm25_body(query, size=size, document_type=document_type),
+        {"index": INDEX_NAME},
+        build_vector_body(query_vector, k=size, num_candidates=num_candidates, document_type=document_type),
+    ]
+
+
+def build_rrf_retriever_body(
+    query: str,
+    query_vector,
+    top_n: int = 10,
+    window_size: int = RETRIEVAL_SIZE,
+    document_type: Optional[str] = None,
+    rank_constant: int = RRF_K,
+    num_candidates: int = NUM_CANDIDATES
+) -> Dict[str, Any]:
+    bm25_body = build_bm25_body(query, size=window_size, document_type=document_type)
+    knn = build_vector_body(
+        query_vector, k=window_size, num_candidates=num_candidates, document_type=document_type
+    )["knn"]
+
+    return {
+        "size": top_n,
+        # already only top_n hits, so fetch sources inline
+        "_source": {"includes": RESULT_SOURCE_FIELDS, "excludes": ["embedding"]},
+        "retriever": {
+            "rrf": {
+                "retrievers": [
+                    {"standard": {"query": bm25_body["query"]}},
+                    {"knn": knn},
+                ],
+                "rank_constant": rank_constant,
+                "rank_window_size": window_size
+            }
+        }
+    }
+
+
+# =========================
+# BM25 Search
+# =========================
+
+def bm25_search(query: str, size: int = 50, document_type: Optional[str] = None):
+    body = build_bm25_body(query, size=size, document_type=document_type)
+    with timed("bm25"):
+        res = get_es().search(index=INDEX_NAME, body=body, request_timeout=ES_REQUEST_TIMEOUT)
+    record_es_response("bm25", res, leg="bm25")
+    return res
+
+
+async def async_bm25_search(
+    query: str,
+    size: int = 50,
+    document_type: Optional[str] = None,
+    request_timeout: float = ES_REQUEST_TIMEOUT
+):
+    body = build_bm25_body(query, size=size, document_type=document_type)
+    with timed("bm25"):
+        res = await get_async_es().search(index=INDEX_NAME, body=body, request_timeout=request_timeout)
+    record_es_response("bm25", res, leg="bm25")
+    return res
+
+
+# =========================
+# Vector Search
+# =========================
+
+def vector_search(
+    query_vector,
+    k: int = 50,
+    num_candidates: int = NUM_CANDIDATES,
+    document_type: Optional[str] = None
+):
+    body = build_vector_body(query_vector, k=k, num_candidates=num_candidates, document_type=document_type)
+    with timed("knn"):
+        res = get_es().search(index=INDEX_NAME, body=body, request_timeout=ES_REQUEST_TIMEOUT)
+    record_es_response("knn", res, leg="knn")
+    return res
+
+
+async def async_vector_search(
+    query_vector,
+    k: int = 50,
+    num_candidates: int = NUM_CANDIDATES,
+    document_type: Optional[str] = None,
+    request_timeout: float = ES_REQUEST_TIMEOUT
+):
+    body = build_vector_body(query_vector, k=k, num_candidates=num_candidates, document_type=document_type)
+    with timed("knn"):
+        res = await get_async_es().search(index=INDEX_NAME, body=body, request_timeout=request_timeout)
+    record_es_response("knn", res, leg="knn")
+    return res
+
+
+# =========================
+# Source Fetch (phase two)
+# =========================
+
+def hit_sources(hits) -> Dict[str, Dict[str, Any]]:
+    return {hit["_id"]: hit["_source"] for hit in hits}
+
+
+def _mget_sources(res) -> Dict[str, Dict[str, Any]]:
+    return {doc["_id"]: doc["_source"] for doc in res["docs"] if doc.get("found")}
+
+
+def fetch_sources(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    if not ids:
+        return {}
+    with timed("fetch"):
+        res = get_es().mget(index=INDEX_NAME, ids=ids, source_includes=RESULT_SOURCE_FIELDS, request_timeout=ES_REQUEST_TIMEOUT)
+    return _mget_sources(res)
+
+
+async def async_fetch_sources(ids: List[str], request_timeout: float = ES_REQUEST_TIMEOUT) -> Dict[str, Dict[str, Any]]:
+    if not ids:
+        return {}
+    with timed("fetch"):
+        res = await get_async_es().mget(
+            index=INDEX_NAME, ids=ids, source_includes=RESULT_SOURCE_FIELDS, request_timeout=request_timeout
+        )
+    return _mget_sources(res)
+
+
+# =========================
+# Single Round-Trip Retrieval
+# =========================
+
+def _msearch_hits(res) -> List[List[Dict[str, Any]]]:
+    record_es_response("msearch", res)
+
+    hits = []
+    for leg, sub in zip(("bm25", "knn"), res["responses"]):
+        if "error" in sub:
+            raise RuntimeError(f"msearch sub-query failed: {sub['error']}")
+        record_es_response(leg, sub, leg=leg)
+        hits.append(sub["hits"]["hits"])
+    return hits
+
+
+def msearch_retrieve(
+    query: str,
+    query_vector,
+    size: int = RETRIEVAL_SIZE,
+    document_type: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES
+):
+    body = build_msearch_body(query, query_vector, size=size, document_type=document_type, num_candidates=num_candidates)
+    with timed("msearch"):
+        res = get_es().msearch(searches=body, request_timeout=ES_REQUEST_TIMEOUT)
+    bm25_hits, vector_hits = _msearch_hits(res)
+    return bm25_hits, vector_hits
+
+
+async def async_msearch_retrieve(
+    query: str,
+    query_vector,
+    size: int = RETRIEVAL_SIZE,
+    document_type: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES
+):
+    body = build_msearch_body(query, query_vector, size=size, document_type=document_type, num_candidates=num_candidates)
+    with timed("msearch"):
+        res = await get_async_es().msearch(searches=body, request_timeout=ES_REQUEST_TIMEOUT)
+    bm25_hits, vector_hits = _msearch_hits(res)
+    return bm25_hits, vector_hits
+
+
+def es_rrf_search(
+    query: str,
+    query_vector,
+    top_n: int = 10,
+    document_type: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES
+):
+    body = build_rrf_retriever_body(query, query_vector, top_n=top_n, document_type=document_type, num_candidates=num_candidates)
+    with timed("es_rrf"):
+        res = get_es().search(index=INDEX_NAME, body=body, request_timeout=ES_REQUEST_TIMEOUT)
+    record_es_response("es_rrf", res, leg="es_rrf")
+    return res
+
+
+async def async_es_rrf_search(
+    query: str,
+    query_vector,
+    top_n: int = 10,
+    document_type: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES
+):
+    body = build_rrf_retriever_body(query, query_vector, top_n=top_n, document_type=document_type, num_candidates=num_candidates)
+    with timed("es_rrf"):
+        res = await get_async_es().search(index=INDEX_NAME, body=body, request_timeout=ES_REQUEST_TIMEOUT)
+    record_es_response("es_rrf", res, leg="es_rrf")
+    return res
+
+
+def _resolve_mode(mode: Optional[str]) -> str:
+    mode = mode or HYBRID_MODE
+    if mode not in HYBRID_MODES:
+        raise ValueError(f"Unknown hybrid mode '{mode}', expected one of {HYBRID_MODES}")
+    if mode == "es_rrf" and not _es_rrf_supported:
+        return "msearch"
+    return mode
+
+
+# 400 for a request using the rrf retriever on a cluster that lacks it
+_RRF_UNSUPPORTED = re.compile(
+    r"(unknown|unsupported|not supported|unrecognized)[^.]*\b(retriever|rrf)\b"
+    r"|\b(retriever|rrf)\b[^.]*(unknown|unsupported|not supported)",
+    re.IGNORECASE
+)
+
+
+def _rrf_unsupported(err: ApiError) -> bool:
+    """Only this error disables es_rrf; 429s, 5xx or bad queries fail just their own request."""
+    return getattr(err, "status_code", None) == 400 and bool(_RRF_UNSUPPORTED.search(str(err.body or err)))
+
+
+def _disable_es_rrf(err: Exception):
+    global _es_rrf_supported
+    _es_rrf_supported = False
+    print(f"[SEARCH] rrf retriever not supported by cluster, falling back to msearch: {err}")
+
+
+# =========================
+# Query Vectors
+# =========================
+
+def project_query_vector(query_vector, meta: Dict[str, Any]):
+    # Indices built with PCA store reduced vectors; project queries the same way
+    projection = load_projection(meta.get("pca_file"))
+    if projection is None:
+        return query_vector
+    return projection.project(np.asarray(query_vector, dtype=np.float32)).tolist()
+
+
+def query_vector_for(query: str):
+    with timed("embed"):
+        return project_query_vector(embed_text(query), index_meta.current_sync())
+
+
+async def async_query_vector_for(query: str):
+    with timed("embed"):
+        return project_query_vector(await async_embed_text(query), await index_meta.current())
+
+
+async def async_query_vectors_for(queries: List[str]) -> List[List[float]]:
+    # one batched encode for all of them; projection works on the whole matrix
+    with timed("embed"):
+        return project_query_vector(await async_embed_queries(queries), await index_meta.current())
 
 
 # =========================
@@ -95,47 +410,44 @@ def reciprocal_rank_fusion(bm25_hits, vector_hits, k: int = 60) -> Dict[str, flo
     return fused_scores
 
 
-# =========================
-# Hybrid Search (FINAL)
-# =========================
-
-def hybrid_document_search_rrf(
-    query: str,
-    top_n: int = 10,
-    document_type: Optional[str] = None,
-    min_rrf_score: float = 0.0155  # threshold
-) -> List[Dict[str, Any]]:
+def build_result(src: Dict[str, Any], rrf_score: float) -> Dict[str, Any]:
+    return {
+        "rrf_score": rrf_score,
+        "chunk_text": src.get("chunk_text", ""),
+        "snippet": src.get("snippet", ""), 
+        "chunk_url": src.get("chunk_url"),       
+        "title": src.get("title"),
+        "doc_id": src.get("doc_id"),
+        "chunk_index": src.get("chunk_index"),
+        "page_start": src.get("page_start"),
+        "page_end": src.get("page_end"),
+        "document_type": src.get("document_type"),
+    }
 
-    # 1️ BM25 search
-    bm25_res = bm25_search(query, size=50, document_type=document_type)
-    bm25_hits = bm25_res["hits"]["hits"]
 
-    # 2️ Vector search
-    query_vector = embed_text(query)
-    vector_res = vector_search(query_vector, k=50, document_type=document_type)
-    vector_hits = vector_res["hits"]["hits"]
+def rank_fused_hits(
+    bm25_hits,
+    vector_hits,
+    top_n: int = 10,
+    min_rrf_score: float = 0.0155
+) -> List[Tuple[str, float]]:
 
-    # # 3️ Build ranks (for dual-signal requirement)    j# it means .. documents must appear in both searches
+    # # Build ranks (for dual-signal requirement)    j# it means .. documents must appear in both searches
     # bm25_ranks = extract_ranks(bm25_hits)
     # vector_ranks = extract_ranks(vector_hits)
 
-    # 4️ RRF fusion
-    fused_scores = reciprocal_rank_fusion(bm25_hits, vector_hits, k=60)
+    # 1️ RRF fusion
+    fused_scores = reciprocal_rank_fusion(bm25_hits, vector_hits, k=RRF_K)
 
-    # 5️ Lookup full docs
-    doc_lookup = {}
-    for hit in bm25_hits + vector_hits:
-        doc_lookup[hit["_id"]] = hit
-
-    # 6️ Sort by RRF score
+    # 2️ Sort by RRF score
     ranked = sorted(
         fused_scores.items(),
         key=lambda x: x[1],
         reverse=True
     )
 
-    # 7️ Build final results with threshold + dual-signal
-    results: List[Dict[str, Any]] = []
+    # 3️ Keep top_n with threshold + dual-signal
+    top: List[Tuple[str, float]] = []
 
     for doc_id, rrf_score in ranked:
 
@@ -147,23 +459,436 @@ def hybrid_document_search_rrf(
         # if doc_id not in bm25_ranks or doc_id not in vector_ranks:
         #     continue
 
-        hit = doc_lookup[doc_id]
-        src = hit["_source"]
-
-        results.append({
-            "rrf_score": rrf_score,
-            "chunk_text": src.get("chunk_text", ""),
-            "snippet": src.get("snippet", ""), 
-            "chunk_url": src.get("chunk_url"),       
-            "title": src.get("title"),
-            "doc_id": src.get("doc_id"),
-            "chunk_index": src.get("chunk_index"),
-            "document_type": src.get("document_type"),
-        })
-
-        if len(results) >= top_n:
+        top.append((doc_id, rrf_score))
+
+        if len(top) >= top_n:
             break
 
+    return top
+
+
+def build_results(ranked: List[Tuple[str, float]], sources: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        build_result(sources[doc_id], rrf_score)
+        for doc_id, rrf_score in ranked
+        if doc_id in sources
+    ]
+
+
+def fuse_and_build_results(
+    bm25_hits,
+    vector_hits,
+    top_n: int = 10,
+    min_rrf_score: float = 0.0155
+) -> List[Dict[str, Any]]:
+    with timed("fusion"):
+        ranked = rank_fused_hits(bm25_hits, vector_hits, top_n=top_n, min_rrf_score=min_rrf_score)
+
+    if TWO_PHASE_FETCH:
+        sources = fetch_sources([doc_id for doc_id, _ in ranked])
+    else:
+        sources = hit_sources(bm25_hits + vector_hits)
+
+    with timed("build"):
+        return build_results(ranked, sources)
+
+
+async def async_fuse_and_build_results(
+    bm25_hits,
+    vector_hits,
+    top_n: int = 10,
+    min_rrf_score: float = 0.0155,
+    request_timeout: float = ES_REQUEST_TIMEOUT
+) -> List[Dict[str, Any]]:
+    with timed("fusion"):
+        ranked = rank_fused_hits(bm25_hits, vector_hits, top_n=top_n, min_rrf_score=min_rrf_score)
+
+    if TWO_PHASE_FETCH:
+        sources = await async_fetch_sources([doc_id for doc_id, _ in ranked], request_timeout=request_timeout)
+    else:
+        sources = hit_sources(bm25_hits + vector_hits)
+
+    with timed("build"):
+        return build_results(ranked, sources)
+
+
+def results_from_rrf_hits(
+    hits,
+    top_n: int = 10,
+    min_rrf_score: float = 0.0155
+) -> List[Dict[str, Any]]:
+    # Hits from the rrf retriever are already fused; _score is the RRF score
+    results: List[Dict[str, Any]] = []
+
+    with timed("build"):
+        for hit in hits:
+            if hit["_score"] < min_rrf_score:
+                continue
+
+            results.append(build_result(hit["_source"], hit["_score"]))
+
+            if len(results) >= top_n:
+                break
+
     return results
 
 
+# =========================
+# Hybrid Search (FINAL)
+# =========================
+
+def hybrid_document_search_rrf(
+    query: str,
+    top_n: int = 10,
+    document_type: Optional[str] = None,
+    min_rrf_score: float = 0.0155,  # threshold
+    mode: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES
+) -> List[Dict[str, Any]]:
+
+    mode = _resolve_mode(mode)
+
+    if mode == "es_rrf":
+        query_vector = query_vector_for(query)
+        try:
+            res = es_rrf_search(query, query_vector, top_n=top_n, document_type=document_type, num_candidates=num_candidates)
+            return results_from_rrf_hits(res["hits"]["hits"], top_n=top_n, min_rrf_score=min_rrf_score)
+        except ApiError as e:
+            if not _rrf_unsupported(e):
+                raise
+            _disable_es_rrf(e)
+            bm25_hits, vector_hits = msearch_retrieve(query, query_vector, document_type=document_type, num_candidates=num_candidates)
+            return fuse_and_build_results(bm25_hits, vector_hits, top_n=top_n, min_rrf_score=min_rrf_score)
+
+    if mode == "msearch":
+        query_vector = query_vector_for(query)
+        bm25_hits, vector_hits = msearch_retrieve(query, query_vector, document_type=document_type, num_candidates=num_candidates)
+        return fuse_and_build_results(bm25_hits, vector_hits, top_n=top_n, min_rrf_score=min_rrf_score)
+
+    # 1️ BM25 search
+    bm25_res = bm25_search(query, size=RETRIEVAL_SIZE, document_type=document_type)
+    bm25_hits = bm25_res["hits"]["hits"]
+
+    # 2️ Vector search
+    query_vector = query_vector_for(query)
+    vector_res = vector_search(query_vector, k=RETRIEVAL_SIZE, num_candidates=num_candidates, document_type=document_type)
+    vector_hits = vector_res["hits"]["hits"]
+
+    # 3️ Fuse + build results
+    return fuse_and_build_results(bm25_hits, vector_hits, top_n=top_n, min_rrf_score=min_rrf_score)
+
+
+# =========================
+# Retrieval Legs (budgeted)
+# =========================
+
+class SearchUnavailable(RuntimeError):
+    """No retrieval leg produced hits: all missed the deadline, failed, or are switched off."""
+
+
+def contributing_legs(legs: Dict[str, str]) -> List[str]:
+    return [name for name, status in legs.items() if status == "ok"]
+
+
+async def _run_leg(name: str, make_request, deadline: Deadline):
+    """
+    Runs one retrieval leg under the request deadline and its circuit
+    breaker. Returns (hits, status), status being ok / timeout / error /
+    open; hits is None unless the leg finished in time.
+    """
+    breaker = breakers[name]
+    if not breaker.allow():
+        return None, "open"
+
+    try:
+        res = await asyncio.wait_for(make_request(), timeout=deadline.remaining())
+    except (asyncio.TimeoutError, ConnectionTimeout):
+        if deadline.counts_for_breaker():
+            breaker.record_failure("deadline exceeded")
+        else:
+            breaker.release()
+        return None, "timeout"
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception as e:
+        print(f"[SEARCH] {name} leg failed: {e!r}")
+        breaker.record_failure(repr(e))
+        return None, "error"
+
+    breaker.record_success()
+    return res["hits"]["hits"], "ok"
+
+
+async def async_budgeted_hybrid_search(
+    query: str,
+    top_n: int = 10,
+    document_type: Optional[str] = None,
+    min_rrf_score: float = 0.0155,
+    num_candidates: int = NUM_CANDIDATES,
+    deadline: Optional[Deadline] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    BM25 and embed + kNN run concurrently against one shared deadline.
+    Legs that miss it, fail, or sit behind an open breaker are dropped
+    and the rest are fused. Returns (results, legs) where legs maps
+    bm25 / knn to ok / timeout / error / open.
+    """
+    deadline = deadline or Deadline()
+
+    async def knn_request():
+        query_vector = await async_query_vector_for(query)
+        return await async_vector_search(
+            query_vector, k=RETRIEVAL_SIZE, num_candidates=num_candidates, document_type=document_type,
+            request_timeout=deadline.request_timeout()
+        )
+
+    def bm25_request():
+        return async_bm25_search(
+            query, size=RETRIEVAL_SIZE, document_type=document_type, request_timeout=deadline.request_timeout()
+        )
+
+    (bm25_hits, bm25_status), (vector_hits, knn_status) = await asyncio.gather(
+        _run_leg("bm25", bm25_request, deadline),
+        _run_leg("knn", knn_request, deadline),
+    )
+    legs = {"bm25": bm25_status, "knn": knn_status}
+
+    answered = contributing_legs(legs)
+    if not answered:
+        raise SearchUnavailable(f"no retrieval leg answered: {legs}")
+
+    # min_rrf_score is tuned for two legs; one leg alone scores at most half
+    threshold = min_rrf_score * len(answered) / len(legs)
+
+    fetch = breakers["fetch"]
+    if not fetch.allow():
+        raise SearchUnavailable("source fetch is switched off (breaker open)")
+
+    try:
+        # the final fetch gets a minimum slice even if retrieval used up the budget
+        results = await async_fuse_and_build_results(
+            bm25_hits or [], vector_hits or [], top_n=top_n, min_rrf_score=threshold,
+            request_timeout=deadline.request_timeout(floor=FETCH_MIN_TIMEOUT)
+        )
+    except asyncio.CancelledError:
+        fetch.release()
+        raise
+    except (ApiError, TransportError) as e:
+        # without sources there is nothing to return: 503, not 500
+        if isinstance(e, ConnectionTimeout) and not deadline.counts_for_breaker():
+            fetch.release()
+        else:
+            fetch.record_failure(repr(e))
+        raise SearchUnavailable(f"source fetch failed: {e!r}") from e
+
+    fetch.record_success()
+    return results, legs
+
+
+# =========================
+# Hybrid Search (async)
+# =========================
+
+async def async_hybrid_document_search_rrf(
+    query: str,
+    top_n: int = 10,
+    document_type: Optional[str] = None,
+    min_rrf_score: float = 0.0155,  # threshold
+    mode: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES,
+    budget_ms: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Same results as hybrid_document_search_rrf, but the BM25 request is
+    in flight while the query is embedded, and BM25 + kNN overlap.
+    Latency is roughly max(bm25, embed + knn) instead of the sum.
+    Returns (results, legs), see async_budgeted_hybrid_search.
+
+    In msearch / es_rrf mode the query is embedded first and both
+    sub-queries go out in a single request. A single request cannot
+    drop one leg, so with a budget or an open breaker the client path
+    is used instead.
+    """
+
+    mode = _resolve_mode(mode)
+    budget_ms = budget_ms or SEARCH_BUDGET_MS or None
+    all_closed = all(breaker.state() == "closed" for breaker in breakers.values())
+
+    if mode in ("msearch", "es_rrf") and budget_ms is None and all_closed:
+        legs = {"bm25": "ok", "knn": "ok"}
+        query_vector = await async_query_vector_for(query)
+
+        if mode == "es_rrf":
+            try:
+                res = await async_es_rrf_search(query, query_vector, top_n=top_n, document_type=document_type, num_candidates=num_candidates)
+                return results_from_rrf_hits(res["hits"]["hits"], top_n=top_n, min_rrf_score=min_rrf_score), legs
+            except ApiError as e:
+                if not _rrf_unsupported(e):
+                    raise
+                _disable_es_rrf(e)
+
+        bm25_hits, vector_hits = await async_msearch_retrieve(query, query_vector, document_type=document_type, num_candidates=num_candidates)
+        return await async_fuse_and_build_results(bm25_hits, vector_hits, top_n=top_n, min_rrf_score=min_rrf_score), legs
+
+    return await async_budgeted_hybrid_search(
+        query, top_n=top_n, document_type=document_type, min_rrf_score=min_rrf_score,
+        num_candidates=num_candidates, deadline=Deadline(budget_ms)
+    )
+
+
+# =========================
+# Hybrid Search (cached)
+# =========================
+
+async def cached_hybrid_document_search_rrf(
+    query: str,
+    top_n: int = 10,
+    document_type: Optional[str] = None,
+    min_rrf_score: float = 0.0155,  # threshold
+    mode: Optional[str] = None,
+    num_candidates: int = NUM_CANDIDATES,
+    budget_ms: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], str, Dict[str, str]]:
+    """
+    async_hybrid_document_search_rrf behind the result cache.
+    Returns (results, cache_status, legs) where cache_status is
+    hit / miss / off / bypass. Keys include the index generation, so a
+    reindex invalidates them. Degraded results (a leg missing) are not
+    cached. When the index generation cannot be read, the search runs
+    uncached ("bypass"); if ES is really down, the legs' breakers and
+    the source fetch turn that into SearchUnavailable (503).
+    """
+    if not result_cache.enabled:
+        results, legs = await async_hybrid_document_search_rrf(
+            query, top_n=top_n, document_type=document_type, min_rrf_score=min_rrf_score, mode=mode,
+            num_candidates=num_candidates, budget_ms=budget_ms
+        )
+        return results, "off", legs
+
+    mode = _resolve_mode(mode)
+    params = {
+        "mode": mode,
+        "min_rrf_score": min_rrf_score,
+        "rrf_k": RRF_K,
+        "retrieval_size": RETRIEVAL_SIZE,
+        "num_candidates": num_candidates,
+    }
+
+    try:
+        key = await result_cache.key_for(query, top_n, document_type, params)
+        cached = await result_cache.get(key)
+    except (ApiError, TransportError) as e:
+        print(f"[SEARCH] result cache skipped, index generation lookup failed: {e!r}")
+        results, legs = await async_hybrid_document_search_rrf(
+            query, top_n=top_n, document_type=document_type, min_rrf_score=min_rrf_score, mode=mode,
+            num_candidates=num_candidates, budget_ms=budget_ms
+        )
+        return results, "bypass", legs
+
+    if cached is not None:
+        # only complete results are ever stored
+        return cached, "hit", {"bm25": "ok", "knn": "ok"}
+
+    results, legs = await async_hybrid_document_search_rrf(
+        query, top_n=top_n, document_type=document_type, min_rrf_score=min_rrf_score, mode=mode,
+        num_candidates=num_candidates, budget_ms=budget_ms
+    )
+    if len(contributing_legs(legs)) == len(legs):
+        await result_cache.set(key, results)
+    return results, "miss", legs
+
+
+# =========================
+# Batch Search
+# =========================
+
+async def _batch_group(
+    group: List[Tuple[int, Dict[str, Any]]],
+    vectors: List[List[float]],
+    min_rrf_score: float
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """One _msearch for a group of queries, RRF per query, one mget for all their results."""
+    searches = []
+    for i, query in group:
+        searches += build_msearch_body(
+            query["query"], vectors[i], size=RETRIEVAL_SIZE, document_type=query.get("document_type"),
+            num_candidates=query.get("num_candidates", NUM_CANDIDATES)
+        )
+
+    with timed("msearch"):
+        res = await get_async_es().msearch(searches=searches, request_timeout=ES_REQUEST_TIMEOUT)
+    record_es_response("msearch", res)
+    responses = res["responses"]
+
+    lines: List[Tuple[int, Dict[str, Any]]] = []
+    ranked_by_query: Dict[int, List[Tuple[str, float]]] = {}
+    group_hits = []
+
+    for pos, (i, query) in enumerate(group):
+        bm25_sub, knn_sub = responses[2 * pos], responses[2 * pos + 1]
+        errors = [sub["error"] for sub in (bm25_sub, knn_sub) if "error" in sub]
+        if errors:
+            # one bad query does not fail the rest of the batch
+            lines.append((i, {"error": f"msearch sub-query failed: {errors[0]}"}))
+            continue
+
+        record_es_response("bm25", bm25_sub, leg="bm25")
+        record_es_response("knn", knn_sub, leg="knn")
+        bm25_hits, vector_hits = bm25_sub["hits"]["hits"], knn_sub["hits"]["hits"]
+        group_hits += bm25_hits + vector_hits
+
+        with timed("fusion"):
+            ranked_by_query[i] = rank_fused_hits(
+                bm25_hits, vector_hits, top_n=query.get("top_n", 10), min_rrf_score=min_rrf_score
+            )
+
+    if TWO_PHASE_FETCH:
+        ids = list(dict.fromkeys(doc_id for ranked in ranked_by_query.values() for doc_id, _ in ranked))
+        sources = await async_fetch_sources(ids)
+    else:
+        sources = hit_sources(group_hits)
+
+    with timed("build"):
+        for i, ranked in ranked_by_query.items():
+            lines.append((i, {"results": build_results(ranked, sources)}))
+    return lines
+
+
+async def async_batch_search(
+    queries: List[Dict[str, Any]],
+    vectors: List[List[float]],
+    min_rrf_score: float = 0.0155
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Hybrid search for many queries: `vectors` are their query vectors
+    (async_query_vectors_for, one batched encode), then BM25 + kNN for
+    BATCH_MSEARCH_QUERIES queries at a time go out as one _msearch and
+    are fused with RRF as on /search.
+
+    Each query is a dict with `query` and optional `top_n`,
+    `document_type`, `num_candidates`. Yields one
+    {"index", "query", "results" | "error"} per query, in completion
+    order (`index` is the position in `queries`).
+    """
+    indexed = list(enumerate(queries))
+    groups = [indexed[start:start + BATCH_MSEARCH_QUERIES] for start in range(0, len(indexed), BATCH_MSEARCH_QUERIES)]
+    slots = asyncio.Semaphore(BATCH_MSEARCH_CONCURRENCY)
+
+    async def run_group(group):
+        async with slots:
+            try:
+                return await _batch_group(group, vectors, min_rrf_score)
+            except Exception as e:
+                print(f"[SEARCH] batch group of {len(group)} queries failed: {e!r}")
+                return [(i, {"error": repr(e)}) for i, _ in group]
+
+    tasks = [asyncio.create_task(run_group(group)) for group in groups]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for i, line in await next_done:
+                yield {"index": i, "query": queries[i]["query"], **line}
+    finally:
+        # client disconnected mid-stream: stop the remaining groups
+        for task in tasks:
+            task.cancel()
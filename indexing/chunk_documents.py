@@ -1,6 +1,23 @@
+import os
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple
+
 CHUNK_SIZE = 400
 OVERLAP = 80
 
+# words -> CHUNK_SIZE-word windows (chunk_text)
+# tokens -> windows that fit the embedding model's max sequence length
+CHUNKER = os.getenv("CHUNKER", "tokens")
+# MAX_SEQ_LENGTH minus [CLS] and [SEP]
+TOKEN_CHUNK_SIZE = int(os.getenv("TOKEN_CHUNK_SIZE", "254"))
+TOKEN_OVERLAP = int(os.getenv("TOKEN_OVERLAP", "32"))
+SENTENCE_BREAKS = os.getenv("SENTENCE_BREAKS", "true").lower() == "true"
+
+SENTENCE_END_CHARS = ".!?"
+
+Pages = Iterable[Tuple[Optional[int], str]]
+PageChunk = Tuple[str, Optional[int], Optional[int]]
+
 def chunk_text(text):
     words = text.split()
     chunks = []
@@ -13,3 +30,202 @@ def chunk_text(text):
         i += CHUNK_SIZE - OVERLAP
 
     return chunks
+
+
+def iter_page_chunks(
+    pages: Iterable[Tuple[Optional[int], str]]
+) -> Iterator[Tuple[str, Optional[int], Optional[int]]]:
+    """
+    Streaming chunk_text over (page_number, text) pairs, yielding
+    (chunk, page_start, page_end). Chunks run across page breaks and are
+    identical to chunk_text() on the joined text; only one window of
+    words is held at a time.
+    """
+    step = CHUNK_SIZE - OVERLAP
+    window = []  # (word, page_number)
+
+    def emit():
+        return " ".join(w for w, _ in window[:CHUNK_SIZE]), window[0][1], window[min(len(window), CHUNK_SIZE) - 1][1]
+
+    for page_number, text in pages:
+        for word in text.split():
+            window.append((word, page_number))
+            if len(window) == CHUNK_SIZE:
+                yield emit()
+                del window[:step]
+
+    # tail: what chunk_text produces for the last (partial) windows
+    while window:
+        yield emit()
+        del window[:step]
+
+
+# =========================
+# Token-aware chunking
+# =========================
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_chunk_tokenizer():
+    """The embedding model's word-piece tokenizer (tokenizers library), without truncation."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                from tokenizers import Tokenizer
+                from indexing.embedding_backends import ONNX_MODEL_DIR, HF_MODEL_NAME
+
+                local = os.path.join(ONNX_MODEL_DIR, "tokenizer.json")
+                if os.path.exists(local):
+                    _tokenizer = Tokenizer.from_file(local)
+                else:
+                    _tokenizer = Tokenizer.from_pretrained(HF_MODEL_NAME)
+                _tokenizer.no_truncation()
+                _tokenizer.no_padding()
+    return _tokenizer
+
+
+def overlap_start(ends_sentence, start: int, end: int, overlap: int, sentence_breaks: bool) -> int:
+    """Where the next window starts: `overlap` tokens back, moved up to a sentence start if one is in reach."""
+    next_start = max(end - overlap, start + 1)
+    if sentence_breaks:
+        for k in range(next_start, end - 1):
+            if ends_sentence[k]:
+                return k + 1
+    return next_start
+
+
+def token_windows(
+    ends_sentence: List[bool],
+    max_tokens: int = TOKEN_CHUNK_SIZE,
+    overlap: int = TOKEN_OVERLAP,
+    sentence_breaks: bool = SENTENCE_BREAKS
+) -> Iterator[Tuple[int, int]]:
+    """
+    [start, end) token index windows of at most max_tokens. With
+    sentence_breaks a window ends after the last sentence-ending token in
+    its second half, when there is one.
+    """
+    n = len(ends_sentence)
+    start = 0
+    while start < n:
+        end = min(start + max_tokens, n)
+        if sentence_breaks and end < n:
+            for k in range(end - 1, start + max_tokens // 2 - 1, -1):
+                if ends_sentence[k]:
+                    end = k + 1
+                    break
+
+        yield start, end
+        if end == n:
+            return
+        start = overlap_start(ends_sentence, start, end, overlap, sentence_breaks)
+
+
+def chunk_spans(
+    text: str,
+    max_tokens: int = TOKEN_CHUNK_SIZE,
+    overlap: int = TOKEN_OVERLAP,
+    sentence_breaks: bool = SENTENCE_BREAKS,
+    tokenizer=None
+) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of token-sized chunks of `text`; slice to get the chunk."""
+    tokenizer = tokenizer or get_chunk_tokenizer()
+    offsets = [o for o in tokenizer.encode(text, add_special_tokens=False).offsets if o[1] > o[0]]
+    ends_sentence = [text[e - 1] in SENTENCE_END_CHARS for _, e in offsets]
+
+    return [
+        (offsets[start][0], offsets[end - 1][1])
+        for start, end in token_windows(ends_sentence, max_tokens, overlap, sentence_breaks)
+    ]
+
+
+def iter_token_chunks(
+    pages: Pages,
+    max_tokens: int = TOKEN_CHUNK_SIZE,
+    overlap: int = TOKEN_OVERLAP,
+    sentence_breaks: bool = SENTENCE_BREAKS,
+    tokenizer=None
+) -> Iterator[PageChunk]:
+    """
+    Token-sized chunks over (page_number, text) pages, as
+    (chunk, page_start, page_end). Pages are tokenized one at a time
+    (word-piece tokens never span whitespace, so this equals tokenizing
+    the joined text); a window holds token offsets, not copies of words,
+    and a chunk is sliced out of the held pages only when it is emitted.
+    """
+    tokenizer = tokenizer or get_chunk_tokenizer()
+
+    held = {}    # page position -> (page_number, text), while tokens of it are in the window
+    window = []  # (page position, start char, end char, ends sentence)
+
+    def cut_point(final: bool) -> int:
+        if final or not sentence_breaks:
+            return min(len(window), max_tokens)
+        for k in range(max_tokens - 1, max_tokens // 2 - 1, -1):
+            if window[k][3]:
+                return k + 1
+        return max_tokens
+
+    def emit(end: int) -> PageChunk:
+        pieces = []
+        first_pos, start_char = window[0][0], window[0][1]
+        for pos in range(first_pos, window[end - 1][0] + 1):
+            text = held[pos][1]
+            lo = start_char if pos == first_pos else 0
+            hi = window[end - 1][2] if pos == window[end - 1][0] else len(text)
+            pieces.append(text[lo:hi].strip())
+        chunk = " ".join(p for p in pieces if p)
+        return chunk, held[first_pos][0], held[window[end - 1][0]][0]
+
+    def advance(end: int):
+        del window[:overlap_start([t[3] for t in window[:end]], 0, end, overlap, sentence_breaks)]
+        first_pos = window[0][0] if window else None
+        for pos in [p for p in held if first_pos is None or p < first_pos]:
+            del held[pos]
+
+    position = 0
+    for page_number, text in pages:
+        if not text or not text.strip():
+            continue
+
+        held[position] = (page_number, text)
+        for start, end in tokenizer.encode(text, add_special_tokens=False).offsets:
+            if end <= start:
+                continue
+            window.append((position, start, end, text[end - 1] in SENTENCE_END_CHARS))
+
+            if len(window) > max_tokens:
+                end_idx = cut_point(final=False)
+                yield emit(end_idx)
+                advance(end_idx)
+        position += 1
+
+    # what is left fits one window (or a few, if overlap kept it long)
+    while window:
+        end_idx = cut_point(final=True)
+        yield emit(end_idx)
+        if end_idx == len(window):
+            break
+        advance(end_idx)
+
+
+def chunker_version() -> str:
+    """The configured chunker and its parameters; any change here moves chunk boundaries."""
+    if CHUNKER == "tokens":
+        from indexing.embedding_backends import MODEL_NAME
+        return f"tokens:{MODEL_NAME}:max={TOKEN_CHUNK_SIZE}:overlap={TOKEN_OVERLAP}:sentences={SENTENCE_BREAKS}"
+    if CHUNKER == "words":
+        return f"words:max={CHUNK_SIZE}:overlap={OVERLAP}"
+    raise ValueError(f"Unknown CHUNKER '{CHUNKER}', expected 'tokens' or 'words'")
+
+
+def iter_chunks(pages: Pages) -> Iterator[PageChunk]:
+    """The configured chunker (CHUNKER) over (page_number, text) pages."""
+    if CHUNKER == "tokens":
+        return iter_token_chunks(pages)
+    if CHUNKER == "words":
+        return iter_page_chunks(pages)
+    raise ValueError(f"Unknown CHUNKER '{CHUNKER}', expected 'tokens' or 'words'")
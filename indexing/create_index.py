@@ -1,5 +1,10 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, AsyncElasticsearch
 import os
+import copy
+import time
+import uuid
+import threading
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,16 +15,59 @@ load_dotenv()
 
 ELASTIC_USERNAME = "elastic"
 ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
-INDEX_NAME = os.getenv("INDEX_NAME", "documents_index")
+INDEX_NAME = os.getenv("INDEX_NAME", "documents_index")  # alias that search queries
+ELASTIC_URL = os.getenv("ELASTIC_URL", "https://localhost:9200")
+
+# Vector index options (unset -> Elasticsearch default for dense_vector)
+#   VECTOR_INDEX_TYPE: hnsw | int8_hnsw | int4_hnsw
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "100"))
+EMBEDDING_DIMS = 384
+
 # =========================
 # ES Client
 # =========================
-# Connect to Elasticsearch
-es = Elasticsearch(
-    "https://localhost:9200",
-    basic_auth=(ELASTIC_USERNAME, ELASTIC_PASSWORD),
-    verify_certs=False  # local self-signed cert
-)
+# Clients are built on first use so importing this module stays cheap
+
+_es = None
+_async_es = None
+_client_lock = threading.Lock()
+
+
+def get_es() -> Elasticsearch:
+    global _es
+    if _es is None:
+        with _client_lock:
+            if _es is None:
+                # Connect to Elasticsearch
+                _es = Elasticsearch(
+                    ELASTIC_URL,
+                    basic_auth=(ELASTIC_USERNAME, ELASTIC_PASSWORD),
+                    verify_certs=False  # local self-signed cert
+                )
+    return _es
+
+
+def get_async_es() -> AsyncElasticsearch:
+    # Async client for the API search path (concurrent BM25 + kNN)
+    global _async_es
+    if _async_es is None:
+        with _client_lock:
+            if _async_es is None:
+                _async_es = AsyncElasticsearch(
+                    ELASTIC_URL,
+                    basic_auth=(ELASTIC_USERNAME, ELASTIC_PASSWORD),
+                    verify_certs=False
+                )
+    return _async_es
+
+
+async def close_async_es():
+    global _async_es
+    if _async_es is not None:
+        await _async_es.close()
+        _async_es = None
 
 # =========================
 # Index Mapping
@@ -45,6 +93,8 @@ INDEX_MAPPING = {
 
             # Chunk info
             "chunk_index": {"type": "integer"},
+            "page_start": {"type": "integer"},
+            "page_end": {"type": "integer"},
             "chunk_text": {
                 "type": "text",
                 "analyzer": "standard"
@@ -53,11 +103,16 @@ INDEX_MAPPING = {
             # Vector Embedding (Sentence Transformers)
             "embedding": {
                 "type": "dense_vector",
-                "dims": 384,
+                "dims": EMBEDDING_DIMS,
                 "index": True,
                 "similarity": "cosine"
             },
 
+            # Content hashes (incremental reindexing)
+            "doc_hash": {"type": "keyword"},
+            "chunk_hash": {"type": "keyword"},
+            "text_hash": {"type": "keyword"},
+
             # Stats
             "num_tokens": {"type": "integer"},
 
@@ -67,17 +122,214 @@ INDEX_MAPPING = {
     }
 }
 
+def vector_index_options(
+    index_type: Optional[str] = VECTOR_INDEX_TYPE,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION
+) -> Optional[Dict[str, Any]]:
+    if not index_type:
+        return None
+    return {"type": index_type, "m": m, "ef_construction": ef_construction}
+
+
+def build_index_body(
+    dims: int = EMBEDDING_DIMS,
+    index_options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """INDEX_MAPPING with the configured (or given) vector index options and dims."""
+    body = copy.deepcopy(INDEX_MAPPING)
+    embedding = body["mappings"]["properties"]["embedding"]
+    embedding["dims"] = dims
+
+    index_options = index_options or vector_index_options()
+    if index_options:
+        embedding["index_options"] = index_options
+
+    return body
+
+# =========================
+# Index Meta / Generation
+# =========================
+# Per-index values kept in the mapping `_meta`:
+#   generation -> bumped by anything that changes the index contents,
+#                 so caches keyed on it go stale automatically
+#   pca_file   -> query projection the index was built with (optional)
+
+def _meta_from_mapping(mapping) -> Dict[str, Any]:
+    # get_mapping is keyed by concrete index name; there is only one
+    for index_mapping in mapping.values():
+        return dict(index_mapping["mappings"].get("_meta", {}))
+    return {}
+
+
+def get_index_meta(index: str = INDEX_NAME) -> Dict[str, Any]:
+    return _meta_from_mapping(get_es().indices.get_mapping(index=index))
+
+
+async def async_get_index_meta(index: str = INDEX_NAME) -> Dict[str, Any]:
+    return _meta_from_mapping(await get_async_es().indices.get_mapping(index=index))
+
+
+def update_index_meta(index: str = INDEX_NAME, **values) -> Dict[str, Any]:
+    # put_mapping replaces _meta wholesale, so merge with what is there
+    meta = get_index_meta(index)
+    meta.update(values)
+    get_es().indices.put_mapping(index=index, meta=meta)
+    return meta
+
+
+def bump_index_generation(index: str = INDEX_NAME) -> str:
+    generation = str(time.time_ns())
+    update_index_meta(index, generation=generation)
+    print(f"Index '{index}' generation -> {generation}")
+    return generation
+
+
+def get_index_generation(index: str = INDEX_NAME) -> str:
+    return str(get_index_meta(index).get("generation", "0"))
+
+
+async def async_get_index_generation(index: str = INDEX_NAME) -> str:
+    return str((await async_get_index_meta(index)).get("generation", "0"))
+
+
+def get_index_uuid(index: str = INDEX_NAME) -> str:
+    # Changes whenever the index is deleted and recreated
+    settings = get_es().indices.get_settings(index=index)
+    for index_settings in settings.values():
+        return index_settings["settings"]["index"]["uuid"]
+    return ""
+
+# =========================
+# Versioned Indices + Alias
+# =========================
+# INDEX_NAME is an alias. Each build goes into INDEX_NAME_v<timestamp>_<suffix>
+# and the alias is moved over atomically once the new index is ready,
+# so search never sees a missing or half-loaded index.
+
+INDEX_REPLICAS = int(os.getenv("INDEX_REPLICAS", "0"))
+INDEX_REFRESH_INTERVAL = os.getenv("INDEX_REFRESH_INTERVAL", "1s")
+KEEP_OLD_INDICES = int(os.getenv("KEEP_OLD_INDICES", "1"))  # rollback targets
+
+# Applied while bulk loading, restored by finish_bulk_load()
+BULK_LOAD_SETTINGS = {
+    "refresh_interval": "-1",
+    "number_of_replicas": 0,
+}
+
+
+def versioned_index_name() -> str:
+    # the random suffix keeps two builds started in the same second apart
+    return f"{INDEX_NAME}_v{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def create_versioned_index(bulk_load: bool = True, dims: int = EMBEDDING_DIMS) -> str:
+    index = versioned_index_name()
+    body = build_index_body(dims=dims)
+    body["settings"]["number_of_replicas"] = INDEX_REPLICAS
+    if bulk_load:
+        body["settings"].update(BULK_LOAD_SETTINGS)
+
+    print(f"Creating index: {index}")
+    get_es().indices.create(index=index, body=body)
+    return index
+
+
+def finish_bulk_load(index: str, force_merge: bool = True):
+    """Restore search-time settings, refresh and merge down to one segment."""
+    es = get_es()
+    es.indices.put_settings(index=index, settings={
+        "refresh_interval": INDEX_REFRESH_INTERVAL,
+        "number_of_replicas": INDEX_REPLICAS,
+    })
+    es.indices.refresh(index=index)
+
+    if force_merge:
+        es.indices.forcemerge(index=index, max_num_segments=1, request_timeout=3600)
+
+    es.cluster.health(index=index, wait_for_status="yellow" if INDEX_REPLICAS == 0 else "green", timeout="10m")
+
+
+def alias_targets(alias: str = INDEX_NAME):
+    es = get_es()
+    if not es.indices.exists_alias(name=alias):
+        return []
+    return list(es.indices.get_alias(name=alias).keys())
+
+
+def legacy_index_exists(alias: str = INDEX_NAME) -> bool:
+    """Pre-alias deployments have a concrete index with the alias name."""
+    es = get_es()
+    return not es.indices.exists_alias(name=alias) and bool(es.indices.exists(index=alias))
+
+
+def swap_alias(new_index: str, alias: str = INDEX_NAME, drop_legacy: bool = False):
+    """
+    Point the alias at new_index in one atomic update_aliases call.
+
+    A legacy concrete index named like the alias has to go for the alias
+    to be created, and it is not a versioned index that could be rolled
+    back to; it is only deleted with drop_legacy=True.
+    """
+    es = get_es()
+    actions = []
+
+    old_indices = alias_targets(alias)
+    for old in old_indices:
+        actions.append({"remove": {"index": old, "alias": alias}})
+
+    if not old_indices and es.indices.exists(index=alias):
+        if not drop_legacy:
+            raise RuntimeError(
+                f"'{alias}' is a concrete (pre-alias) index; rerun with --drop-legacy to delete it "
+                f"and move the alias to {new_index} (it cannot be rolled back to afterwards)"
+            )
+        print(f"[ALIAS] deleting legacy concrete index '{alias}' (no rollback target is kept)")
+        actions.append({"remove_index": {"index": alias}})
+
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    es.indices.update_aliases(actions=actions)
+
+    print(f"Alias '{alias}' -> {new_index} (was: {old_indices or 'none'})")
+    return old_indices
+
+
+def cleanup_old_indices(keep: int = KEEP_OLD_INDICES, alias: str = INDEX_NAME) -> List[str]:
+    """Delete old versions not behind the alias, keeping the newest `keep`. Returns their uuids."""
+    es = get_es()
+    deleted = []
+    live = set(alias_targets(alias))
+    versions = sorted(
+        (name for name in es.indices.get(index=f"{alias}_v*") if name not in live),
+        reverse=True
+    )
+
+    for name in versions[keep:]:
+        pca_file = get_index_meta(name).get("pca_file")
+        deleted.append(get_index_uuid(name))
+        print(f"Deleting old index: {name}")
+        es.indices.delete(index=name)
+        if pca_file and os.path.exists(pca_file):
+            os.remove(pca_file)
+
+    return deleted
+
 # =========================
 # Create Index
 # =========================
 
-def create_index():
-    if es.indices.exists(index=INDEX_NAME):
-        print(f"Index '{INDEX_NAME}' already exists. Deleting...")
-        es.indices.delete(index=INDEX_NAME)
+def create_index(drop_legacy: bool = False):
+    """
+    Bootstrap: create an empty versioned index and point the alias at it.
+    For rebuilding a live index use scripts/reindex.py (blue/green).
+    """
+    if legacy_index_exists() and not drop_legacy:
+        raise RuntimeError(f"'{INDEX_NAME}' is a concrete (pre-alias) index; pass --drop-legacy to replace it")
 
-    print(f"Creating index: {INDEX_NAME}")
-    es.indices.create(index=INDEX_NAME, body=INDEX_MAPPING)
+    index = create_versioned_index(bulk_load=False)
+    bump_index_generation(index)
+    swap_alias(index, drop_legacy=drop_legacy)
+    cleanup_old_indices()
     print("Index created successfully")
 
 # =========================
@@ -85,4 +337,10 @@ def create_index():
 # =========================
 
 if __name__ == "__main__":
-    create_index()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create an empty versioned index behind the INDEX_NAME alias")
+    parser.add_argument("--drop-legacy", action="store_true", help="delete a pre-alias concrete index named INDEX_NAME")
+    args = parser.parse_args()
+
+    create_index(drop_legacy=args.drop_legacy)
@@ -0,0 +1,148 @@
+import os
+from typing import List
+
+import numpy as np
+
+# =========================
+# Config
+# =========================
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+HF_MODEL_NAME = f"sentence-transformers/{MODEL_NAME}"
+MAX_SEQ_LENGTH = 256
+
+# torch -> SentenceTransformer (default), onnx -> ONNX Runtime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", f"models/{MODEL_NAME}-onnx")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = let ORT decide
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+
+
+# =========================
+# Backend Interface
+# =========================
+
+class EmbeddingBackend:
+    """
+    Turns texts into L2-normalised float32 vectors.
+    Every backend must produce vectors compatible with the indexed ones.
+    """
+
+    name = "base"
+    dims = 384
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        raise NotImplementedError
+
+
+# =========================
+# PyTorch (SentenceTransformer)
+# =========================
+
+class TorchBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dims = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+
+
+# =========================
+# ONNX Runtime
+# =========================
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    MiniLM exported to ONNX (see scripts/export_onnx_model.py), optionally
+    INT8 dynamically quantized. Only needs onnxruntime + tokenizers at
+    runtime, no torch import.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = ONNX_QUANTIZED):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = ONNX_INT8_FILE if quantized else ONNX_FP32_FILE
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found, run `python -m scripts.export_onnx_model` first"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.name = "onnx-int8" if quantized else "onnx-fp32"
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalise (same as the
+        # Pooling + Normalize modules of the SentenceTransformer model)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = summed / counts
+
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return (pooled / norms).astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        batches = [
+            self._encode_batch(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        return np.concatenate(batches, axis=0)
+
+
+# =========================
+# Factory
+# =========================
+
+def backend_model_key(name: str = EMBEDDING_BACKEND, quantized: bool = ONNX_QUANTIZED) -> str:
+    """
+    Identifies which vectors a backend produces without loading it.
+    Used to key persisted embeddings, since INT8 vectors differ slightly.
+    """
+    if name == "onnx":
+        return f"{MODEL_NAME}-onnx-{'int8' if quantized else 'fp32'}"
+    return MODEL_NAME
+
+
+def load_backend(name: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    if name == "torch":
+        return TorchBackend()
+    if name == "onnx":
+        return OnnxBackend()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}', expected 'torch' or 'onnx'")
@@ -0,0 +1,104 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Any
+
+import numpy as np
+
+
+class EmbeddingScheduler:
+    """
+    Dynamic micro-batcher for query embeddings.
+
+    Callers from any thread (or event loop, via asyncio.wrap_future) submit
+    a single text and get a Future. One worker thread drains the queue and
+    encodes everything waiting in one batched call, flushing when either
+    max_batch_size texts are queued or max_wait_ms has passed since the
+    first one arrived.
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, text: str) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    # -----------------
+    # Worker
+    # -----------------
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch: List[tuple]):
+        # Skip callers that gave up (cancelled) before we got to them
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        # Identical queries in the same window are encoded once
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            vectors = self.encode_batch(unique_texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        by_text = {text: vector for text, vector in zip(unique_texts, vectors)}
+        for text, future in batch:
+            future.set_result(by_text[text].tolist())
+
+        self.batches += 1
+        self.items += len(batch)
@@ -0,0 +1,315 @@
+"""
+Persistent embedding store keyed by (model, cleaned chunk hash).
+
+Layout per model under EMBED_STORE_DIR/<model key>/:
+
+    vectors-<generation>.f32   raw float32 rows, memory-mapped for reads
+    index.sqlite               hash -> row, plus the current generation
+    store.lock                 flock taken by writers (append / compact)
+
+Reads return views into the memmap (no copy). Appends take an exclusive
+file lock, write rows at the end of the vectors file and record them in
+SQLite, so several indexer processes can share one store. Compaction
+writes a new generation file and switches readers over atomically.
+
+    python -m indexing.embedding_store stats
+    python -m indexing.embedding_store compact [--live-from-es]
+"""
+import os
+import sys
+import fcntl
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Iterable, Tuple
+
+import numpy as np
+
+from indexing.embedding_backends import EmbeddingBackend, backend_model_key
+from utils.hashing import content_hash
+
+# =========================
+# Config
+# =========================
+
+EMBED_STORE = os.getenv("EMBED_STORE", "true").lower() == "true"
+EMBED_STORE_DIR = os.getenv("EMBED_STORE_DIR", "data/embedding_store")
+
+SQLITE_BATCH = 500
+
+
+def text_hash(cleaned_chunk: str) -> str:
+    return content_hash(cleaned_chunk)
+
+
+# =========================
+# Store
+# =========================
+
+class EmbeddingStore:
+    def __init__(self, root: str, model_key: str, dims: int = EmbeddingBackend.dims):
+        self.dir = os.path.join(root, model_key)
+        self.dims = dims
+        self.row_bytes = dims * 4
+        os.makedirs(self.dir, exist_ok=True)
+
+        self._lock_path = os.path.join(self.dir, "store.lock")
+        self._thread_lock = threading.Lock()
+
+        self._conn = sqlite3.connect(
+            os.path.join(self.dir, "index.sqlite"),
+            timeout=60,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rows (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('generation', 0)")
+        self._conn.commit()
+
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_generation: Optional[int] = None
+
+    # -----------------
+    # Files / mapping
+    # -----------------
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.dir, f"vectors-{generation}.f32")
+
+    def _generation(self) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    @contextmanager
+    def _write_lock(self):
+        # exclusive across processes (flock) and threads of this process
+        with self._thread_lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _vectors(self, generation: int, min_rows: int) -> Optional[np.memmap]:
+        """Map (or re-map after growth / compaction) the vectors file read-only."""
+        mapped_rows = 0 if self._mmap is None else self._mmap.shape[0]
+        if self._mmap_generation == generation and mapped_rows >= min_rows:
+            return self._mmap
+
+        path = self._vectors_path(generation)
+        rows = os.path.getsize(path) // self.row_bytes if os.path.exists(path) else 0
+        if rows == 0:
+            return None
+
+        self._mmap = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dims))
+        self._mmap_generation = generation
+        return self._mmap
+
+    # -----------------
+    # Read
+    # -----------------
+
+    def get_many(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Vectors for the hashes that are stored, as zero-copy memmap views."""
+        if not hashes:
+            return {}
+
+        with self._thread_lock:
+            # one read transaction, so rows and generation are consistent
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                generation = self._generation()
+                rows: Dict[str, int] = {}
+                for i in range(0, len(hashes), SQLITE_BATCH):
+                    batch = hashes[i:i + SQLITE_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    cur.execute(f"SELECT hash, row FROM rows WHERE hash IN ({placeholders})", batch)
+                    rows.update(cur.fetchall())
+            finally:
+                cur.execute("COMMIT")
+
+            if not rows:
+                return {}
+
+            vectors = self._vectors(generation, max(rows.values()) + 1)
+            if vectors is None:
+                return {}
+
+            return {h: vectors[row] for h, row in rows.items()}
+
+    def __len__(self) -> int:
+        with self._thread_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    # -----------------
+    # Write
+    # -----------------
+
+    def put_many(self, hashes: List[str], vectors: np.ndarray):
+        if not hashes:
+            return
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        assert vectors.shape == (len(hashes), self.dims), vectors.shape
+
+        with self._write_lock():
+            generation = self._generation()
+            path = self._vectors_path(generation)
+
+            with open(path, "ab") as f:
+                # drop a torn row left by a writer that crashed mid-append
+                size = f.tell()
+                if size % self.row_bytes:
+                    size -= size % self.row_bytes
+                    f.truncate(size)
+                    f.seek(size)
+
+                start_row = size // self.row_bytes
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            # rows are visible to readers only after the bytes are on disk;
+            # a hash another process stored meanwhile keeps its old row
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO rows (hash, row) VALUES (?, ?)",
+                [(h, start_row + i) for i, h in enumerate(hashes)]
+            )
+            self._conn.commit()
+
+    # -----------------
+    # Compaction
+    # -----------------
+
+    def compact(self, live_hashes: Optional[Iterable[str]] = None) -> Tuple[int, int]:
+        """
+        Rewrite the vectors file without unreferenced rows (left by racing
+        writers) and, if live_hashes is given, without hashes not in it.
+        Returns (kept, dropped).
+        """
+        live = set(live_hashes) if live_hashes is not None else None
+
+        with self._write_lock():
+            generation = self._generation()
+            old_path = self._vectors_path(generation)
+            old_rows = os.path.getsize(old_path) // self.row_bytes if os.path.exists(old_path) else 0
+
+            entries = self._conn.execute("SELECT hash, row FROM rows ORDER BY row").fetchall()
+            if live is not None:
+                entries = [(h, row) for h, row in entries if h in live]
+
+            new_generation = generation + 1
+            new_path = self._vectors_path(new_generation)
+
+            if old_rows:
+                old = np.memmap(old_path, dtype=np.float32, mode="r", shape=(old_rows, self.dims))
+                with open(new_path, "wb") as f:
+                    for i in range(0, len(entries), SQLITE_BATCH):
+                        batch_rows = [row for _, row in entries[i:i + SQLITE_BATCH]]
+                        f.write(np.ascontiguousarray(old[batch_rows]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                del old
+            else:
+                open(new_path, "wb").close()
+
+            with self._conn:
+                self._conn.execute("DELETE FROM rows")
+                self._conn.executemany(
+                    "INSERT INTO rows (hash, row) VALUES (?, ?)",
+                    [(h, i) for i, (h, _) in enumerate(entries)]
+                )
+                self._conn.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (new_generation,))
+
+            # readers that still map the old file keep working until they re-map
+            if os.path.exists(old_path):
+                os.remove(old_path)
+
+        return len(entries), old_rows - len(entries)
+
+
+# =========================
+# Shared Instance
+# =========================
+
+_store: Optional[EmbeddingStore] = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    global _store
+    if not EMBED_STORE:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingStore(EMBED_STORE_DIR, backend_model_key())
+    return _store
+
+
+def embed_with_store(texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+    """
+    embed_texts that reads stored vectors first and only encodes (and
+    stores) the texts it has not seen before. Same output contract.
+    """
+    from indexing.embeddings import embed_texts, EMBED_BATCH_SIZE
+
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    store = get_embedding_store()
+    if store is None:
+        return embed_texts(texts, batch_size=batch_size)
+
+    hashes = [text_hash(t) for t in texts]
+    found = store.get_many(list(dict.fromkeys(hashes)))
+
+    missing = list(dict.fromkeys(h for h in hashes if h not in found))
+    if missing:
+        first_text = {}
+        for h, t in zip(hashes, texts):
+            first_text.setdefault(h, t)
+
+        new_vectors = embed_texts([first_text[h] for h in missing], batch_size=batch_size)
+        store.put_many(missing, new_vectors)
+        found.update(zip(missing, new_vectors))
+
+    out = np.empty((len(texts), store.dims), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        out[i] = found[h]
+    return out
+
+
+# =========================
+# CLI
+# =========================
+
+def live_hashes_from_es() -> List[str]:
+    from elasticsearch import helpers
+    from indexing.create_index import get_es, INDEX_NAME
+
+    return [
+        hit["_source"]["text_hash"]
+        for hit in helpers.scan(
+            get_es(),
+            index=INDEX_NAME,
+            query={"_source": ["text_hash"], "query": {"exists": {"field": "text_hash"}}}
+        )
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent embedding store maintenance")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--live-from-es", action="store_true", help="drop vectors no indexed chunk refers to")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(EMBED_STORE_DIR, backend_model_key())
+
+    if args.command == "stats":
+        print(f"{store.dir}: {len(store)} vectors, generation {store._generation()}")
+        sys.exit(0)
+
+    live = live_hashes_from_es() if args.live_from_es else None
+    kept, dropped = store.compact(live)
+    print(f"Compacted {store.dir}: kept {kept}, dropped {dropped}")
@@ -1,6 +1,290 @@
-from sentence_transformers import SentenceTransformer
+import os
+import asyncio
+import atexit
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Dict
+
+import numpy as np
+
+from indexing.embedding_backends import load_backend, backend_model_key, EmbeddingBackend
+from indexing.embedding_scheduler import EmbeddingScheduler
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Query embedding cache (0 disables it)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "3600"))  # seconds
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH")  # optional on-disk snapshot
+
+# Micro-batching of concurrent query embeddings
+EMBED_SCHEDULER = os.getenv("EMBED_SCHEDULER", "true").lower() == "true"
+EMBED_SCHEDULER_MAX_BATCH = int(os.getenv("EMBED_SCHEDULER_MAX_BATCH", "32"))
+EMBED_SCHEDULER_MAX_WAIT_MS = float(os.getenv("EMBED_SCHEDULER_MAX_WAIT_MS", "5"))
+
+WARMUP_QUERIES = [
+    "what is machine learning",
+    "explain the transformer attention mechanism in detail",
+    "gradient descent",
+]
+
+
+# =========================
+# Model (lazy)
+# =========================
+# torch or onnx, selected with EMBEDDING_BACKEND. Loaded on first use so
+# importing this module (and backend.search) does not pay for the model.
+
+_embedding_backend: Optional[EmbeddingBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    global _embedding_backend
+    if _embedding_backend is None:
+        with _backend_lock:
+            if _embedding_backend is None:
+                _embedding_backend = load_backend()
+    return _embedding_backend
+
+
+def is_model_loaded() -> bool:
+    return _embedding_backend is not None
+
+
+# =========================
+# Query Embedding Cache
+# =========================
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache with a per-entry TTL, safe to share across threads.
+    Values are stored as float lists and copied on the way out.
+    The on-disk snapshot records `model_key`; one written for another
+    model (or backend / quantization) is not loaded.
+    """
+
+    def __init__(self, max_size: int, ttl: float, path: Optional[str] = None, model_key: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.model_key = model_key
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if path:
+            self.load()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            vector, created_at = entry
+            if time.time() - created_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(vector)
+
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = (list(vector), time.time())
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            print(f"[EMBED CACHE] could not load {self.path}: {e}")
+            return
+
+        # snapshots without a header predate model keys
+        model_key = snapshot.get("model_key") if "entries" in snapshot else None
+        if model_key != self.model_key:
+            print(f"[EMBED CACHE] ignoring {self.path}: written for {model_key}, running {self.model_key}")
+            return
+        entries = snapshot["entries"]
+
+        now = time.time()
+        with self._lock:
+            for key, (vector, created_at) in entries.items():
+                if now - created_at <= self.ttl:
+                    self._entries[key] = (vector, created_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        print(f"[EMBED CACHE] loaded {len(self._entries)} entries from {self.path}")
+
+    def save(self):
+        if not self.path:
+            return
+
+        with self._lock:
+            entries = dict(self._entries)
+
+        # write to a temp file first so a crash never leaves a torn snapshot
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"model_key": self.model_key, "entries": entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+
+query_cache = EmbeddingCache(EMBED_CACHE_SIZE, EMBED_CACHE_TTL, path=EMBED_CACHE_PATH, model_key=backend_model_key())
+
+if EMBED_CACHE_PATH:
+    atexit.register(query_cache.save)
+
+
+def embedding_cache_stats() -> Dict[str, int]:
+    return query_cache.stats()
+
+
+def embedding_scheduler_stats():
+    return scheduler.stats()
+
+
+# =========================
+# Embedding
+# =========================
+
+def embed_texts(texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Encode many texts in batched forward passes.
+    Returns a C-contiguous float32 array of shape (len(texts), dims).
+    """
+    backend = get_embedding_backend()
+    if not texts:
+        return np.empty((0, backend.dims), dtype=np.float32)
+
+    vectors = backend.encode(texts, batch_size=batch_size)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+# Concurrent query embeddings are coalesced into one encode call
+scheduler = EmbeddingScheduler(
+    embed_texts,
+    max_batch_size=EMBED_SCHEDULER_MAX_BATCH,
+    max_wait_ms=EMBED_SCHEDULER_MAX_WAIT_MS
+)
+
+
+def _encode_query(text: str) -> List[float]:
+    if EMBED_SCHEDULER:
+        return scheduler.embed(text)
+    return get_embedding_backend().encode([text])[0].tolist()
+
+
+async def _async_encode_query(text: str) -> List[float]:
+    if EMBED_SCHEDULER:
+        # waits on the scheduler's future without tying up a pool thread
+        return await asyncio.wrap_future(scheduler.submit(text))
+    return await asyncio.to_thread(_encode_query, text)
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def embed_text(text: str):
-    return model.encode(text).tolist()
+    if EMBED_CACHE_SIZE <= 0:
+        return _encode_query(text)
+
+    key = normalize_query(text)
+    vector = query_cache.get(key)
+    if vector is not None:
+        return vector
+
+    # MiniLM's tokenizer is uncased, so encoding the normalized key
+    # gives the same vector as the raw text
+    vector = _encode_query(key)
+    query_cache.put(key, vector)
+    return vector
+
+
+async def async_embed_text(text: str):
+    if EMBED_CACHE_SIZE <= 0:
+        return await _async_encode_query(text)
+
+    key = normalize_query(text)
+    vector = query_cache.get(key)
+    if vector is not None:
+        return vector
+
+    vector = await _async_encode_query(key)
+    query_cache.put(key, vector)
+    return vector
+
+
+async def async_embed_queries(texts: List[str]) -> List[List[float]]:
+    """
+    Many queries at once: cache hits are served from the cache, all
+    misses go through a single batched encode (not the scheduler).
+    """
+    if EMBED_CACHE_SIZE <= 0:
+        return (await asyncio.to_thread(embed_texts, list(texts))).tolist()
+
+    keys = [normalize_query(text) for text in texts]
+    vectors = {key: query_cache.get(key) for key in set(keys)}
+
+    missing = [key for key, vector in vectors.items() if vector is None]
+    if missing:
+        encoded = await asyncio.to_thread(embed_texts, missing)
+        for key, vector in zip(missing, encoded.tolist()):
+            query_cache.put(key, vector)
+            vectors[key] = vector
+
+    return [vectors[key] for key in keys]
+
+
+# =========================
+# Warmup
+# =========================
+
+def warmup(queries: List[str] = WARMUP_QUERIES):
+    """
+    Load the model and push a few dummy queries through every path
+    (batched, single, scheduler) so the first real request is not slow.
+    Bypasses the query cache so no dummy entries are stored.
+    """
+    get_embedding_backend()
+    embed_texts(list(queries))
+    for query in queries:
+        _encode_query(query)
@@ -0,0 +1,391 @@
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Iterable, List, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from utils.hashing import content_hash
+
+# =========================
+# Config
+# =========================
+
+STATE_COLLECTION = "index_state"  # one collection per ES index: index_state_<index uuid>
+META_ID = "__meta__"
+DELETE_BATCH_SIZE = 500
+
+SHARD_COLLECTION = "index_shards"
+SHARD_LEASE_SECONDS = float(os.getenv("SHARD_LEASE_SECONDS", "300"))  # renewed by a heartbeat while running
+MAX_SHARD_ATTEMPTS = int(os.getenv("MAX_SHARD_ATTEMPTS", "3"))
+
+
+# =========================
+# Hashes
+# =========================
+
+def document_hash(doc: Dict[str, Any], pipeline: str = "") -> str:
+    # pipeline names the cleaner (and its version) the chunks were built
+    # with, so changing it re-chunks documents whose text did not change
+    if doc.get("storage") == "pages":
+        # page-stored documents carry a hash of their text from ingest
+        return content_hash(doc.get("title"), doc.get("document_type"), doc.get("content_hash"), pipeline)
+    return content_hash(doc.get("title"), doc.get("document_type"), doc.get("raw_text"), pipeline)
+
+
+def chunk_hash(doc: Dict[str, Any], cleaned_chunk: str, page_start: Optional[int], page_end: Optional[int]) -> str:
+    # metadata is part of the hash so a retitled document is re-sent too, and
+    # the page range so a chunk whose text moved to other pages is as well
+    pages = None if page_start is None else f"{page_start}-{page_end}"
+    return content_hash(doc.get("title"), doc.get("document_type"), cleaned_chunk, pages)
+
+
+def doc_id_from_chunk_id(chunk_id: str) -> str:
+    return chunk_id.rsplit("_c", 1)[0]
+
+
+# =========================
+# Index State / Checkpoint
+# =========================
+
+def state_collection_name(index_uuid: str) -> str:
+    return f"{STATE_COLLECTION}_{index_uuid}"
+
+
+def adopt_legacy_state(db, index_uuid: str) -> Optional[Dict[str, Any]]:
+    """
+    State written before it was kept per index lives in the shared
+    STATE_COLLECTION; if it belongs to this index, rename it into place
+    instead of re-embedding everything. Returns the adopted meta record.
+    """
+    legacy = db[STATE_COLLECTION]
+    meta = legacy.find_one({"_id": META_ID})
+    if not meta or meta.get("index_uuid") != index_uuid:
+        return None
+
+    try:
+        legacy.rename(state_collection_name(index_uuid))
+        print(f"[STATE] adopted {STATE_COLLECTION} as the state of index {index_uuid}")
+    except OperationFailure:
+        pass  # another process adopted it first
+    return db[state_collection_name(index_uuid)].find_one({"_id": META_ID})
+
+
+def drop_index_state(db, index_uuid: str):
+    """Forget the state of a deleted index."""
+    db.drop_collection(state_collection_name(index_uuid))
+
+
+class IndexCheckpoint:
+    """
+    Per-document index state in Mongo, doubling as a resumable checkpoint.
+
+    One record per document: {_id: doc_id, doc_hash, chunk_hashes: {chunk_id: hash}}.
+    A record is only written once every bulk action for that document has
+    been acknowledged by Elasticsearch, so a crashed run simply picks up
+    the documents it had not finished.
+
+    Each ES index (by uuid) has its own state collection. A blue/green
+    reindex builds the new index's state next to the live one, which
+    stays intact if the reindex fails; incremental runs resolve the
+    alias, so the new state goes live with the alias swap. A recreated
+    index has a new uuid and starts from empty state.
+    """
+
+    def __init__(self, db, index_uuid: str, full: bool = False):
+        self.state = db[state_collection_name(index_uuid)]
+        self.index_uuid = index_uuid
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+
+        self.committed = 0
+        self.failed_docs = 0
+
+        meta = self.state.find_one({"_id": META_ID}) or adopt_legacy_state(db, index_uuid)
+        if full or not meta:
+            reason = "full rebuild requested" if full else "no state for this index yet"
+            print(f"[STATE] {reason}, clearing index state")
+            self.state.delete_many({})
+            self.state.insert_one({"_id": META_ID, "index_uuid": index_uuid})
+
+    def previous(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self.state.find_one({"_id": doc_id})
+
+    def expect(self, doc_id: str, num_actions: int, record: Dict[str, Any]):
+        """Register the actions sent for a document; commit once they are all acked."""
+        self.begin(doc_id)
+        for _ in range(num_actions):
+            self.add_action(doc_id)
+        self.seal(doc_id, record)
+
+    # Streaming form of expect(), for documents whose chunks are produced
+    # lazily: begin, add_action before yielding each action, then seal.
+
+    def begin(self, doc_id: str):
+        with self._lock:
+            self._pending[doc_id] = {"remaining": 0, "failed": False, "record": None, "sealed": False}
+
+    def add_action(self, doc_id: str):
+        with self._lock:
+            self._pending[doc_id]["remaining"] += 1
+
+    def seal(self, doc_id: str, record: Dict[str, Any]):
+        """No more actions for this document; commit as soon as all are acked."""
+        with self._lock:
+            pending = self._pending[doc_id]
+            pending["record"] = record
+            pending["sealed"] = True
+            done = self._pending.pop(doc_id) if pending["remaining"] == 0 else None
+
+        if done is not None:
+            self._finish(doc_id, done)
+
+    def ack(self, info: Dict[str, Any], ok: bool) -> bool:
+        """Feed one parallel_bulk result back in. Returns the effective ok."""
+        op_type, item = next(iter(info.items()))
+
+        # deleting a chunk that is already gone is fine
+        if op_type == "delete" and item.get("status") == 404:
+            ok = True
+
+        self._action_done(doc_id_from_chunk_id(item["_id"]), ok)
+        return ok
+
+    def upload_done(self, doc_id: str, ok: bool):
+        """A chunk upload counted with add_action finished; a failed one retries the document next run."""
+        self._action_done(doc_id, ok)
+
+    def _action_done(self, doc_id: str, ok: bool):
+        done = None
+
+        with self._lock:
+            pending = self._pending.get(doc_id)
+            if pending is None:
+                return
+
+            pending["remaining"] -= 1
+            pending["failed"] = pending["failed"] or not ok
+
+            if pending["remaining"] == 0 and pending["sealed"]:
+                done = self._pending.pop(doc_id)
+
+        if done is not None:
+            self._finish(doc_id, done)
+
+    def _finish(self, doc_id: str, done: Dict[str, Any]):
+        if done["failed"]:
+            # not committed, so the next run retries this document
+            with self._lock:
+                self.failed_docs += 1
+        else:
+            self._commit(doc_id, done["record"])
+
+    def _commit(self, doc_id: str, record: Dict[str, Any]):
+        record = dict(record, indexed_at=datetime.now(timezone.utc))
+        self.state.replace_one({"_id": doc_id}, record, upsert=True)
+        with self._lock:  # uploads finish on uploader threads
+            self.committed += 1
+
+    def indexed_doc_ids(self) -> List[str]:
+        return [d["_id"] for d in self.state.find({"_id": {"$ne": META_ID}}, {"_id": 1})]
+
+    def remove_deleted(self, es, index: str, live_doc_ids: Iterable[str]) -> int:
+        """Delete chunks of documents that are no longer in Mongo."""
+        live = set(live_doc_ids)
+        deleted = [doc_id for doc_id in self.indexed_doc_ids() if doc_id not in live]
+
+        for i in range(0, len(deleted), DELETE_BATCH_SIZE):
+            batch = deleted[i:i + DELETE_BATCH_SIZE]
+            es.delete_by_query(
+                index=index,
+                query={"terms": {"doc_id": batch}},
+                conflicts="proceed",
+                refresh=False
+            )
+            self.state.delete_many({"_id": {"$in": batch}})
+
+        return len(deleted)
+
+
+# =========================
+# Sharded Runs
+# =========================
+
+def shard_bounds(num_shards: int) -> List[Tuple[str, Optional[str]]]:
+    """
+    doc_id ranges for num_shards shards. doc_ids are uuid strings, so
+    splitting the first four hex digits evenly gives even shards. The
+    first range is open below and the last open above, so every id
+    falls in exactly one shard.
+    """
+    cuts = [format(i * 0x10000 // num_shards, "04x") for i in range(1, num_shards)]
+    lows = [""] + cuts
+    highs = cuts + [None]
+    return list(zip(lows, highs))
+
+
+def shard_filter(low: str, high: Optional[str]) -> Dict[str, Any]:
+    bounds = {"$gte": low}
+    if high is not None:
+        bounds["$lt"] = high
+    return {"doc_id": bounds}
+
+
+class ShardQueue:
+    """
+    The shards of one indexing run, leased out through Mongo.
+
+    Any process on any node that knows the run_id can claim shards, so
+    several coordinators can share a run without doing a shard twice.
+    A claimed shard is leased for `lease_seconds` and the worker renews
+    the lease while it runs; a shard whose worker died becomes claimable
+    again once the lease expires. Failed shards are retried until they
+    have been attempted `max_attempts` times.
+    """
+
+    def __init__(self, db, run_id: str, lease_seconds: float = SHARD_LEASE_SECONDS, max_attempts: int = MAX_SHARD_ATTEMPTS):
+        self.shards = db[SHARD_COLLECTION]
+        self.run_id = run_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _shard_id(self, shard: int) -> str:
+        return f"{self.run_id}:{shard:04d}"
+
+    # -----------------
+    # Run
+    # -----------------
+
+    def create(self, num_shards: int, index: str) -> bool:
+        """Create the run (or join it). Returns True for the node that created it."""
+        try:
+            self.shards.insert_one({
+                "_id": self.run_id,
+                "kind": "run",
+                "index": index,
+                "num_shards": num_shards,
+                "ready": False,
+                "finalized": False,
+                "created_at": datetime.now(timezone.utc),
+            })
+            created = True
+        except DuplicateKeyError:
+            created = False
+
+        run = self.run()
+        # idempotent, so a joining node racing the creator is harmless
+        for shard, (low, high) in enumerate(shard_bounds(run["num_shards"])):
+            self.shards.update_one(
+                {"_id": self._shard_id(shard)},
+                {"$setOnInsert": {
+                    "kind": "shard",
+                    "run_id": self.run_id,
+                    "shard": shard,
+                    "low": low,
+                    "high": high,
+                    "status": "pending",
+                    "attempts": 0,
+                }},
+                upsert=True
+            )
+
+        return created
+
+    def run(self) -> Dict[str, Any]:
+        return self.shards.find_one({"_id": self.run_id})
+
+    def mark_ready(self):
+        self.shards.update_one({"_id": self.run_id}, {"$set": {"ready": True}})
+
+    def wait_ready(self, poll: float = 2.0):
+        while not self.run()["ready"]:
+            time.sleep(poll)
+
+    def retry_exhausted(self) -> int:
+        """Give shards that used up their attempts a fresh set (resuming a run by hand)."""
+        result = self.shards.update_many(
+            {"run_id": self.run_id, "kind": "shard", "status": {"$ne": "done"}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": "failed", "attempts": 0}}
+        )
+        return result.modified_count
+
+    def claim_finalize(self) -> bool:
+        """True for exactly one caller, once every shard is done."""
+        return self.shards.find_one_and_update(
+            {"_id": self.run_id, "finalized": False},
+            {"$set": {"finalized": True}}
+        ) is not None
+
+    # -----------------
+    # Shards
+    # -----------------
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        retryable = {"attempts": {"$lt": self.max_attempts}}
+        return self.shards.find_one_and_update(
+            {
+                "run_id": self.run_id,
+                "kind": "shard",
+                "$or": [
+                    {"status": "pending"},
+                    {"status": "failed", **retryable},
+                    {"status": "running", "lease_until": {"$lt": now}, **retryable},
+                ],
+            },
+            {
+                "$set": {"status": "running", "owner": owner, "lease_until": now + self.lease_seconds},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("shard", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def renew(self, shard_id: str, owner: str) -> bool:
+        result = self.shards.update_one(
+            {"_id": shard_id, "owner": owner, "status": "running"},
+            {"$set": {"lease_until": time.time() + self.lease_seconds}}
+        )
+        return result.matched_count == 1
+
+    def complete(self, shard_id: str, owner: str, counts: Dict[str, int]):
+        self.shards.update_one(
+            {"_id": shard_id, "owner": owner},
+            {"$set": {"status": "done", "counts": counts, "finished_at": datetime.now(timezone.utc)}}
+        )
+
+    def fail(self, shard_id: str, owner: str, error: str):
+        self.shards.update_one(
+            {"_id": shard_id, "owner": owner},
+            {"$set": {"status": "failed", "error": error[:2000], "finished_at": datetime.now(timezone.utc)}}
+        )
+
+    def all_shards(self) -> List[Dict[str, Any]]:
+        return list(self.shards.find({"run_id": self.run_id, "kind": "shard"}).sort("shard", 1))
+
+    def state(self) -> Dict[str, int]:
+        """Shard counts: done / claimable (pending or retryable) / running (live lease) / exhausted."""
+        now = time.time()
+        state = {"done": 0, "claimable": 0, "running": 0, "exhausted": 0}
+        for shard in self.all_shards():
+            status = shard["status"]
+            retryable = shard["attempts"] < self.max_attempts
+            if status == "done":
+                state["done"] += 1
+            elif status == "running" and shard["lease_until"] >= now:
+                state["running"] += 1
+            elif status == "pending" or retryable:
+                state["claimable"] += 1
+            else:
+                state["exhausted"] += 1
+        return state
+
+    def totals(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for shard in self.all_shards():
+            for key, value in (shard.get("counts") or {}).items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
@@ -0,0 +1,92 @@
+import os
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+# =========================
+# Config
+# =========================
+
+PCA_DIR = os.getenv("PCA_DIR", "models/pca")
+PCA_SAMPLE_SIZE = int(os.getenv("PCA_SAMPLE_SIZE", "20000"))
+
+
+# =========================
+# Projection
+# =========================
+
+class PCAProjection:
+    """
+    Linear projection to fewer dimensions, trained on chunk embeddings at
+    index time. The same projection must be applied to query vectors, so
+    each index records which file it was built with (index _meta pca_file).
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = mean.astype(np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)  # (dims, input_dims)
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[0]
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        projected = (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+        # re-normalise: the index uses cosine similarity
+        norms = np.clip(np.linalg.norm(projected, axis=-1, keepdims=True), 1e-12, None)
+        return (projected / norms).astype(np.float32)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, mean=self.mean, components=self.components)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        data = np.load(path)
+        return cls(data["mean"], data["components"])
+
+
+def fit_pca(vectors: np.ndarray, dims: int) -> PCAProjection:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.shape[0] < dims:
+        raise ValueError(f"Need at least {dims} sample vectors to fit {dims} components, got {vectors.shape[0]}")
+
+    mean = vectors.mean(axis=0)
+    # rows of vt are the principal directions, strongest first
+    _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+
+    explained = (singular_values[:dims] ** 2).sum() / (singular_values ** 2).sum()
+    print(f"[PCA] {vectors.shape[1]} -> {dims} dims, explained variance {explained:.3f}")
+
+    return PCAProjection(mean, vt[:dims])
+
+
+def pca_path_for(index: str) -> str:
+    return os.path.join(PCA_DIR, f"{index}.npz")
+
+
+# =========================
+# Loaded Projections
+# =========================
+
+_loaded: Dict[str, PCAProjection] = {}
+_loaded_lock = threading.Lock()
+
+
+def load_projection(path: Optional[str]) -> Optional[PCAProjection]:
+    """Cached load; None when the index was built without PCA."""
+    if not path:
+        return None
+
+    projection = _loaded.get(path)
+    if projection is None:
+        with _loaded_lock:
+            projection = _loaded.get(path)
+            if projection is None:
+                projection = PCAProjection.load(path)
+                _loaded[path] = projection
+    return projection
@@ -1,4 +1,6 @@
+import os
 import re
+from typing import Iterable, Iterator, Optional, Tuple
 
 
 def clean_whitespace(text: str) -> str:
@@ -81,6 +83,102 @@ def clean_text(text: str) -> str:
     return text
 
 
+# =========================
+# Document-level cleaning
+# =========================
+# Runs once per document, before chunking, with the patterns above folded
+# into a few precompiled passes. Works line by line on the real document
+# lines (clean_text only ever saw whitespace-joined chunk fragments).
+
+REFERENCES_TAIL = float(os.getenv("REFERENCES_TAIL", "0.3"))  # only the last 30% may start a references section
+
+# Bump when a cleaner's output changes, so the next reindex re-chunks
+# every document instead of skipping it on an unchanged document hash
+CLEANER_VERSIONS = {"chunk": "clean_text-1", "document": "clean_block-2"}
+
+# headers/footers and URLs in one alternation; the lookahead on the
+# possible first letters lets most positions fail fast. [^\S\n] where
+# clean_text had \s, so a match never eats a newline and glues two lines
+# together before the garbage-line pass sees them
+_INLINE_NOISE = re.compile(
+    r'(?=[hwpca©])(?:'
+    r'(?P<url>https?://\S+|www\.\S+)'
+    r'|page[^\S\n]*\d+[^\S\n]*(?:of[^\S\n]*\d+)?'
+    r'|©[^\S\n]?\d{4}.*'
+    r'|all rights reserved.*'
+    r'|proceedings of.*?\d{4}'
+    r'|printed on.*'
+    r'|confidential.*'
+    r')',
+    re.IGNORECASE
+)
+
+# figure/table labels, run after the headers are gone (as in clean_text)
+# so a label's trailing separators also take what a removed footer left
+_FIGURE_LABEL = re.compile(r'\b(?:figure|fig\.?|table)[^\S\n]+\d+(?:[^\S\n]|[:\-])+', re.IGNORECASE)
+
+# whole lines that are shorter than 3 chars, only symbols, or a bare number
+_GARBAGE_LINE = re.compile(
+    r'^[ \t\r\f\v]*(?:\S{0,2}|(?:[^\w\n]|_)+|\d+)[ \t\r\f\v]*$\n?',
+    re.MULTILINE
+)
+
+# a line that is only a (numbered) References / Bibliography heading
+_REFERENCES_HEADING = re.compile(
+    r'^[ \t]*(?:\d+(?:\.\d+)*\.?[ \t]+)?(?:references|bibliography)[ \t]*:?[ \t]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def _replace_noise(match) -> str:
+    return ' [URL] ' if match.group('url') else ''
+
+
+def clean_block(text: str) -> str:
+    """Clean a page (or any run of whole lines): three regex passes instead of ~10."""
+    text = _INLINE_NOISE.sub(_replace_noise, text)
+    text = _FIGURE_LABEL.sub('', text)
+    text = _GARBAGE_LINE.sub('', text)
+    return " ".join(text.split())
+
+
+def find_references_start(text: str, min_pos: int = 0) -> Optional[int]:
+    match = _REFERENCES_HEADING.search(text, min_pos)
+    return match.start() if match else None
+
+
+def iter_clean_pages(
+    pages: Iterable[Tuple[Optional[int], str]],
+    num_pages: Optional[int] = None
+) -> Iterator[Tuple[Optional[int], str]]:
+    """
+    Clean (page_number, text) pages one at a time and stop at the
+    references section. A References / Bibliography heading only ends the
+    document in its last REFERENCES_TAIL (by page, or by position for a
+    single-text document), so a mid-book "References" cannot drop the rest.
+    """
+    first_tail_page = (1 - REFERENCES_TAIL) * num_pages if num_pages else None
+
+    for page_number, text in pages:
+        if page_number is None or first_tail_page is None:
+            cut = find_references_start(text, int(len(text) * (1 - REFERENCES_TAIL)))
+        elif page_number >= first_tail_page:
+            cut = find_references_start(text)
+        else:
+            cut = None
+
+        if cut is not None:
+            yield page_number, clean_block(text[:cut])
+            return
+
+        yield page_number, clean_block(text)
+
+
+def clean_document(text: str) -> str:
+    """Document-level counterpart of clean_text for a single text."""
+    return " ".join(cleaned for _, cleaned in iter_clean_pages([(None, text or "")]) if cleaned)
+
+
 
 
 
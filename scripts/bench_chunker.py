@@ -0,0 +1,64 @@
+"""
+How much of the indexed text the chunk vectors actually cover.
+
+The encoder truncates every chunk at MAX_SEQ_LENGTH word-pieces. For the
+word chunker and the token chunker this reports chunk count, tokens
+encoded, tokens truncated away (indexed as text but never embedded)
+and their share of all chunk tokens, plus chunking speed.
+
+    python -m scripts.bench_chunker [--pdf-dir data/pdfs] [--max-pdfs 5]
+"""
+import time
+import argparse
+
+from indexing.chunk_documents import iter_page_chunks, iter_token_chunks, get_chunk_tokenizer
+from indexing.embedding_backends import MAX_SEQ_LENGTH
+from indexing.preprocess import iter_clean_pages
+from scripts.bench_cleaner import load_documents
+from scripts.ingest_pdfs_to_mongo import DATA_DIR
+
+CHUNKERS = {
+    "words (400/80)": iter_page_chunks,
+    "tokens": iter_token_chunks,
+}
+
+# [CLS] + [SEP]
+SPECIAL_TOKENS = 2
+
+
+def run_benchmark(pdf_dir: str = DATA_DIR, max_pdfs: int = 5):
+    tokenizer = get_chunk_tokenizer()
+    budget = MAX_SEQ_LENGTH - SPECIAL_TOKENS
+
+    docs = [list(iter_clean_pages(pages, num_pages=len(pages))) for pages in load_documents(pdf_dir, max_pdfs)]
+    doc_tokens = sum(
+        len(tokenizer.encode(text, add_special_tokens=False).ids)
+        for pages in docs for _, text in pages
+    )
+    print(f"{len(docs)} documents, {doc_tokens} tokens after cleaning, encoder budget {budget} tokens/chunk\n")
+    print(f"{'chunker':<16}{'chunks':>8}{'tokens/chunk':>14}{'encoded':>10}{'truncated':>11}{'wasted':>9}{'chunk s':>9}")
+
+    for name, chunker in CHUNKERS.items():
+        start = time.perf_counter()
+        chunks = [chunk for pages in docs for chunk, _, _ in chunker(pages)]
+        elapsed = time.perf_counter() - start
+
+        lengths = [len(e.ids) for e in tokenizer.encode_batch(chunks, add_special_tokens=False)]
+        encoded = sum(min(n, budget) for n in lengths)
+        truncated = sum(max(n - budget, 0) for n in lengths)
+
+        wasted = truncated / max(sum(lengths), 1)
+
+        print(
+            f"{name:<16}{len(chunks):>8}{sum(lengths) / max(len(chunks), 1):>14.0f}"
+            f"{encoded:>10}{truncated:>11}{wasted:>9.1%}{elapsed:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunker coverage vs encoder truncation")
+    parser.add_argument("--pdf-dir", default=DATA_DIR)
+    parser.add_argument("--max-pdfs", type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.pdf_dir, args.max_pdfs)
@@ -0,0 +1,90 @@
+"""
+Text cleaning throughput (MB/s) on real PDF text.
+
+    python -m scripts.bench_cleaner [--pdf-dir data/pdfs] [--max-pdfs 5] [--rounds 3]
+
+Compares the per-chunk clean_text path the indexer used to take with
+the document-level iter_clean_pages pipeline (both including chunking).
+"""
+import os
+import time
+import argparse
+from typing import List, Tuple, Optional
+
+from indexing.chunk_documents import chunk_text, iter_page_chunks
+from indexing.preprocess import clean_text, iter_clean_pages
+from scripts.ingest_pdfs_to_mongo import iter_pdf_pages, list_pdfs, DATA_DIR
+
+Pages = List[Tuple[Optional[int], str]]
+
+# =========================
+# Variants
+# =========================
+
+def per_chunk_clean_text(pages: Pages) -> int:
+    """Old indexer path: chunk the joined text, clean_text every chunk."""
+    text = "\n".join(t for _, t in pages)
+    return sum(len(clean_text(chunk)) for chunk in chunk_text(text))
+
+
+def clean_text_on_document(pages: Pages) -> int:
+    """clean_text once over the whole document, then chunk."""
+    text = clean_text("\n".join(t for _, t in pages))
+    return sum(len(chunk) for chunk in chunk_text(text))
+
+
+def document_pipeline(pages: Pages) -> int:
+    """New indexer path: clean pages, then stream-chunk."""
+    cleaned = iter_clean_pages(pages, num_pages=len(pages))
+    return sum(len(chunk) for chunk, _, _ in iter_page_chunks(cleaned))
+
+
+VARIANTS = {
+    "clean_text per chunk (old)": per_chunk_clean_text,
+    "clean_text per document": clean_text_on_document,
+    "iter_clean_pages (new)": document_pipeline,
+}
+
+# =========================
+# Benchmark
+# =========================
+
+def load_documents(pdf_dir: str, max_pdfs: int) -> List[Pages]:
+    docs = []
+    for path in list_pdfs(pdf_dir)[:max_pdfs]:
+        print(f"Extracting {os.path.basename(path)}")
+        docs.append(list(iter_pdf_pages(path)))
+    return docs
+
+
+def run_benchmark(pdf_dir: str = DATA_DIR, max_pdfs: int = 5, rounds: int = 3):
+    docs = load_documents(pdf_dir, max_pdfs)
+    total_mb = sum(len(t.encode("utf-8")) for pages in docs for _, t in pages) / 1e6
+    if not total_mb:
+        raise SystemExit(f"No PDF text found in {pdf_dir}")
+
+    print(f"{len(docs)} documents, {total_mb:.1f} MB of text, best of {rounds} rounds\n")
+    print(f"{'variant':<30}{'MB/s':>10}{'output MB':>12}")
+
+    for name, fn in VARIANTS.items():
+        best = float("inf")
+        out_chars = 0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            out_chars = sum(fn(pages) for pages in docs)
+            best = min(best, time.perf_counter() - start)
+
+        print(f"{name:<30}{total_mb / best:>10.2f}{out_chars / 1e6:>12.1f}")
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Text cleaner throughput")
+    parser.add_argument("--pdf-dir", default=DATA_DIR)
+    parser.add_argument("--max-pdfs", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.pdf_dir, args.max_pdfs, args.rounds)
@@ -0,0 +1,136 @@
+"""
+Compare embedding backends on accuracy, memory and latency.
+
+Each backend runs in its own subprocess so RSS is measured in isolation,
+then the parent checks cosine similarity of every backend against the
+PyTorch vectors.
+
+    python -m scripts.bench_embedding_backends
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import subprocess
+import tempfile
+
+import numpy as np
+
+# =========================
+# Config
+# =========================
+
+# (label, EMBEDDING_BACKEND, ONNX_QUANTIZED)
+BACKENDS = [
+    ("torch", "torch", "false"),
+    ("onnx-fp32", "onnx", "false"),
+    ("onnx-int8", "onnx", "true"),
+]
+
+REFERENCE = "torch"
+MIN_COSINE = 0.98  # accuracy regression threshold vs PyTorch
+NUM_QUERIES = 200
+SEED = 13
+
+QUERY_WORDS = (
+    "what is explain difference between machine deep learning neural network "
+    "gradient descent attention transformer embedding overfitting supervised "
+    "unsupervised reinforcement backpropagation cross validation language model"
+).split()
+
+
+def build_queries(n: int = NUM_QUERIES):
+    # Fixed, query-length inputs (this is the API's hot path)
+    rng = random.Random(SEED)
+    return [" ".join(rng.choice(QUERY_WORDS) for _ in range(rng.randint(3, 12))) for _ in range(n)]
+
+
+
+def rss_mb() -> float:
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# =========================
+# Worker (one backend)
+# =========================
+
+def run_worker(out_path: str):
+    start = time.perf_counter()
+    from indexing.embedding_backends import load_backend
+    backend = load_backend()
+    load_s = time.perf_counter() - start
+
+    corpus = build_queries()
+    backend.encode(corpus[:4])  # warmup
+
+    latencies = []
+    vectors = []
+    for text in corpus:
+        t0 = time.perf_counter()
+        vectors.append(backend.encode([text])[0])
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    np.save(out_path, np.asarray(vectors, dtype=np.float32))
+    print(json.dumps({
+        "load_s": load_s,
+        "rss_mb": rss_mb(),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }))
+
+# =========================
+# Coordinator
+# =========================
+
+def run_benchmark() -> bool:
+    results = {}
+    vectors = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, backend, quantized in BACKENDS:
+            out_path = os.path.join(tmp, f"{label}.npy")
+            env = dict(os.environ, EMBEDDING_BACKEND=backend, ONNX_QUANTIZED=quantized)
+            proc = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_embedding_backends", "--worker", out_path],
+                env=env, capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(f"[{label}] failed:\n{proc.stderr.strip()}")
+                continue
+
+            results[label] = json.loads(proc.stdout.strip().splitlines()[-1])
+            vectors[label] = np.load(out_path)
+
+    if REFERENCE not in vectors:
+        print("Reference backend did not run, nothing to compare")
+        return False
+
+    ok = True
+    ref = vectors[REFERENCE]
+
+    print(f"{'backend':<12}{'load s':>8}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'cos mean':>10}{'cos min':>9}")
+    for label, stats in results.items():
+        # vectors are L2-normalised, so the row-wise dot is the cosine
+        cos = np.sum(vectors[label] * ref, axis=1)
+        passed = cos.min() >= MIN_COSINE
+        ok = ok and passed
+        print(
+            f"{label:<12}{stats['load_s']:>8.2f}{stats['rss_mb']:>9.0f}"
+            f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+            f"{cos.mean():>10.4f}{cos.min():>9.4f}"
+            f"{'' if passed else '  <-- below ' + str(MIN_COSINE)}"
+        )
+
+    return ok
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[2])
+    else:
+        sys.exit(0 if run_benchmark() else 1)
@@ -0,0 +1,71 @@
+import random
+import time
+from typing import List
+
+from indexing.embeddings import embed_text, embed_texts
+
+# =========================
+# Config
+# =========================
+
+BATCH_SIZES = [1, 16, 64, 256]
+NUM_CHUNKS = 512
+WORDS_PER_CHUNK = 200
+SEED = 13
+
+VOCAB = (
+    "model data learning neural network training loss gradient layer "
+    "attention transformer token embedding vector search index query "
+    "document retrieval ranking feature weight bias optimizer epoch "
+    "batch softmax activation convolution recurrent sequence language"
+).split()
+
+# =========================
+# Fixed Corpus
+# =========================
+
+def build_corpus(num_chunks: int = NUM_CHUNKS, words_per_chunk: int = WORDS_PER_CHUNK) -> List[str]:
+    rng = random.Random(SEED)
+    return [
+        " ".join(rng.choice(VOCAB) for _ in range(words_per_chunk))
+        for _ in range(num_chunks)
+    ]
+
+# =========================
+# Benchmark
+# =========================
+
+def bench_single(corpus: List[str]) -> float:
+    start = time.perf_counter()
+    for chunk in corpus:
+        embed_text(chunk)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def bench_batched(corpus: List[str], batch_size: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(corpus), batch_size):
+        embed_texts(corpus[i:i + batch_size], batch_size=batch_size)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def run_benchmark():
+    corpus = build_corpus()
+
+    # warmup so the first timed run does not pay for lazy init
+    embed_texts(corpus[:8])
+
+    print(f"Corpus: {len(corpus)} chunks x {WORDS_PER_CHUNK} words")
+    print(f"{'mode':<22}{'chunks/sec':>12}")
+    print(f"{'embed_text (loop)':<22}{bench_single(corpus):>12.1f}")
+
+    for batch_size in BATCH_SIZES:
+        rate = bench_batched(corpus, batch_size)
+        print(f"{'embed_texts bs=' + str(batch_size):<22}{rate:>12.1f}")
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,636 @@
+"""
+Offline retrieval benchmark: latency, throughput, payload and relevance.
+
+Replays a query file against hybrid_document_search_rrf and reports, per
+concurrency level, p50/p95/p99 latency and QPS, plus ES payload bytes
+per query and recall@k / nDCG@k against a qrels file. Over HTTP the
+bytes are the API response body instead (api_bytes_per_query), so the
+two are never compared with each other.
+
+    # in-process against the live index
+    python -m scripts.bench_retrieval --queries queries.jsonl --qrels qrels.tsv --output run.json
+
+    # over HTTP against a running API (disable its result cache first)
+    python -m scripts.bench_retrieval --target http --url http://127.0.0.1:8000 ...
+
+    # no Elasticsearch at all: in-memory stand-in over a corpus file
+    python -m scripts.bench_retrieval --backend memory --corpus chunks.jsonl ...
+
+    # what changed between two runs
+    python -m scripts.bench_retrieval --compare before.json after.json
+
+Files:
+    queries  JSONL {"query_id", "query", "document_type"?}, or one query per line
+    qrels    TREC format "query_id 0 chunk_id relevance"; ids may also be
+             doc ids (judged per document, first chunk counts)
+    corpus   JSONL of chunk docs ({"chunk_id", "doc_id", "chunk_index",
+             "chunk_text", ...}); embedded on load
+
+Without --queries / --corpus the parity fixture corpus and queries are used.
+
+The warmup and relevance passes fill the query embedding cache, which
+would hide encode time from the latency levels. In-process runs
+therefore clear it before each level by default (--embed-cache cold;
+later rounds of a level reuse it), or bypass it entirely
+(--embed-cache off), or keep it (--embed-cache warm). The choice is
+recorded in the report config.
+"""
+import re
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+import backend.search as search
+import indexing.embeddings as embeddings
+from indexing.embeddings import embed_texts
+from scripts.check_hybrid_parity import FIXTURE_CHUNKS, FIXTURE_QUERIES
+
+# =========================
+# Config
+# =========================
+
+DEFAULT_CONCURRENCY = "1,4,16"
+DEFAULT_K = 10
+WARMUP_QUERIES = 5
+HTTP_TIMEOUT = 30
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+_TOKEN = re.compile(r"\w+")
+_CHUNK_ID = re.compile(r"_c\d+$")
+
+
+# =========================
+# Inputs
+# =========================
+
+def load_queries(path: Optional[str]) -> List[Dict[str, Any]]:
+    if path is None:
+        return [
+            {"query_id": f"q{i}", "query": query, "document_type": document_type}
+            for i, (query, document_type) in enumerate(FIXTURE_QUERIES)
+        ]
+
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line) if line.startswith("{") else {"query": line}
+            row.setdefault("query_id", f"q{i}")
+            row.setdefault("document_type", None)
+            queries.append(row)
+    return queries
+
+
+def load_qrels(path: Optional[str]) -> Dict[str, Dict[str, int]]:
+    """query_id -> {chunk_id or doc_id: relevance}"""
+    qrels: Dict[str, Dict[str, int]] = {}
+    if path is None:
+        return qrels
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 4:
+                continue
+            query_id, _, doc, rel = parts
+            qrels.setdefault(query_id, {})[doc] = int(rel)
+    return qrels
+
+
+def load_corpus(path: Optional[str]) -> List[Dict[str, Any]]:
+    if path is None:
+        return [
+            {
+                "chunk_id": f"{doc_id}_c{idx}",
+                "doc_id": doc_id,
+                "title": doc_id,
+                "document_type": document_type,
+                "chunk_index": idx,
+                "chunk_text": text,
+                "snippet": text[:100],
+            }
+            for idx, (doc_id, document_type, text) in enumerate(FIXTURE_CHUNKS)
+        ]
+
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# =========================
+# Payload Meter
+# =========================
+
+class PayloadMeter:
+    """ES response bytes, attributed to the thread (= query) that made the request."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.bytes = 0
+
+    def add(self, nbytes: int):
+        self._local.bytes = getattr(self._local, "bytes", 0) + nbytes
+
+    def take(self) -> int:
+        nbytes = getattr(self._local, "bytes", 0)
+        self._local.bytes = 0
+        return nbytes
+
+
+payload_meter = PayloadMeter()
+
+
+def meter_es_client(es):
+    # every API call (and every .options() copy) goes through the shared transport
+    transport = es.transport
+    perform_request = transport.perform_request
+
+    def metered(*args, **kwargs):
+        res = perform_request(*args, **kwargs)
+        payload_meter.add(len(json.dumps(res.body).encode("utf-8")))
+        return res
+
+    transport.perform_request = metered
+
+
+# =========================
+# In-Memory Stand-In
+# =========================
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class InMemoryES:
+    """
+    Just enough of the Elasticsearch API for search.py: BM25 `match`
+    (operator and) with a document_type filter, brute-force cosine kNN,
+    msearch, the rrf retriever and mget. Scores follow ES (BM25 with
+    k1=1.2, b=0.75; cosine as (1 + cos) / 2), so rankings are close to,
+    not identical with, a real index.
+    """
+
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.docs = {c["chunk_id"]: c for c in chunks}
+        self.ids = list(self.docs)
+
+        self.term_freqs = [Counter(_tokens(self.docs[i]["chunk_text"])) for i in self.ids]
+        self.lengths = np.array([sum(tf.values()) for tf in self.term_freqs], dtype=np.float32)
+        self.avg_length = float(self.lengths.mean()) if self.ids else 0.0
+        self.doc_freq = Counter(term for tf in self.term_freqs for term in tf)
+
+        vectors = embed_texts([self.docs[i]["chunk_text"] for i in self.ids])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.maximum(norms, 1e-12)
+
+    # ---- helpers ----
+
+    def _allowed(self, filters: List[Dict[str, Any]]) -> List[int]:
+        rows = range(len(self.ids))
+        for f in filters:
+            (field, value), = f["term"].items()
+            rows = [r for r in rows if self.docs[self.ids[r]].get(field) == value]
+        return list(rows)
+
+    def _source(self, chunk_id: str, source) -> Any:
+        doc = self.docs[chunk_id]
+        if source is False:
+            return None
+        if isinstance(source, dict):
+            return {k: doc[k] for k in source.get("includes", doc) if k in doc and k != "embedding"}
+        return dict(doc)
+
+    def _hits(self, scored: List[Tuple[int, float]], size: int, source) -> List[Dict[str, Any]]:
+        scored = sorted(scored, key=lambda s: -s[1])[:size]
+        hits = []
+        for row, score in scored:
+            hit = {"_index": "memory", "_id": self.ids[row], "_score": score}
+            if source is not False:
+                hit["_source"] = self._source(self.ids[row], source)
+            hits.append(hit)
+        return hits
+
+    def _bm25(self, query: Dict[str, Any]) -> List[Tuple[int, float]]:
+        bool_query = query["bool"]
+        terms = _tokens(bool_query["must"][0]["match"]["chunk_text"]["query"])
+        n = len(self.ids)
+
+        scored = []
+        for row in self._allowed(bool_query.get("filter", [])):
+            tf = self.term_freqs[row]
+            if not terms or any(t not in tf for t in terms):  # operator: and
+                continue
+            score = 0.0
+            for t in terms:
+                idf = math.log(1 + (n - self.doc_freq[t] + 0.5) / (self.doc_freq[t] + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[row] / self.avg_length)
+                score += idf * tf[t] * (BM25_K1 + 1) / (tf[t] + norm)
+            scored.append((row, float(score)))
+        return scored
+
+    def _knn(self, knn: Dict[str, Any]) -> List[Tuple[int, float]]:
+        rows = self._allowed(knn.get("filter", []))
+        if not rows:
+            return []
+        query = np.asarray(knn["query_vector"], dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        sims = self.vectors[rows] @ query
+        scored = [(row, float((1 + s) / 2)) for row, s in zip(rows, sims)]
+        return sorted(scored, key=lambda s: -s[1])[:knn["k"]]
+
+    def _respond(self, res: Dict[str, Any], start: float) -> Dict[str, Any]:
+        res["took"] = int((time.perf_counter() - start) * 1000)
+        payload_meter.add(len(json.dumps(res).encode("utf-8")))
+        return res
+
+    def _search(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        source = body.get("_source", True)
+
+        if "retriever" in body:
+            rrf = body["retriever"]["rrf"]
+            window = rrf["rank_window_size"]
+            fused: Dict[int, float] = {}
+            for retriever in rrf["retrievers"]:
+                if "knn" in retriever:
+                    scored = self._knn(retriever["knn"])
+                else:
+                    scored = self._bm25(retriever["standard"]["query"])
+                ranked = sorted(scored, key=lambda s: -s[1])[:window]
+                for rank, (row, _) in enumerate(ranked, start=1):
+                    fused[row] = fused.get(row, 0.0) + 1.0 / (rrf["rank_constant"] + rank)
+            hits = self._hits(list(fused.items()), body["size"], source)
+        elif "knn" in body:
+            hits = self._hits(self._knn(body["knn"]), body["size"], source)
+        else:
+            hits = self._hits(self._bm25(body["query"]), body["size"], source)
+
+        took = int((time.perf_counter() - start) * 1000)
+        return {"took": took, "hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+    # ---- API ----
+
+    def search(self, index=None, body=None, **_):
+        start = time.perf_counter()
+        return self._respond(self._search(body), start)
+
+    def msearch(self, searches=None, **_):
+        start = time.perf_counter()
+        responses = [self._search(body) for body in searches[1::2]]
+        return self._respond({"responses": responses}, start)
+
+    def mget(self, index=None, ids=None, source_includes=None, **_):
+        start = time.perf_counter()
+        source = {"includes": source_includes} if source_includes else True
+        docs = [
+            {"_id": i, "found": True, "_source": self._source(i, source)} if i in self.docs
+            else {"_id": i, "found": False}
+            for i in ids
+        ]
+        return self._respond({"docs": docs}, start)
+
+
+class StaticIndexMeta:
+    """Stands in for IndexMetaTracker: no PCA projection, fixed generation."""
+
+    def current_sync(self) -> Dict[str, Any]:
+        return {}
+
+    async def current(self) -> Dict[str, Any]:
+        return {}
+
+
+def use_in_memory_backend(chunks: List[Dict[str, Any]]):
+    stand_in = InMemoryES(chunks)
+    search.get_es = lambda: stand_in
+    search.index_meta = StaticIndexMeta()
+    print(f"[BENCH] in-memory stand-in with {len(chunks)} chunks")
+
+
+# =========================
+# Targets
+# =========================
+
+def result_id(result: Dict[str, Any]) -> str:
+    return f"{result['doc_id']}_c{result['chunk_index']}"
+
+
+def make_inprocess_runner(top_n: int, mode: Optional[str], num_candidates: int):
+    def run(query: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+        payload_meter.reset()
+        results = search.hybrid_document_search_rrf(
+            query["query"], top_n=top_n, document_type=query.get("document_type"),
+            mode=mode, num_candidates=num_candidates
+        )
+        return results, payload_meter.take()
+    return run
+
+
+def make_http_runner(url: str, top_n: int, num_candidates: int):
+    def run(query: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
+        params = {"query": query["query"], "top_n": top_n, "num_candidates": num_candidates}
+        if query.get("document_type"):
+            params["document_type"] = query["document_type"]
+
+        with urllib.request.urlopen(f"{url.rstrip('/')}/search?{urllib.parse.urlencode(params)}", timeout=HTTP_TIMEOUT) as resp:
+            body = resp.read()
+        return json.loads(body), len(body)  # the API body, not ES payload: api_bytes_per_query
+    return run
+
+
+# =========================
+# Measurement
+# =========================
+
+# In-process runs meter the ES responses, HTTP runs the API response body
+BYTES_METRICS = {"inprocess": "payload_bytes_per_query", "http": "api_bytes_per_query"}
+
+
+def bytes_metric(level: Dict[str, Any]) -> str:
+    # reports written before HTTP runs had their own key only have the ES one
+    return next((key for key in BYTES_METRICS.values() if key in level), BYTES_METRICS["inprocess"])
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def timed_run(runner, query: Dict[str, Any]) -> Tuple[float, List[Dict[str, Any]], int]:
+    start = time.perf_counter()
+    results, nbytes = runner(query)
+    return (time.perf_counter() - start) * 1000, results, nbytes
+
+
+def run_level(
+    runner,
+    queries: List[Dict[str, Any]],
+    concurrency: int,
+    rounds: int,
+    target: str = "inprocess"
+) -> Dict[str, Any]:
+    work = [q for _ in range(rounds) for q in queries]
+    latencies, payloads = [], []
+    errors = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        futures = [pool.submit(timed_run, runner, q) for q in work]
+        for future in futures:
+            try:
+                ms, _, nbytes = future.result()
+            except Exception as e:
+                errors += 1
+                print(f"[BENCH] query failed: {e!r}")
+                continue
+            latencies.append(ms)
+            payloads.append(nbytes)
+        wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "queries": len(work),
+        "errors": errors,
+        "qps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        BYTES_METRICS[target]: round(sum(payloads) / len(payloads)) if payloads else 0,
+    }
+
+
+# =========================
+# Relevance
+# =========================
+
+def judged_ranking(result_ids: List[str], judged: Dict[str, int]) -> List[str]:
+    """Chunk ids as-is when qrels judge chunks, else collapsed to doc ids (first chunk counts)."""
+    if any(_CHUNK_ID.search(i) for i in judged):
+        return result_ids
+
+    seen, docs = set(), []
+    for chunk_id in result_ids:
+        doc_id = chunk_id.rsplit("_c", 1)[0]
+        if doc_id not in seen:
+            seen.add(doc_id)
+            docs.append(doc_id)
+    return docs
+
+
+def recall_at_k(ranking: List[str], judged: Dict[str, int], k: int) -> float:
+    relevant = {i for i, rel in judged.items() if rel > 0}
+    if not relevant:
+        return 0.0
+    return len(relevant & set(ranking[:k])) / len(relevant)
+
+
+def ndcg_at_k(ranking: List[str], judged: Dict[str, int], k: int) -> float:
+    dcg = sum(judged.get(i, 0) / math.log2(rank + 2) for rank, i in enumerate(ranking[:k]))
+    ideal = sorted((rel for rel in judged.values() if rel > 0), reverse=True)[:k]
+    idcg = sum(rel / math.log2(rank + 2) for rank, rel in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+
+def evaluate(runner, queries: List[Dict[str, Any]], qrels: Dict[str, Dict[str, int]], k: int) -> Dict[str, Any]:
+    per_query = {}
+    recalls, ndcgs = [], []
+
+    for query in queries:
+        results, _ = runner(query)
+        ids = [result_id(r) for r in results]
+        row: Dict[str, Any] = {"results": ids}
+
+        judged = qrels.get(query["query_id"])
+        if judged:
+            ranking = judged_ranking(ids, judged)
+            row["recall"] = round(recall_at_k(ranking, judged, k), 4)
+            row["ndcg"] = round(ndcg_at_k(ranking, judged, k), 4)
+            recalls.append(row["recall"])
+            ndcgs.append(row["ndcg"])
+
+        per_query[query["query_id"]] = row
+
+    return {
+        "k": k,
+        "judged_queries": len(recalls),
+        f"recall@{k}": round(sum(recalls) / len(recalls), 4) if recalls else None,
+        f"ndcg@{k}": round(sum(ndcgs) / len(ndcgs), 4) if ndcgs else None,
+        "per_query": per_query,
+    }
+
+
+# =========================
+# Report
+# =========================
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict[str, Any]):
+    bytes_label = "api B/q" if report["config"]["target"] == "http" else "es B/q"
+    print(f"\n{'concurrency':>11}{'qps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{bytes_label:>10}{'errors':>8}")
+    for level in report["latency"]:
+        print(
+            f"{level['concurrency']:>11}{level['qps']:>9.1f}{level['p50_ms']:>9.1f}{level['p95_ms']:>9.1f}"
+            f"{level['p99_ms']:>9.1f}{level[bytes_metric(level)]:>10}{level['errors']:>8}"
+        )
+
+    relevance = report["relevance"]
+    k = relevance["k"]
+    if relevance["judged_queries"]:
+        print(f"\nrecall@{k} {relevance[f'recall@{k}']:.4f}  ndcg@{k} {relevance[f'ndcg@{k}']:.4f}  ({relevance['judged_queries']} judged queries)")
+    else:
+        print("\nno qrels for these queries, relevance not measured")
+
+
+def compare_reports(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{before_path} ({before['config'].get('revision')}) -> {after_path} ({after['config'].get('revision')})")
+    for key in sorted(set(before["config"]) | set(after["config"])):
+        if before["config"].get(key) != after["config"].get(key):
+            print(f"  config {key}: {before['config'].get(key)} -> {after['config'].get(key)}")
+
+    old_levels = {level["concurrency"]: level for level in before["latency"]}
+    for level in after["latency"]:
+        old = old_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        deltas = []
+        same_bytes = bytes_metric(level) == bytes_metric(old)
+        for metric in ("qps", "p50_ms", "p95_ms", "p99_ms") + ((bytes_metric(level),) if same_bytes else ()):
+            change = (level[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            deltas.append(f"{metric} {old[metric]} -> {level[metric]} ({change:+.1f}%)")
+        if not same_bytes:
+            deltas.append(f"{bytes_metric(old)} vs {bytes_metric(level)} not comparable")
+        print(f"  c={level['concurrency']}: " + ", ".join(deltas))
+
+    k = after["relevance"]["k"]
+    for metric in (f"recall@{k}", f"ndcg@{k}"):
+        print(f"  {metric}: {before['relevance'].get(metric)} -> {after['relevance'].get(metric)}")
+
+    changed = [
+        query_id for query_id, row in after["relevance"]["per_query"].items()
+        if before["relevance"]["per_query"].get(query_id, {}).get("results") != row["results"]
+    ]
+    print(f"  rankings changed for {len(changed)} of {len(after['relevance']['per_query'])} queries")
+
+
+# =========================
+# Benchmark
+# =========================
+
+def run_benchmark(args) -> Dict[str, Any]:
+    queries = load_queries(args.queries)
+    qrels = load_qrels(args.qrels)
+
+    if args.target == "http":
+        runner = make_http_runner(args.url, args.top_n, args.num_candidates)
+    else:
+        if args.backend == "memory":
+            use_in_memory_backend(load_corpus(args.corpus))
+        else:
+            meter_es_client(search.get_es())
+        runner = make_inprocess_runner(args.top_n, args.mode, args.num_candidates)
+        if args.embed_cache == "off":
+            embeddings.EMBED_CACHE_SIZE = 0
+
+    for query in queries[:WARMUP_QUERIES]:
+        runner(query)
+
+    relevance = evaluate(runner, queries, qrels, args.k)
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    latency = []
+    for concurrency in levels:
+        print(f"[BENCH] concurrency {concurrency}: {len(queries) * args.rounds} queries")
+        if args.target == "inprocess" and args.embed_cache == "cold":
+            embeddings.query_cache.clear()
+        latency.append(run_level(runner, queries, concurrency, args.rounds, args.target))
+
+    report = {
+        "config": {
+            "revision": git_revision(),
+            "target": args.target,
+            "backend": None if args.target == "http" else args.backend,
+            "mode": args.mode or search.HYBRID_MODE,
+            "top_n": args.top_n,
+            "num_candidates": args.num_candidates,
+            "retrieval_size": search.RETRIEVAL_SIZE,
+            "two_phase_fetch": search.TWO_PHASE_FETCH,
+            "queries": len(queries),
+            "rounds": args.rounds,
+            "embed_cache_size": None if args.target == "http" else embeddings.EMBED_CACHE_SIZE,
+            "embed_cache": "server" if args.target == "http" else args.embed_cache,
+        },
+        "latency": latency,
+        "relevance": relevance,
+    }
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nwrote {args.output}")
+    return report
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval latency / throughput / relevance benchmark")
+    parser.add_argument("--queries", default=None, help="JSONL or one query per line (default: parity fixture)")
+    parser.add_argument("--qrels", default=None, help="TREC qrels: query_id 0 chunk_or_doc_id relevance")
+    parser.add_argument("--target", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--backend", choices=("es", "memory"), default="es", help="in-process only")
+    parser.add_argument("--corpus", default=None, help="chunk JSONL for --backend memory (default: parity fixture)")
+    parser.add_argument("--mode", choices=search.HYBRID_MODES, default=None, help="in-process only, default HYBRID_MODE")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_K)
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="cutoff for recall@k / nDCG@k")
+    parser.add_argument("--num-candidates", type=int, default=search.NUM_CANDIDATES)
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="comma-separated levels")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the query file per level")
+    parser.add_argument(
+        "--embed-cache", choices=("cold", "off", "warm"), default="cold",
+        help="in-process only: query embedding cache cleared before each level, bypassed, or left warm"
+    )
+    parser.add_argument("--output", default=None, help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two JSON reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        sys.exit(0)
+
+    run_benchmark(args)
@@ -0,0 +1,92 @@
+import json
+import time
+from typing import Dict, Any, List, Tuple
+
+import backend.search as search
+from backend.latency_budget import ES_REQUEST_TIMEOUT
+from indexing.create_index import get_es, INDEX_NAME
+from indexing.embeddings import embed_text
+
+# =========================
+# Config
+# =========================
+
+TOP_N = 10
+
+BENCH_QUERIES = [
+    "what is machine learning",
+    "explain neural networks",
+    "what is gradient descent",
+    "what is attention mechanism",
+    "what is word embeddings",
+]
+
+# =========================
+# Payload Measurement
+# =========================
+
+def measure(body: Dict[str, Any]) -> Tuple[int, float, List[str]]:
+    """Returns (response bytes, json decode ms, hit ids) for one search body."""
+    res = get_es().search(index=INDEX_NAME, body=body, request_timeout=ES_REQUEST_TIMEOUT)
+    payload = json.dumps(res.body).encode("utf-8")
+
+    start = time.perf_counter()
+    json.loads(payload)
+    decode_ms = (time.perf_counter() - start) * 1000
+
+    return len(payload), decode_ms, [hit["_id"] for hit in res["hits"]["hits"]]
+
+
+def run_query(query: str, source) -> Tuple[int, float]:
+    query_vector = embed_text(query)
+
+    bm25_body = search.build_bm25_body(query, size=search.RETRIEVAL_SIZE)
+    vector_body = search.build_vector_body(query_vector, k=search.RETRIEVAL_SIZE)
+    bm25_body["_source"] = source
+    vector_body["_source"] = source
+
+    total_bytes, total_ms = 0, 0.0
+    ids: List[str] = []
+    for body in (bm25_body, vector_body):
+        nbytes, ms, hit_ids = measure(body)
+        total_bytes += nbytes
+        total_ms += ms
+        ids.extend(hit_ids)
+
+    if source is False and ids:
+        # phase two: one mget for the final top_n
+        res = get_es().mget(index=INDEX_NAME, ids=ids[:TOP_N], source_includes=search.RESULT_SOURCE_FIELDS)
+        payload = json.dumps(res.body).encode("utf-8")
+        start = time.perf_counter()
+        json.loads(payload)
+        total_ms += (time.perf_counter() - start) * 1000
+        total_bytes += len(payload)
+
+    return total_bytes, total_ms
+
+
+def run_benchmark():
+    modes = {
+        "full _source": True,
+        "trimmed _source": {"includes": search.RESULT_SOURCE_FIELDS, "excludes": ["embedding"]},
+        "ids only + mget": False,
+    }
+
+    print(f"{'mode':<20}{'bytes/query':>14}{'decode ms/query':>18}")
+    for name, source in modes.items():
+        total_bytes, total_ms = 0, 0.0
+
+        for query in BENCH_QUERIES:
+            nbytes, ms = run_query(query, source)
+            total_bytes += nbytes
+            total_ms += ms
+
+        n = len(BENCH_QUERIES)
+        print(f"{name:<20}{total_bytes / n:>14.0f}{total_ms / n:>18.2f}")
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    run_benchmark()
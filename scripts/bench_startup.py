@@ -0,0 +1,58 @@
+"""
+Measure import time and time to first query for the API modules.
+
+Each measurement runs in a fresh interpreter so nothing is already
+imported or loaded. Run it on two commits to compare before/after.
+
+    python -m scripts.bench_startup
+"""
+import sys
+import json
+import subprocess
+
+# =========================
+# Config
+# =========================
+
+RUNS = 3
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import backend.main
+t1 = time.perf_counter()
+from indexing.embeddings import embed_text
+embed_text("time to first query")
+t2 = time.perf_counter()
+embed_text("second query after warm model")
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_query_ms": (t2 - t1) * 1000,
+    "second_query_ms": (t3 - t2) * 1000,
+}))
+"""
+
+# =========================
+# Benchmark
+# =========================
+
+def run_probe():
+    proc = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark():
+    runs = [run_probe() for _ in range(RUNS)]
+
+    print(f"{'metric':<18}{'min ms':>10}{'max ms':>10}")
+    for metric in ("import_ms", "first_query_ms", "second_query_ms"):
+        values = [r[metric] for r in runs]
+        print(f"{metric:<18}{min(values):>10.1f}{max(values):>10.1f}")
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,218 @@
+"""
+Recall@k vs latency vs index size for the vector index options.
+
+Vectors come from the project's own chunks (read from the live index,
+embedded through the embedding store). For every (index type, PCA dims)
+combination a temporary index is built, queried at several
+num_candidates values and compared against an exact brute-force top-k
+on the full 384-dim vectors, so PCA loss shows up in recall too.
+
+    python -m scripts.bench_vector_index [--max-chunks 20000] [--json out.json]
+"""
+import json
+import time
+import random
+import argparse
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from elasticsearch import helpers
+
+from backend.latency_budget import ES_REQUEST_TIMEOUT
+from indexing.create_index import get_es, build_index_body, INDEX_NAME, HNSW_M, HNSW_EF_CONSTRUCTION, EMBEDDING_DIMS
+from indexing.embeddings import embed_texts
+from indexing.embedding_store import embed_with_store
+from indexing.pca import fit_pca
+
+# =========================
+# Config
+# =========================
+
+INDEX_TYPES = ["hnsw", "int8_hnsw", "int4_hnsw"]
+PCA_DIMS = [None, 128]
+NUM_CANDIDATES = [50, 100, 200, 500]
+K = 10
+SAMPLED_QUERIES = 50  # chunk snippets used as extra queries
+BENCH_PREFIX = f"{INDEX_NAME}_vecbench"
+
+# bytes per dimension kept in RAM for HNSW search
+BYTES_PER_DIM = {"hnsw": 4, "int8_hnsw": 1, "int4_hnsw": 0.5}
+
+BENCH_QUERIES = [
+    "what is machine learning",
+    "explain neural networks",
+    "what is gradient descent",
+    "what is attention mechanism",
+    "what is word embeddings",
+]
+
+# =========================
+# Corpus
+# =========================
+
+def load_corpus(max_chunks: int):
+    """Chunk ids and full-size vectors for up to max_chunks indexed chunks."""
+    ids, texts = [], []
+    for hit in helpers.scan(
+        get_es(),
+        index=INDEX_NAME,
+        query={"_source": ["chunk_text"], "query": {"match_all": {}}}
+    ):
+        ids.append(hit["_id"])
+        texts.append(hit["_source"].get("chunk_text", ""))
+        if len(ids) >= max_chunks:
+            break
+
+    return ids, texts, embed_with_store(texts)
+
+
+def build_queries(texts: List[str]) -> List[str]:
+    rng = random.Random(0)
+    sampled = rng.sample(texts, min(SAMPLED_QUERIES, len(texts)))
+    # first ~20 words of a chunk reads like a (long) user query
+    return BENCH_QUERIES + [" ".join(t.split()[:20]) for t in sampled]
+
+
+def exact_top_k(vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    # vectors are L2-normalised, so dot product == cosine
+    scores = query_vectors @ vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+# =========================
+# Bench Index
+# =========================
+
+def build_bench_index(name: str, ids: List[str], vectors: np.ndarray, index_type: str):
+    es = get_es()
+    if es.indices.exists(index=name):
+        es.indices.delete(index=name)
+
+    body = build_index_body(
+        dims=vectors.shape[1],
+        index_options={"type": index_type, "m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION}
+    )
+    body["settings"].update({"number_of_replicas": 0, "refresh_interval": "-1"})
+    es.indices.create(index=name, body=body)
+
+    actions = (
+        {"_index": name, "_id": chunk_id, "_source": {"chunk_id": chunk_id, "embedding": vector.tolist()}}
+        for chunk_id, vector in zip(ids, vectors)
+    )
+    helpers.bulk(es, actions, chunk_size=500, request_timeout=120)
+
+    es.indices.refresh(index=name)
+    # one segment, like an index after scripts/reindex.py
+    es.indices.forcemerge(index=name, max_num_segments=1, request_timeout=600)
+
+
+def index_size_bytes(name: str) -> int:
+    stats = get_es().indices.stats(index=name, metric="store")
+    return stats["indices"][name]["primaries"]["store"]["size_in_bytes"]
+
+
+def run_queries(name: str, query_vectors: np.ndarray, num_candidates: int, ids: List[str], truth: np.ndarray):
+    es = get_es()
+    id_to_row = {chunk_id: i for i, chunk_id in enumerate(ids)}
+    latencies, recalls = [], []
+
+    for query_vector, expected in zip(query_vectors, truth):
+        body = {
+            "size": K,
+            "_source": False,
+            "knn": {
+                "field": "embedding",
+                "query_vector": query_vector.tolist(),
+                "k": K,
+                "num_candidates": max(num_candidates, K)
+            }
+        }
+
+        start = time.perf_counter()
+        res = es.search(index=name, body=body, request_timeout=ES_REQUEST_TIMEOUT)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        got = {id_to_row[hit["_id"]] for hit in res["hits"]["hits"]}
+        recalls.append(len(got & set(expected.tolist())) / K)
+
+    return float(np.mean(recalls)), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+# =========================
+# Benchmark
+# =========================
+
+def run_benchmark(max_chunks: int, json_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    ids, texts, vectors = load_corpus(max_chunks)
+    if len(ids) < K:
+        raise SystemExit(f"Only {len(ids)} chunks in '{INDEX_NAME}', index some documents first")
+
+    queries = build_queries(texts)
+    query_vectors = embed_texts(queries)
+    truth = exact_top_k(vectors, query_vectors, K)
+    print(f"{len(ids)} chunks, {len(queries)} queries, k={K}")
+
+    rows = []
+    created = []
+    try:
+        for pca_dims in PCA_DIMS:
+            if pca_dims:
+                projection = fit_pca(vectors, pca_dims)
+                index_vectors = projection.project(vectors)
+                index_queries = projection.project(query_vectors)
+            else:
+                index_vectors, index_queries = vectors, query_vectors
+
+            dims = index_vectors.shape[1]
+            for index_type in INDEX_TYPES:
+                name = f"{BENCH_PREFIX}_{index_type}_{dims}"
+                created.append(name)
+
+                t0 = time.perf_counter()
+                build_bench_index(name, ids, index_vectors, index_type)
+                build_s = time.perf_counter() - t0
+                size = index_size_bytes(name)
+
+                for num_candidates in NUM_CANDIDATES:
+                    # once untimed so the graph is loaded
+                    run_queries(name, index_queries[:5], num_candidates, ids, truth[:5])
+                    recall, p50, p95 = run_queries(name, index_queries, num_candidates, ids, truth)
+                    rows.append({
+                        "index_type": index_type,
+                        "dims": dims,
+                        "num_candidates": num_candidates,
+                        f"recall@{K}": round(recall, 4),
+                        "p50_ms": round(p50, 2),
+                        "p95_ms": round(p95, 2),
+                        "index_bytes": size,
+                        "vector_ram_bytes": int(len(ids) * dims * BYTES_PER_DIM[index_type]),
+                        "build_s": round(build_s, 1),
+                    })
+    finally:
+        for name in created:
+            get_es().indices.delete(index=name, ignore_unavailable=True)
+
+    print(f"{'type':<11}{'dims':>6}{'cands':>7}{f'recall@{K}':>11}{'p50 ms':>9}{'p95 ms':>9}{'index MB':>10}{'vec RAM MB':>12}")
+    for row in rows:
+        print(
+            f"{row['index_type']:<11}{row['dims']:>6}{row['num_candidates']:>7}{row[f'recall@{K}']:>11.3f}"
+            f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['index_bytes'] / 1e6:>10.1f}"
+            f"{row['vector_ram_bytes'] / 1e6:>12.1f}"
+        )
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"chunks": len(ids), "queries": len(queries), "k": K, "full_dims": EMBEDDING_DIMS, "results": rows}, f, indent=2)
+        print(f"Wrote {json_path}")
+
+    return rows
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vector index options: recall vs latency vs size")
+    parser.add_argument("--max-chunks", type=int, default=20000)
+    parser.add_argument("--json", default=None, help="also write results as JSON")
+    args = parser.parse_args()
+
+    run_benchmark(args.max_chunks, args.json)
@@ -0,0 +1,143 @@
+"""
+Parity check for the hybrid retrieval modes.
+
+Indexes a small fixture corpus into a throwaway index, then runs every
+query through the `client`, `msearch` and `es_rrf` modes and checks that
+each returns the same fused ranking as the Python reciprocal_rank_fusion.
+
+    python -m scripts.check_hybrid_parity
+
+tests/test_hybrid_request_bodies.py runs the same fixture offline, but
+against an in-memory stand-in that fuses by itself; only this script
+checks the cluster's own rrf retriever.
+"""
+import sys
+from typing import List, Dict, Any, Tuple
+
+import backend.search as search
+from backend.index_meta import IndexMetaTracker
+from indexing.create_index import get_es, INDEX_MAPPING, INDEX_NAME
+from indexing.embeddings import embed_texts
+
+# =========================
+# Fixture Corpus
+# =========================
+
+PARITY_INDEX = f"{INDEX_NAME}_parity"
+
+FIXTURE_CHUNKS = [
+    ("ml", "book", "Machine learning is the study of algorithms that improve through experience and data."),
+    ("ml", "book", "Supervised learning fits a model to labelled examples, unsupervised learning finds structure without labels."),
+    ("ml", "book", "Overfitting happens when a model memorises training data and fails to generalise; cross validation detects it."),
+    ("dl", "book", "Deep learning stacks many neural network layers and trains them with gradient descent and backpropagation."),
+    ("dl", "book", "Convolutional neural networks share weights across spatial positions and are used for images."),
+    ("dl", "paper", "The transformer model replaces recurrence with self attention over all tokens of the sequence."),
+    ("dl", "paper", "The attention mechanism computes a weighted sum of values using query and key similarity."),
+    ("nlp", "blog", "Word embeddings map words to dense vectors so that similar words are close together."),
+    ("nlp", "blog", "Natural language processing covers tokenisation, tagging, parsing, translation and question answering."),
+    ("rl", "paper", "Reinforcement learning trains an agent to maximise reward by interacting with an environment."),
+    ("rl", "paper", "Policy gradient methods optimise the expected reward directly with respect to policy parameters."),
+    ("ai", "blog", "Artificial intelligence is the broader field; machine learning is one approach to building AI systems."),
+]
+
+FIXTURE_QUERIES = [
+    ("what is machine learning", None),
+    ("explain neural networks", None),
+    ("attention mechanism in transformer model", "paper"),
+    ("word embeddings", "blog"),
+    ("reward", None),
+]
+
+MODES = ("client", "msearch", "es_rrf")
+
+# =========================
+# Setup
+# =========================
+
+def index_fixture():
+    es = get_es()
+    if es.indices.exists(index=PARITY_INDEX):
+        es.indices.delete(index=PARITY_INDEX)
+    es.indices.create(index=PARITY_INDEX, body=INDEX_MAPPING)
+
+    vectors = embed_texts([text for _, _, text in FIXTURE_CHUNKS])
+    for idx, ((doc_id, document_type, text), vector) in enumerate(zip(FIXTURE_CHUNKS, vectors)):
+        es.index(index=PARITY_INDEX, id=f"{doc_id}_c{idx}", document={
+            "chunk_id": f"{doc_id}_c{idx}",
+            "doc_id": doc_id,
+            "title": doc_id,
+            "document_type": document_type,
+            "chunk_index": idx,
+            "chunk_text": text,
+            "snippet": text[:100],
+            "embedding": vector.tolist(),
+        })
+
+    es.indices.refresh(index=PARITY_INDEX)
+
+# =========================
+# Parity
+# =========================
+
+def reference_ranking(query: str, document_type) -> List[Tuple[str, int, float]]:
+    bm25_hits = search.bm25_search(query, size=search.RETRIEVAL_SIZE, document_type=document_type)["hits"]["hits"]
+    query_vector = search.embed_text(query)
+    vector_hits = search.vector_search(query_vector, k=search.RETRIEVAL_SIZE, document_type=document_type)["hits"]["hits"]
+
+    fused = search.reciprocal_rank_fusion(bm25_hits, vector_hits, k=search.RRF_K)
+    lookup = search.fetch_sources(list(fused))
+
+    return normalise([
+        {"doc_id": lookup[_id]["doc_id"], "chunk_index": lookup[_id]["chunk_index"], "rrf_score": score}
+        for _id, score in fused.items()
+    ])
+
+
+def normalise(results: List[Dict[str, Any]]) -> List[Tuple[str, int, float]]:
+    # Sort by score then id so ties do not depend on set/hit order
+    rows = [(r["doc_id"], r["chunk_index"], round(r["rrf_score"], 6)) for r in results]
+    return sorted(rows, key=lambda r: (-r[2], r[0], r[1]))
+
+
+def check_parity() -> bool:
+    ok = True
+
+    for query, document_type in FIXTURE_QUERIES:
+        expected = reference_ranking(query, document_type)
+
+        for mode in MODES:
+            got = normalise(search.hybrid_document_search_rrf(
+                query,
+                top_n=len(FIXTURE_CHUNKS),
+                document_type=document_type,
+                min_rrf_score=0.0,
+                mode=mode
+            ))
+
+            status = "OK" if got == expected else "MISMATCH"
+            ok = ok and got == expected
+            print(f"[{status}] mode={mode:<8} type={document_type or '-':<6} query={query!r}")
+
+            if got != expected:
+                print(f"    expected: {expected}")
+                print(f"    got:      {got}")
+
+    return ok
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    search.INDEX_NAME = PARITY_INDEX
+    search.index_meta = IndexMetaTracker(PARITY_INDEX)
+    index_fixture()
+    try:
+        passed = check_parity()
+    finally:
+        get_es().indices.delete(index=PARITY_INDEX)
+
+    if not search._es_rrf_supported:
+        print("Note: cluster rejected the rrf retriever, es_rrf was checked via its msearch fallback")
+
+    sys.exit(0 if passed else 1)
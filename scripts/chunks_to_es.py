@@ -1,12 +1,18 @@
 import os
 import uuid
+import argparse
 from datetime import datetime,timezone
-from typing import List
-from indexing.embeddings import embed_text
-from indexing.chunk_documents import chunk_text
-from indexing.preprocess import clean_text
-from indexing.create_index import es, INDEX_NAME
-from utils.cloudinary_upload import upload_chunk_to_cloudinary
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from indexing.embeddings import EMBED_BATCH_SIZE
+from indexing.embedding_store import embed_with_store, text_hash
+from indexing.chunk_documents import iter_chunks, chunker_version
+from indexing.preprocess import clean_text, iter_clean_pages, CLEANER_VERSIONS
+from indexing.create_index import get_es, INDEX_NAME, bump_index_generation, get_index_uuid, get_index_meta
+from indexing.index_state import IndexCheckpoint, document_hash, chunk_hash
+from indexing.pca import PCAProjection, load_projection
+from utils.chunk_html import chunk_to_html
+from utils.blob_store import ChunkUploader
+from utils.pipeline import prefetch, ProgressReporter
 
 from pymongo import MongoClient
 from elasticsearch import helpers
@@ -17,87 +23,407 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "ai_search"
 COLLECTION = "documents"
+PAGES_COLLECTION = "pages"
+
+# =========================
+# Pipeline Config
+# =========================
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100"))     # actions per bulk request
+BULK_THREADS = int(os.getenv("BULK_THREADS", "4"))             # parallel_bulk workers
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))  # items buffered per stage
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "10"))  # seconds
+MAX_REPORTED_FAILURES = 20
+MONGO_BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "100"))  # cursor batch (documents / pages)
+# upload -> chunk_url points at the blob store (Cloudinary by default)
+# local  -> no uploads, chunk_url points at the API's /chunks/{chunk_id}
+CHUNK_URLS = os.getenv("CHUNK_URLS", "upload")
+CHUNK_URL_BASE = os.getenv("CHUNK_URL_BASE", "http://127.0.0.1:8000")
+# document -> clean whole pages before chunking, chunk -> legacy clean_text per chunk
+TEXT_CLEANER = os.getenv("TEXT_CLEANER", "document")
+
+# Everything but the text; page text is read lazily per document
+DOCUMENT_PROJECTION = {"raw_text": 0}
 
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
 documents = db[COLLECTION]
+pages = db[PAGES_COLLECTION]
 
 
-def index_all_documents():
-    total_docs = documents.count_documents({})
-    print(f"Found {total_docs} documents in MongoDB")
+# =========================
+# Stage 1: Mongo cursor
+# =========================
 
-    actions = []
-    chunk_counter = 0
+def iter_documents(doc_filter: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    for doc in documents.find(doc_filter or {}, DOCUMENT_PROJECTION, batch_size=MONGO_BATCH_SIZE):
+        if doc.get("storage") != "pages":
+            # documents ingested as one raw_text blob: fetched one at a time
+            legacy = documents.find_one({"_id": doc["_id"]}, {"raw_text": 1})
+            doc["raw_text"] = (legacy or {}).get("raw_text", "")
+        yield doc
+
+
+def iter_doc_pages(doc: Dict[str, Any]) -> Iterator[Tuple[Optional[int], str]]:
+    """(page_number, text) in page order, read through a batched cursor."""
+    if doc.get("storage") != "pages":
+        yield None, doc.get("raw_text", "")
+        return
+
+    cursor = pages.find(
+        {"doc_id": doc["doc_id"]},
+        {"_id": 0, "page_number": 1, "text": 1},
+        batch_size=MONGO_BATCH_SIZE
+    ).sort("page_number", 1)
+
+    for page in cursor:
+        yield page["page_number"], page.get("text", "")
+
+
+def sample_chunk_texts(limit: int) -> List[str]:
+    """Cleaned chunks from randomly sampled documents (PCA training data)."""
+    texts = []
+    for doc in documents.aggregate([{"$sample": {"size": limit}}, {"$project": DOCUMENT_PROJECTION}]):
+        if doc.get("storage") != "pages":
+            doc = documents.find_one({"_id": doc["_id"]})
+        for _, cleaned_chunk, _, _ in iter_cleaned_chunks(doc):
+            texts.append(cleaned_chunk)
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+
+# =========================
+# Stage 2: Chunk + clean
+# =========================
+
+def build_chunk_doc(
+    doc: Dict[str, Any],
+    idx: int,
+    cleaned_chunk: str,
+    doc_hash: str,
+    hash_: str,
+    page_start: Optional[int] = None,
+    page_end: Optional[int] = None
+) -> Dict[str, Any]:
+    doc_id = doc["doc_id"]
+    chunk_id = f"{doc_id}_c{idx}"
+
+    # 1️ Generate snippet (an uploaded chunk_url is set by submit_upload)
+    snippet = cleaned_chunk[:100] + "..." if len(cleaned_chunk) > 100 else cleaned_chunk
+
+    return {
+        "chunk_id": chunk_id,
+        "chunk_url": local_chunk_url(chunk_id) if CHUNK_URLS == "local" else None,
+        "snippet": snippet,
+
+        "doc_id": doc_id,
+        "title": doc.get("title"),
+        "document_type": doc.get("document_type", "unknown"),
+
+        "chunk_index": idx,
+        "page_start": page_start,          # None for documents stored as one raw_text
+        "page_end": page_end,
+        "chunk_text": cleaned_chunk,       # i can remove this from here because i am addding a hyperlink for full chunk text .. but fir bhi rkh lete h cross veryfy ke liye
+
+        "doc_hash": doc_hash,
+        "chunk_hash": hash_,
+        "text_hash": text_hash(cleaned_chunk),  # embedding store key
+
+        "num_tokens": len(cleaned_chunk.split()),
+        "created_at": datetime.now(timezone.utc)
+    }
+
+
+def pipeline_version() -> str:
+    """What turns a document into chunks; part of the document hash."""
+    return f"cleaner={CLEANER_VERSIONS[TEXT_CLEANER]};chunker={chunker_version()}"
+
+
+def iter_cleaned_chunks(doc: Dict[str, Any]) -> Iterator[Tuple[int, str, Optional[int], Optional[int]]]:
+    """(chunk_index, cleaned_chunk, page_start, page_end) for non-empty chunks of a document."""
+    if TEXT_CLEANER == "document":
+        pages = iter_clean_pages(iter_doc_pages(doc), num_pages=doc.get("num_pages"))
+        for idx, (chunk, page_start, page_end) in enumerate(iter_chunks(pages)):
+            yield idx, chunk, page_start, page_end
+        return
+
+    for idx, (chunk, page_start, page_end) in enumerate(iter_chunks(iter_doc_pages(doc))):
+        cleaned_chunk = clean_text(chunk)
+        if cleaned_chunk.strip():
+            yield idx, cleaned_chunk, page_start, page_end
+
+
+def local_chunk_url(chunk_id: str) -> str:
+    return f"{CHUNK_URL_BASE.rstrip('/')}/chunks/{chunk_id}"
+
+
+def chunk_blob_key(hash_: str) -> str:
+    # content-addressed: identical texts share one upload
+    return f"chunks/{hash_}.html"
+
+
+def submit_upload(uploader: ChunkUploader, es_doc: Dict[str, Any], checkpoint: IndexCheckpoint):
+    """
+    Start the chunk upload in the background. chunk_url is the blob's
+    deterministic URL, so the chunk is embedded and indexed without
+    waiting; the upload counts as one more action of the document in the
+    checkpoint, and a failed one leaves the document to be retried.
+    """
+    doc_id, cleaned_chunk = es_doc["doc_id"], es_doc["chunk_text"]
+    key = chunk_blob_key(es_doc["text_hash"])
+    es_doc["chunk_url"] = uploader.url_for(key)
+
+    checkpoint.add_action(doc_id)
+    upload = uploader.submit(key, lambda: chunk_to_html(cleaned_chunk).encode("utf-8"))
+    upload.add_done_callback(lambda done: checkpoint.upload_done(doc_id, done.result() is not None))
+
+
+def delete_action(chunk_id: str, index: str = INDEX_NAME) -> Dict[str, Any]:
+    return {"_op_type": "delete", "_index": index, "_id": chunk_id}
+
+
+def iter_chunk_docs(
+    docs: Iterable[Dict[str, Any]],
+    progress: ProgressReporter,
+    checkpoint: IndexCheckpoint,
+    index: str = INDEX_NAME,
+    uploader: Optional[ChunkUploader] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields chunk docs to embed + index, plus delete actions for chunks
+    that disappeared. Unchanged documents and chunks are skipped.
+    Uploads of the full chunk text start here and run while later
+    stages embed and index.
 
-    for doc in documents.find({}):
+    Pages are chunked as they are read, so only the current window of
+    words (plus the chunk hashes) is held per document, whatever its size.
+    """
+    pipeline = pipeline_version()
+
+    for doc in docs:
         doc_id = doc["doc_id"]
-        title = doc.get("title")
-        document_type = doc.get("document_type", "unknown")
-        raw_text = doc.get("raw_text", "")
+        doc_hash = document_hash(doc, pipeline)
+        previous = checkpoint.previous(doc_id)
+        progress.docs += 1
 
-        chunks = chunk_text(raw_text)
+        # Unchanged document: nothing to chunk, embed or upload
+        if previous and previous["doc_hash"] == doc_hash:
+            progress.skipped_docs += 1
+            continue
 
-        for idx, chunk in enumerate(chunks):
-            cleaned_chunk = clean_text(chunk)
-            if not cleaned_chunk.strip():
-                continue
+        previous_chunks = previous["chunk_hashes"] if previous else {}
+        chunk_hashes = {}
+        checkpoint.begin(doc_id)
 
-            # -----------------
-            # Embedding
-            # -----------------
-            embedding = embed_text(cleaned_chunk)
+        for idx, cleaned_chunk, page_start, page_end in iter_cleaned_chunks(doc):
             chunk_id = f"{doc_id}_c{idx}"
+            hash_ = chunk_hash(doc, cleaned_chunk, page_start, page_end)
+            chunk_hashes[chunk_id] = hash_
+
+            if previous_chunks.get(chunk_id) != hash_:
+                checkpoint.add_action(doc_id)
+                progress.chunks += 1
+                es_doc = build_chunk_doc(doc, idx, cleaned_chunk, doc_hash, hash_, page_start, page_end)
+                if uploader is not None:
+                    submit_upload(uploader, es_doc, checkpoint)
+                yield es_doc
+
+        for chunk_id in previous_chunks:
+            if chunk_id not in chunk_hashes:
+                checkpoint.add_action(doc_id)
+                yield delete_action(chunk_id, index)
+
+        checkpoint.seal(doc_id, {"doc_hash": doc_hash, "chunk_hashes": chunk_hashes})
+
+
+# =========================
+# Stage 3: Batched embedding
+# =========================
+
+def embed_pending(
+    pending: List[Dict[str, Any]],
+    index: str = INDEX_NAME,
+    projection: Optional[PCAProjection] = None
+) -> List[Dict[str, Any]]:
+    """
+    Embed a batch of pending chunks in one encode call and
+    turn them into bulk actions. Vectors already in the embedding
+    store are reused instead of re-encoded. The store always keeps
+    full-size vectors; `projection` reduces them for a PCA index.
+    """
+    vectors = embed_with_store([p["chunk_text"] for p in pending], batch_size=EMBED_BATCH_SIZE)
+    if projection is not None:
+        vectors = projection.project(vectors)
+
+    actions = []
+    for es_doc, vector in zip(pending, vectors):
+        es_doc["embedding"] = vector.tolist()
+        actions.append({
+            "_index": index,
+            "_id": es_doc["chunk_id"],
+            "_source": es_doc
+        })
 
-            # 1️ Upload to Cloudinary
-            print("Uploading chunk to Cloudinary...")
-            chunk_url = upload_chunk_to_cloudinary(chunk_id, cleaned_chunk)
-            print(f"Uploaded chunk to Cloudinary: {chunk_url}")
-            
-            # 2️ Generate snippet
-            snippet = cleaned_chunk[:100] + "..." if len(cleaned_chunk) > 100 else cleaned_chunk
-
-            es_doc = {
-                "chunk_id": chunk_id,
-                "chunk_url": chunk_url,          
-                "snippet": snippet,  
-
-                "doc_id": doc_id,
-                "title": title,
-                "document_type": document_type,
-
-                "chunk_index": idx,
-                "chunk_text": cleaned_chunk,       # i can remove this from here because i am addding a hyperlink for full chunk text .. but fir bhi rkh lete h cross veryfy ke liye
-
-                "embedding": embedding,
-                "num_tokens": len(cleaned_chunk.split()),
-                "created_at": datetime.now(timezone.utc)
-            }
-
-            actions.append({
-                "_index": INDEX_NAME,
-                "_id": es_doc["chunk_id"],
-                "_source": es_doc
-            })
-
-            chunk_counter += 1
-
-            # -----------------
-            # Bulk Flush (Batching)
-            # -----------------
-            if len(actions) >= 100:
-                helpers.bulk(es, actions)
-                actions.clear()
+    return actions
+
+
+def iter_embedded_batches(
+    chunk_docs: Iterable[Dict[str, Any]],
+    index: str = INDEX_NAME,
+    batch_size: int = EMBED_BATCH_SIZE,
+    projection: Optional[PCAProjection] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    pending = []
+    for es_doc in chunk_docs:
+        # delete actions need no embedding
+        if "_op_type" in es_doc:
+            yield [es_doc]
+            continue
+
+        pending.append(es_doc)
+        if len(pending) >= batch_size:
+            yield embed_pending(pending, index, projection)
+            pending = []
 
     # Flush remaining
-    if actions:
-        helpers.bulk(es, actions)
+    if pending:
+        yield embed_pending(pending, index, projection)
+
+
+def flatten(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    for batch in batches:
+        yield from batch
+
+
+# =========================
+# Stage 4: Bulk indexing
+# =========================
+
+def index_all_documents(
+    bulk_chunk_size: int = BULK_CHUNK_SIZE,
+    bulk_threads: int = BULK_THREADS,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    full: bool = False,
+    index: str = INDEX_NAME,
+    refresh: bool = True,
+    projection: Optional[PCAProjection] = None,
+    doc_filter: Optional[Dict[str, Any]] = None,
+    finalize: bool = True,
+    label: Optional[str] = None
+):
+    """
+    Streaming pipeline, each stage in its own thread behind a bounded queue:
 
-    print(f"Indexed {chunk_counter} chunks into Elasticsearch")
+        Mongo cursor -> chunk + clean (+ async upload) -> batched embed -> parallel_bulk
+
+    Incremental by default: only new or changed documents/chunks are
+    embedded and sent, chunks of deleted documents are removed. Pass
+    full=True to ignore the stored state.
+
+    `index` may be the alias (normal incremental runs) or a new versioned
+    index being bulk loaded by scripts/reindex.py, which does its own
+    refresh (refresh=False). If the index was built with PCA, vectors
+    go through the projection recorded in its _meta (or the one given).
+
+    `doc_filter` restricts the run to a subset of documents (one shard of
+    scripts/index_sharded.py). Shards run with finalize=False: removing
+    deleted documents and the refresh happen once, after all shards.
+
+    Per-item bulk failures are counted and reported, not raised.
+    """
+    es = get_es()
+    if doc_filter:
+        total_docs = documents.count_documents(doc_filter)
+    else:
+        total_docs = documents.estimated_document_count()
+    print(f"Found {total_docs} documents in MongoDB")
+
+    checkpoint = IndexCheckpoint(db, get_index_uuid(index), full=full)
+    projection = projection or load_projection(get_index_meta(index).get("pca_file"))
+    if projection is not None:
+        print(f"Projecting embeddings to {projection.dims} dims (PCA)")
+    progress = ProgressReporter(total_docs=total_docs, interval=PROGRESS_INTERVAL, label=label)
+
+    uploader = ChunkUploader() if CHUNK_URLS == "upload" else None
+
+    docs = prefetch(iter_documents(doc_filter), maxsize=queue_size, name="mongo-reader")
+    chunk_docs = prefetch(
+        iter_chunk_docs(docs, progress, checkpoint, index, uploader=uploader),
+        maxsize=queue_size * EMBED_BATCH_SIZE,
+        name="chunker"
+    )
+    batches = prefetch(
+        iter_embedded_batches(chunk_docs, index, projection=projection),
+        maxsize=queue_size,
+        name="embedder"
+    )
+
+    failures = []
+    for ok, info in helpers.parallel_bulk(
+        es,
+        flatten(batches),
+        thread_count=bulk_threads,
+        chunk_size=bulk_chunk_size,
+        queue_size=queue_size,
+        raise_on_error=False,
+        raise_on_exception=False
+    ):
+        ok = checkpoint.ack(info, ok)
+
+        if ok:
+            progress.indexed += 1
+        else:
+            progress.failed += 1
+            if len(failures) < MAX_REPORTED_FAILURES:
+                failures.append(info)
+
+        progress.maybe_report()
+
+    progress.report(final=True)
+    if uploader is not None:
+        uploader.close()
+        print(f"Uploads: {uploader.stats}")
+
+    for info in failures:
+        print(f"[BULK FAILURE] {info}")
+    if progress.failed > len(failures):
+        print(f"... and {progress.failed - len(failures)} more failures")
+
+    progress.committed_docs = checkpoint.committed
+    progress.failed_docs = checkpoint.failed_docs
+    print(
+        f"Documents: {progress.skipped_docs} unchanged, {checkpoint.committed} committed, "
+        f"{checkpoint.failed_docs} failed (retried next run)"
+    )
+
+    if finalize:
+        finish_indexing(checkpoint, index, refresh=refresh, changed=progress.indexed > 0)
+
+    print(f"Indexed {progress.indexed} chunks into Elasticsearch")
+    return progress
+
+
+def finish_indexing(checkpoint: IndexCheckpoint, index: str = INDEX_NAME, refresh: bool = True, changed: bool = True) -> int:
+    """Remove chunks of documents deleted from Mongo, then refresh. Returns documents removed."""
+    es = get_es()
+    removed = checkpoint.remove_deleted(es, index, documents.distinct("doc_id"))
+    print(f"Removed chunks of {removed} deleted documents")
+
+    # Make the new chunks searchable, then invalidate cached results
+    if refresh and (changed or removed):
+        es.indices.refresh(index=index)
+        bump_index_generation(index)
+
+    return removed
 
 # =========================
 # Main
 # =========================
 
 if __name__ == "__main__":
-    index_all_documents()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index Mongo documents into Elasticsearch")
+    parser.add_argument("--full", action="store_true", help="ignore stored hashes and reindex everything")
+    args = parser.parse_args()
+
+    index_all_documents(full=args.full)
@@ -0,0 +1,69 @@
+"""
+Export all-MiniLM-L6-v2 to ONNX and write an INT8 dynamically quantized copy.
+Needs torch + transformers + onnxruntime; run once on a build machine:
+
+    python -m scripts.export_onnx_model
+"""
+import os
+
+from indexing.embedding_backends import (
+    HF_MODEL_NAME,
+    ONNX_MODEL_DIR,
+    ONNX_FP32_FILE,
+    ONNX_INT8_FILE,
+)
+
+# =========================
+# Export
+# =========================
+
+def export_onnx(out_dir: str = ONNX_MODEL_DIR):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, ONNX_FP32_FILE)
+
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_NAME)
+    model = AutoModel.from_pretrained(HF_MODEL_NAME)
+    model.eval()
+
+    dummy = tokenizer(["export dummy input"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    # writes tokenizer.json, which is all the ONNX backend needs at runtime
+    tokenizer.save_pretrained(out_dir)
+    print(f"Exported FP32 model: {fp32_path}")
+
+    return fp32_path
+
+
+def quantize_int8(fp32_path: str, out_dir: str = ONNX_MODEL_DIR):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = os.path.join(out_dir, ONNX_INT8_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Quantized INT8 model: {int8_path}")
+
+    return int8_path
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    path = export_onnx()
+    quantize_int8(path)
@@ -0,0 +1,186 @@
+"""
+Sharded, multi-process indexing.
+
+The documents collection is split into doc_id ranges (shards). Worker
+processes claim shards from a Mongo-backed queue and run the normal
+index_all_documents pipeline on them, each with its own embedding model,
+ES client and progress output. Failed or abandoned shards are retried;
+once every shard is done, deleted documents are removed and the index
+is refreshed exactly once.
+
+Other nodes can join the same run and share the remaining shards:
+
+    python -m scripts.index_sharded --workers 4            # prints the run id
+    python -m scripts.index_sharded --workers 4 --run-id <run id>   # on another node
+"""
+import os
+import time
+import socket
+import argparse
+import threading
+import multiprocessing
+from typing import Dict, Any, Optional
+
+from indexing.create_index import INDEX_NAME, get_index_uuid
+from indexing.index_state import IndexCheckpoint, ShardQueue, shard_filter
+from scripts.chunks_to_es import db, index_all_documents, finish_indexing
+
+# =========================
+# Config
+# =========================
+
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", str(os.cpu_count() or 1)))
+SHARDS_PER_WORKER = int(os.getenv("SHARDS_PER_WORKER", "4"))  # small shards balance uneven documents
+POLL_SECONDS = 10
+
+
+# =========================
+# Worker Process
+# =========================
+
+def _heartbeat(queue: ShardQueue, shard_id: str, owner: str, stop: threading.Event):
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.renew(shard_id, owner):
+            print(f"[SHARD] lost lease on {shard_id}")
+            return
+
+
+def run_worker(run_id: str, index: str):
+    """Claims and indexes shards until none are left to claim."""
+    queue = ShardQueue(db, run_id)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    while True:
+        shard = queue.claim(owner)
+        if shard is None:
+            return
+
+        label = f"shard {shard['shard']}"
+        print(f"[SHARD] {owner} took {label} (attempt {shard['attempts']})")
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(queue, shard["_id"], owner, stop), daemon=True)
+        heartbeat.start()
+
+        try:
+            progress = index_all_documents(
+                index=index,
+                doc_filter=shard_filter(shard["low"], shard["high"]),
+                finalize=False,
+                label=label
+            )
+            counts = {
+                "docs": progress.docs,
+                "skipped_docs": progress.skipped_docs,
+                "chunks": progress.chunks,
+                "indexed": progress.indexed,
+                "failed": progress.failed,
+                "committed_docs": progress.committed_docs,
+                "failed_docs": progress.failed_docs,
+            }
+
+            if progress.failed:
+                queue.fail(shard["_id"], owner, f"{progress.failed} bulk failures")
+            else:
+                queue.complete(shard["_id"], owner, counts)
+        except Exception as e:
+            print(f"[SHARD] {label} failed: {e!r}")
+            queue.fail(shard["_id"], owner, repr(e))
+        finally:
+            stop.set()
+
+
+# =========================
+# Coordinator
+# =========================
+
+def limit_threads_per_worker(workers: int):
+    """Split the cores between worker processes instead of oversubscribing them."""
+    threads = str(max(1, (os.cpu_count() or 1) // workers))
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "ONNX_THREADS"):
+        os.environ.setdefault(var, threads)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def run_sharded(
+    workers: int = INDEX_WORKERS,
+    num_shards: Optional[int] = None,
+    run_id: Optional[str] = None,
+    index: str = INDEX_NAME,
+    full: bool = False
+) -> Dict[str, Any]:
+    run_id = run_id or f"{index}-{time.strftime('%Y%m%d%H%M%S')}"
+    queue = ShardQueue(db, run_id)
+
+    if queue.create(num_shards or workers * SHARDS_PER_WORKER, index):
+        print(f"[RUN] created {run_id}; other nodes can join with --run-id {run_id}")
+        # reset stale/obsolete state once, before any shard is handed out
+        IndexCheckpoint(db, get_index_uuid(index), full=full)
+        queue.mark_ready()
+    else:
+        print(f"[RUN] joining {run_id}")
+        queue.wait_ready()
+        retried = queue.retry_exhausted()
+        if retried:
+            print(f"[RUN] retrying {retried} shards that had failed every attempt")
+        index = queue.run()["index"]
+
+    limit_threads_per_worker(workers)
+    # fresh interpreters: no model, client or Mongo connection inherited
+    ctx = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+
+    while True:
+        state = queue.state()
+        if state["claimable"]:
+            procs = [ctx.Process(target=run_worker, args=(run_id, index), name=f"indexer-{i}") for i in range(workers)]
+            for proc in procs:
+                proc.start()
+            for proc in procs:
+                proc.join()
+                if proc.exitcode:
+                    # its shard is picked up again once the lease runs out
+                    print(f"[RUN] {proc.name} exited with code {proc.exitcode}")
+            continue
+
+        if state["running"]:
+            # shards held by other nodes (or leases of crashed workers)
+            print(f"[RUN] waiting for {state['running']} running shards")
+            time.sleep(POLL_SECONDS)
+            continue
+
+        break
+
+    state = queue.state()
+    totals = queue.totals()
+    elapsed = time.perf_counter() - start
+    print(
+        f"[RUN] {run_id}: {state['done']} shards done, {state['exhausted']} failed | "
+        f"docs {totals.get('docs', 0)} ({totals.get('skipped_docs', 0)} unchanged) | "
+        f"indexed {totals.get('indexed', 0)} chunks | {elapsed:.1f}s on this node"
+    )
+
+    if state["exhausted"]:
+        for shard in queue.all_shards():
+            if shard["status"] != "done":
+                print(f"  shard {shard['shard']}: {shard.get('error')}")
+        print("Not finalizing: rerun with the same --run-id after fixing the failures")
+    elif queue.claim_finalize():
+        checkpoint = IndexCheckpoint(db, get_index_uuid(index))
+        finish_indexing(checkpoint, index, changed=totals.get("indexed", 0) > 0)
+
+    return {"run_id": run_id, "state": state, "totals": totals}
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index Mongo documents into Elasticsearch with several processes")
+    parser.add_argument("--workers", type=int, default=INDEX_WORKERS)
+    parser.add_argument("--shards", type=int, default=None, help=f"default: workers x {SHARDS_PER_WORKER}")
+    parser.add_argument("--run-id", default=None, help="join (or resume) an existing run")
+    parser.add_argument("--full", action="store_true", help="ignore stored hashes and reindex everything")
+    args = parser.parse_args()
+
+    run_sharded(workers=args.workers, num_shards=args.shards, run_id=args.run_id, full=args.full)
@@ -1,10 +1,19 @@
 import os
+import time
 import uuid
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from pymongo import MongoClient
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import pdfplumber
 from dotenv import load_dotenv
 
+from utils.hashing import file_hash
+
 load_dotenv()
 
 # =========================
@@ -15,6 +24,15 @@ DATA_DIR = "data/pdfs"
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "ai_search"
 COLLECTION = "documents"
+PAGES_COLLECTION = "pages"  # one record per page: {doc_id, page_number, text}
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))  # 1 -> no process pool
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "16"))                 # documents per insert_many
+# Recycle a worker after this many PDFs; pdfminer leaves fragmented heap behind
+INGEST_MAX_TASKS_PER_CHILD = int(os.getenv("INGEST_MAX_TASKS_PER_CHILD", "20"))
+PAGE_BATCH_SIZE = int(os.getenv("PAGE_BATCH_SIZE", "50"))                     # pages per bulk_write
+
+DUPLICATE_KEY = 11000
 
 # =========================
 # Mongo Setup
@@ -23,40 +41,141 @@ COLLECTION = "documents"
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
 documents = db[COLLECTION]
+pages = db[PAGES_COLLECTION]
 
 # =========================
 # PDF Extraction
 # =========================
 
+def iter_pdf_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """
+    Yields (page_number, text), one page at a time. Each page's parsed
+    layout is released before the next one is read, so memory does not
+    grow with the page count.
+    """
+    with pdfplumber.open(path) as pdf:
+        for page_number, page in enumerate(pdf.pages, start=1):
+            try:
+                text = page.extract_text() or ""
+            finally:
+                # drop cached layout objects (chars, lines, ...) of this page
+                getattr(page, "close", page.flush_cache)()
+            yield page_number, text
+
+
 def extract_pdf_text(path: str):
     full_text = []
     num_pages = 0
 
-    with pdfplumber.open(path) as pdf:
-        num_pages = len(pdf.pages)
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            if text:
-                full_text.append(text)
+    for num_pages, text in iter_pdf_pages(path):
+        if text:
+            full_text.append(text)
 
     return "\n".join(full_text), num_pages
 
 
 # =========================
-# Ingest Single PDF
+# Build Document
 # =========================
 
-def ingest_pdf(path: str):
-    print(f" Processing: {path}")
+def doc_id_for(hash_: str) -> str:
+    # stable per file, so a crashed ingest can clear its partial pages on rerun
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"pdf:{hash_}"))
+
+
+def ensure_indexes():
+    # partial: legacy documents without a file on disk never get one (see backfill_file_hashes)
+    documents.create_index(
+        "file_hash",
+        unique=True,
+        partialFilterExpression={"file_hash": {"$type": "string"}}
+    )
+    pages.create_index([("doc_id", 1), ("page_number", 1)], unique=True)
+
+
+def backfill_file_hashes(paths: List[str]) -> int:
+    """
+    Give documents ingested before file_hash existed the hash of their
+    file on disk (matched by file_name), so dedup recognises them instead
+    of ingesting the file again under a new doc_id. Legacy documents keep
+    their doc_id and storage. Returns how many were backfilled.
+    """
+    by_name = {os.path.basename(path): path for path in paths}
+    backfilled = 0
+
+    legacy = documents.find({"file_hash": {"$not": {"$type": "string"}}}, {"_id": 1, "file_name": 1})
+    for doc in legacy:
+        path = by_name.get(doc.get("file_name"))
+        if path is None:
+            continue  # file no longer in DATA_DIR; nothing to dedupe against
+
+        try:
+            documents.update_one({"_id": doc["_id"]}, {"$set": {"file_hash": file_hash(path)}})
+            backfilled += 1
+        except DuplicateKeyError:
+            # another document (e.g. a second legacy copy) already holds this hash
+            print(f" Legacy document {doc['_id']} duplicates {doc.get('file_name')}, left without file_hash")
+
+    if backfilled:
+        print(f"[INGEST] backfilled file_hash for {backfilled} legacy documents")
+    return backfilled
+
 
-    raw_text, num_pages = extract_pdf_text(path)
+def store_pages(path: str, doc_id: str, pages_collection) -> Tuple[int, int, str]:
+    """
+    Stream a PDF's pages into the pages collection in PAGE_BATCH_SIZE
+    batches. Returns (num_pages, pages_with_text, content hash). Only one
+    batch of page text is held in memory.
 
-    if not raw_text.strip():
+    Pages are upserted on (doc_id, page_number) and stale pages removed
+    afterwards, so a crash part-way never leaves a document without pages.
+    """
+    text_hash = hashlib.sha256()
+    num_pages = 0
+    with_text = 0
+    written: List[int] = []
+    batch: List[ReplaceOne] = []
+
+    for num_pages, text in iter_pdf_pages(path):
+        if not text.strip():
+            continue
+
+        # same bytes content_hash() would hash for the joined text
+        text_hash.update((("\n" if with_text else "") + text).encode("utf-8"))
+        with_text += 1
+
+        key = {"doc_id": doc_id, "page_number": num_pages}
+        batch.append(ReplaceOne(key, {**key, "text": text}, upsert=True))
+        written.append(num_pages)
+        if len(batch) >= PAGE_BATCH_SIZE:
+            pages_collection.bulk_write(batch, ordered=False)
+            batch = []
+
+    if batch:
+        pages_collection.bulk_write(batch, ordered=False)
+
+    # pages beyond the new page count, or without text this time
+    pages_collection.delete_many({"doc_id": doc_id, "page_number": {"$nin": written}})
+
+    text_hash.update(b"\x00")
+    return num_pages, with_text, text_hash.hexdigest()
+
+
+def build_document(path: str, hash_: Optional[str] = None, pages_collection=None) -> Optional[Dict[str, Any]]:
+    """Writes the pages, returns the document record (metadata only) or None if there is no text."""
+    pages_collection = pages if pages_collection is None else pages_collection
+    hash_ = hash_ or file_hash(path)
+    doc_id = doc_id_for(hash_)
+
+    num_pages, pages_with_text, text_hash = store_pages(path, doc_id, pages_collection)
+
+    if not pages_with_text:
         print(f" No text extracted from {path}")
-        return
+        pages_collection.delete_many({"doc_id": doc_id})
+        return None
 
-    doc = {
-        "doc_id": str(uuid.uuid4()),
+    return {
+        "doc_id": doc_id,
 
         # Metadata
         "title": os.path.basename(path),
@@ -68,34 +187,186 @@ def ingest_pdf(path: str):
         "author": None,
         "published_year": None,
 
-        # Raw Content
-        "raw_text": raw_text,
+        # Content lives in the pages collection
+        "storage": "pages",
+        "content_hash": text_hash,
 
         # Stats
         "num_pages": num_pages,
+        "pages_with_text": pages_with_text,
         "file_size_kb": os.path.getsize(path) // 1024,
+        "file_hash": hash_,  # dedup key across reruns
 
         # Timestamps
         "ingested_at": datetime.now(timezone.utc)
     }
 
+
+# =========================
+# Ingest Single PDF
+# =========================
+
+def ingest_pdf(path: str):
+    print(f" Processing: {path}")
+
+    hash_ = file_hash(path)
+    if documents.find_one({"file_hash": hash_}, {"_id": 1}):
+        print(f" Already ingested: {path}")
+        return
+
+    doc = build_document(path, hash_)
+    if doc is None:
+        return
+
     documents.insert_one(doc)
-    print(f"Ingested: {doc['title']} | Pages: {num_pages}")
+    print(f"Ingested: {doc['title']} | Pages: {doc['num_pages']}")
+
+# =========================
+# Parallel Ingest
+# =========================
+
+_worker_pages = None
+
+
+def _init_worker():
+    global _worker_pages
+    # a client of its own: MongoClient must not be shared across fork
+    _worker_pages = MongoClient(MONGO_URI)[DB_NAME][PAGES_COLLECTION]
+
+
+def _extract_worker(task: Tuple[str, str]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """Runs in a pool process: extract one (path, file hash). Returns (path, status, doc)."""
+    path, hash_ = task
+    try:
+        doc = build_document(path, hash_, _worker_pages)
+        return path, "empty" if doc is None else "extracted", doc
+    except Exception as e:
+        print(f" Failed to extract {path}: {e}")
+        return path, "failed", None
+
+
+def flush_batch(batch: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Unordered insert_many; a duplicate file_hash (racing run) counts as skipped."""
+    if not batch:
+        return 0, 0
+
+    try:
+        result = documents.insert_many(batch, ordered=False)
+        return len(result.inserted_ids), 0
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        duplicates = sum(1 for err in errors if err.get("code") == DUPLICATE_KEY)
+        if duplicates != len(errors):
+            raise
+        return e.details.get("nInserted", 0), duplicates
+
+
+def list_pdfs(data_dir: str = DATA_DIR) -> List[str]:
+    return sorted(
+        os.path.join(data_dir, fname)
+        for fname in os.listdir(data_dir)
+        if fname.lower().endswith(".pdf")
+    )
+
+
+def unique_new_files(paths: List[str], known_hashes: Set[str], workers: int) -> Tuple[List[Tuple[str, str]], int]:
+    """
+    (path, file hash) of files not ingested yet, one path per distinct
+    hash, plus how many were skipped. Identical files share a doc_id, so
+    deduping before the pool means only one worker ever writes its pages.
+    """
+    # hashlib releases the GIL, so threads hash files in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(file_hash, paths))
+
+    tasks: List[Tuple[str, str]] = []
+    seen = set(known_hashes)
+    for path, hash_ in zip(paths, hashes):
+        if hash_ in seen:
+            continue
+        seen.add(hash_)
+        tasks.append((path, hash_))
+
+    return tasks, len(paths) - len(tasks)
+
+
+def ingest_parallel(
+    paths: List[str],
+    workers: int = INGEST_WORKERS,
+    batch_size: int = INGEST_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Extract PDFs in a process pool (one PDF per task, largest first so a
+    big book does not end up last). Workers stream pages straight into
+    the pages collection; document records are inserted here in
+    unordered batches, after their pages are complete.
+    """
+    ensure_indexes()
+    backfill_file_hashes(paths)
+    known_hashes = set(documents.distinct("file_hash"))
+    # biggest files first, so the tail of the run is not one long book
+    paths = sorted(paths, key=os.path.getsize, reverse=True)
+
+    start = time.perf_counter()
+    tasks, skipped = unique_new_files(paths, known_hashes, workers)
+
+    counts = {"inserted": 0, "skipped": skipped, "empty": 0, "failed": 0}
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        inserted, duplicates = flush_batch(batch)
+        counts["inserted"] += inserted
+        counts["skipped"] += duplicates
+        batch.clear()
+
+    with multiprocessing.Pool(
+        processes=workers,
+        initializer=_init_worker,
+        maxtasksperchild=INGEST_MAX_TASKS_PER_CHILD
+    ) as pool:
+        for path, status, doc in pool.imap_unordered(_extract_worker, tasks):
+            if status != "extracted":
+                counts[status] += 1
+                continue
+
+            print(f"Extracted: {doc['title']} | Pages: {doc['num_pages']}")
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                flush()
+
+    flush()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"[INGEST] {len(paths)} PDFs with {workers} workers in {elapsed:.1f}s | "
+        f"inserted {counts['inserted']}, already ingested {counts['skipped']}, "
+        f"no text {counts['empty']}, failed {counts['failed']}"
+    )
+    return counts
 
 # =========================
 # Ingest All PDFs
 # =========================
 
-def ingest_all_pdfs():
-    for fname in os.listdir(DATA_DIR):
-        if fname.lower().endswith(".pdf"):
-            path = os.path.join(DATA_DIR, fname)
-            ingest_pdf(path)
+def ingest_all_pdfs(workers: int = INGEST_WORKERS):
+    paths = list_pdfs()
+
+    if workers > 1:
+        return ingest_parallel(paths, workers=workers)
+
+    ensure_indexes()
+    backfill_file_hashes(paths)
+    for path in paths:
+        ingest_pdf(path)
 
 # =========================
 # Main
 # =========================
 
 if __name__ == "__main__":
-    ingest_all_pdfs()
+    parser = argparse.ArgumentParser(description="Extract PDFs from DATA_DIR into MongoDB")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="extraction processes (1 = sequential)")
+    args = parser.parse_args()
+
+    ingest_all_pdfs(workers=args.workers)
     print("\nPDF ingestion completed!")
@@ -0,0 +1,78 @@
+"""
+Hammer /search while a reindex runs and report availability + latency.
+
+    python -m scripts.probe_availability --duration 600
+
+Every probe query is unique (a counter is appended), so neither the
+result cache nor the query embedding cache can answer it: each request
+runs embedding, BM25, kNN and fusion against the index being rebuilt.
+Cache hits (X-Cache: HIT) are counted and reported, and should stay 0.
+"""
+import time
+import argparse
+
+import requests
+import numpy as np
+
+# =========================
+# Config
+# =========================
+
+API_URL = "http://127.0.0.1:8000/search"
+PROBE_QUERIES = [
+    "what is machine learning",
+    "explain neural networks",
+    "what is overfitting",
+    "what is transformer model",
+]
+
+# =========================
+# Probe
+# =========================
+
+def probe(duration: float, interval: float):
+    latencies = []
+    errors = 0
+    empty = 0
+    cache_hits = 0
+    requests_sent = 0
+
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        query = f"{PROBE_QUERIES[requests_sent % len(PROBE_QUERIES)]} {requests_sent}"
+        requests_sent += 1
+
+        t0 = time.perf_counter()
+        try:
+            resp = requests.get(API_URL, params={"query": query}, timeout=10)
+            resp.raise_for_status()
+            if resp.headers.get("X-Cache") == "HIT":
+                cache_hits += 1
+            if not resp.json():
+                empty += 1
+        except Exception as e:
+            errors += 1
+            print(f"[PROBE] error: {e}")
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+        time.sleep(interval)
+
+    ok = requests_sent - errors
+    print(f"requests {requests_sent} | ok {ok} ({100 * ok / max(requests_sent, 1):.2f}%) | empty {empty} | errors {errors} | cache hits {cache_hits}")
+    if latencies:
+        print(
+            f"latency ms p50 {np.percentile(latencies, 50):.1f} | "
+            f"p99 {np.percentile(latencies, 99):.1f} | max {max(latencies):.1f}"
+        )
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=300)
+    parser.add_argument("--interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    probe(args.duration, args.interval)
@@ -0,0 +1,165 @@
+"""
+Zero-downtime (blue/green) reindex.
+
+    1. create INDEX_NAME_v<timestamp>_<suffix> with refresh off and 0 replicas
+    2. bulk load every Mongo document into it (checkpoint state is kept
+       per index, so the live index's state is untouched until the swap)
+    3. restore refresh/replicas, refresh, force-merge
+    4. warm it up with real queries
+    5. atomically move the INDEX_NAME alias onto it
+
+Search keeps hitting the old index through the alias until step 5.
+
+With --pca-dims N a PCA projection is fitted on a sample of chunk
+embeddings first, the new index stores N-dim vectors and records the
+projection file in its _meta so the API projects queries the same way.
+
+    python -m scripts.reindex [--pca-dims 128]
+"""
+import time
+import argparse
+
+from typing import Optional
+
+from indexing.create_index import (
+    get_es,
+    create_versioned_index,
+    finish_bulk_load,
+    swap_alias,
+    legacy_index_exists,
+    cleanup_old_indices,
+    bump_index_generation,
+    update_index_meta,
+    EMBEDDING_DIMS,
+)
+from indexing.embeddings import embed_texts
+from indexing.embedding_store import embed_with_store
+from indexing.pca import PCAProjection, PCA_SAMPLE_SIZE, fit_pca, pca_path_for
+from backend.search import build_bm25_body, build_vector_body
+from indexing.index_state import drop_index_state
+from scripts.chunks_to_es import index_all_documents, sample_chunk_texts, db
+
+# =========================
+# Config
+# =========================
+
+WARMUP_QUERIES = [
+    "what is machine learning",
+    "explain neural networks",
+    "what is gradient descent",
+    "what is attention mechanism",
+    "what is word embeddings",
+]
+
+# =========================
+# Warmup
+# =========================
+
+def warm_up_index(index: str, rounds: int = 2, projection: Optional[PCAProjection] = None):
+    """Run BM25 + kNN queries so caches and HNSW graphs are loaded before the swap."""
+    es = get_es()
+    vectors = embed_texts(WARMUP_QUERIES)
+    if projection is not None:
+        vectors = projection.project(vectors)
+
+    for _ in range(rounds):
+        for query, vector in zip(WARMUP_QUERIES, vectors):
+            es.search(index=index, body=build_bm25_body(query), request_timeout=60)
+            es.search(index=index, body=build_vector_body(vector.tolist()), request_timeout=60)
+
+# =========================
+# PCA
+# =========================
+
+def train_projection(dims: int, sample_size: int = PCA_SAMPLE_SIZE) -> PCAProjection:
+    texts = sample_chunk_texts(sample_size)
+    print(f"Fitting PCA on {len(texts)} sampled chunks")
+    # goes through the embedding store, so these are not encoded twice
+    return fit_pca(embed_with_store(texts), dims)
+
+# =========================
+# Blue / Green Reindex
+# =========================
+
+def reindex_blue_green(
+    force_merge: bool = True,
+    keep_old: bool = True,
+    pca_dims: Optional[int] = None,
+    drop_legacy: bool = False
+):
+    # checked up front: swap_alias refuses at the end, after the whole bulk load
+    if legacy_index_exists() and not drop_legacy:
+        print("The alias name is a concrete (pre-alias) index; rerun with --drop-legacy to replace it.")
+        return None
+
+    timings = {}
+
+    start = time.perf_counter()
+    projection = None
+    if pca_dims and pca_dims < EMBEDDING_DIMS:
+        t0 = time.perf_counter()
+        projection = train_projection(pca_dims)
+        timings["pca_fit"] = time.perf_counter() - t0
+
+    index = create_versioned_index(bulk_load=True, dims=projection.dims if projection else EMBEDDING_DIMS)
+    if projection is not None:
+        path = pca_path_for(index)
+        projection.save(path)
+        update_index_meta(index, pca_file=path)
+
+    t0 = time.perf_counter()
+    progress = index_all_documents(index=index, full=True, refresh=False, projection=projection)
+    timings["bulk_load"] = time.perf_counter() - t0
+
+    if progress.failed:
+        print(f"{progress.failed} bulk failures, NOT swapping alias. New index left in place: {index}")
+        return None
+
+    t0 = time.perf_counter()
+    finish_bulk_load(index, force_merge=force_merge)
+    timings["restore_merge"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    warm_up_index(index, projection=projection)
+    timings["warmup"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    bump_index_generation(index)
+    swap_alias(index, drop_legacy=drop_legacy)
+    timings["swap"] = time.perf_counter() - t0
+
+    # the new index's checkpoint state went live with the alias; the
+    # state of deleted versions goes with them
+    for index_uuid in cleanup_old_indices() if keep_old else cleanup_old_indices(keep=0):
+        drop_index_state(db, index_uuid)
+
+    total = time.perf_counter() - start
+    load_s = max(timings["bulk_load"], 1e-9)
+    print(f"Bulk load: {progress.indexed} chunks in {load_s:.1f}s ({progress.indexed / load_s:.1f} chunks/s)")
+    for phase, seconds in timings.items():
+        print(f"  {phase:<14}{seconds:>8.1f}s")
+    print(f"  {'total':<14}{total:>8.1f}s")
+
+    return index
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blue/green reindex behind the INDEX_NAME alias")
+    parser.add_argument("--no-force-merge", action="store_true")
+    parser.add_argument("--drop-old", action="store_true", help="delete every old version after the swap")
+    parser.add_argument("--pca-dims", type=int, default=None, help="reduce stored vectors to N dims with PCA")
+    parser.add_argument(
+        "--drop-legacy", action="store_true",
+        help="delete a pre-alias concrete index named INDEX_NAME at the swap (no rollback to it)"
+    )
+    args = parser.parse_args()
+
+    reindex_blue_green(
+        force_merge=not args.no_force_merge,
+        keep_old=not args.drop_old,
+        pca_dims=args.pca_dims,
+        drop_legacy=args.drop_legacy
+    )
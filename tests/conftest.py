@@ -0,0 +1,257 @@
+"""
+An in-memory stand-in for the slice of pymongo the indexer and ingest
+use (mongomock-style), so Mongo-backed logic is tested without a server.
+Supports the query operators and update modifiers this repo issues.
+"""
+import copy
+import itertools
+import re
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+TYPE_CHECKS = {"string": str, "int": int, "double": float, "bool": bool, "object": dict, "array": list}
+
+
+def _get(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _match_op(value, op, arg):
+    present = value is not _MISSING
+    if op == "$eq":
+        return present and value == arg
+    if op == "$ne":
+        return not present or value != arg
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        if not present or value is None:
+            return False
+        return {"$gt": value > arg, "$gte": value >= arg, "$lt": value < arg, "$lte": value <= arg}[op]
+    if op == "$in":
+        return present and value in arg
+    if op == "$nin":
+        return not present or value not in arg
+    if op == "$exists":
+        return present == bool(arg)
+    if op == "$type":
+        return present and isinstance(value, TYPE_CHECKS[arg]) and not (arg == "int" and isinstance(value, bool))
+    if op == "$not":
+        return not _match_value(value, arg)
+    if op == "$regex":
+        return present and isinstance(value, str) and re.search(arg, value) is not None
+    raise NotImplementedError(op)
+
+
+def _match_value(value, cond):
+    if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+        return all(_match_op(value, op, arg) for op, arg in cond.items())
+    return value is not _MISSING and value == cond
+
+
+def matches(doc, query):
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in cond):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in cond):
+                return False
+        elif not _match_value(_get(doc, key), cond):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        kept = {k: v for k, v in doc.items() if k in include}
+        if projection.get("_id", 1):
+            kept["_id"] = doc["_id"]
+        return kept
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            super().sort(key=lambda d: _get(d, field), reverse=order < 0)
+        return self
+
+
+class FakeCollection:
+    def __init__(self, database=None, name=None):
+        self.database = database
+        self.name = name
+        self.docs = {}
+        self.unique = []  # field tuples with a unique index (partial filter, if any)
+        self._ids = itertools.count(1)
+
+    # -----------------
+    # Indexes
+    # -----------------
+
+    def create_index(self, keys, unique=False, partialFilterExpression=None, **kwargs):
+        fields = (keys,) if isinstance(keys, str) else tuple(field for field, _ in keys)
+        if unique:
+            self.unique.append((fields, partialFilterExpression))
+
+    def _check_unique(self, doc):
+        for other in self.docs.values():
+            if other["_id"] == doc["_id"]:
+                continue
+            for fields, partial in self.unique:
+                if partial and not (matches(doc, partial) and matches(other, partial)):
+                    continue
+                if all(_get(doc, f) == _get(other, f) for f in fields):
+                    raise DuplicateKeyError(f"duplicate key on {fields}")
+
+    def _store(self, doc):
+        if doc["_id"] in self.docs and self.docs[doc["_id"]] is not doc:
+            raise DuplicateKeyError("duplicate _id")
+        self._check_unique(doc)
+        self.docs[doc["_id"]] = doc
+
+    # -----------------
+    # Reads
+    # -----------------
+
+    def find(self, query=None, projection=None, **kwargs):
+        return FakeCursor(_project(d, projection) for d in list(self.docs.values()) if matches(d, query))
+
+    def find_one(self, query=None, projection=None):
+        found = self.find(query, projection)
+        return found[0] if found else None
+
+    def distinct(self, field, query=None):
+        values = []
+        for doc in self.docs.values():
+            value = _get(doc, field)
+            if value is not _MISSING and matches(doc, query) and value not in values:
+                values.append(value)
+        return values
+
+    def count_documents(self, query):
+        return len(self.find(query))
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+    # -----------------
+    # Writes
+    # -----------------
+
+    def insert_one(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", next(self._ids))
+        self._store(doc)
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    def insert_many(self, docs, ordered=True):
+        return SimpleNamespace(inserted_ids=[self.insert_one(doc).inserted_id for doc in docs])
+
+    def _apply(self, doc, update, inserting):
+        new = copy.deepcopy(doc)
+        for op, fields in update.items():
+            for key, value in fields.items():
+                if op == "$set" or (op == "$setOnInsert" and inserting):
+                    new[key] = copy.deepcopy(value)
+                elif op == "$inc":
+                    new[key] = new.get(key, 0) + value
+                elif op == "$unset":
+                    new.pop(key, None)
+                elif op != "$setOnInsert":
+                    raise NotImplementedError(op)
+        return new
+
+    def _update(self, query, update, upsert=False, many=False, sort=None):
+        targets = self.find(query)
+        if sort:
+            targets = targets.sort(sort)
+        if not many:
+            targets = targets[:1]
+
+        for target in targets:
+            new = self._apply(self.docs[target["_id"]], update, inserting=False)
+            self._check_unique(new)
+            self.docs[new["_id"]] = new
+
+        if targets or not upsert:
+            return SimpleNamespace(matched_count=len(targets), modified_count=len(targets), upserted_id=None), targets
+
+        seed = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        new = self._apply(seed, update, inserting=True)
+        new.setdefault("_id", next(self._ids))
+        self._store(new)
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=new["_id"]), []
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert)[0]
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, upsert, many=True)[0]
+
+    def find_one_and_update(self, query, update, sort=None, return_document=False, upsert=False, **kwargs):
+        _, before = self._update(query, update, upsert, sort=sort)
+        if not before:
+            return None
+        return copy.deepcopy(self.docs[before[0]["_id"]]) if return_document else before[0]
+
+    def replace_one(self, query, doc, upsert=False):
+        found = self.find_one(query)
+        if found is None and not upsert:
+            return SimpleNamespace(matched_count=0)
+        doc = copy.deepcopy(doc)
+        doc["_id"] = found["_id"] if found else query.get("_id", next(self._ids))
+        self._check_unique(doc)
+        self.docs[doc["_id"]] = doc
+        return SimpleNamespace(matched_count=int(found is not None))
+
+    def delete_many(self, query):
+        doomed = [d["_id"] for d in self.find(query)]
+        for _id in doomed:
+            del self.docs[_id]
+        return SimpleNamespace(deleted_count=len(doomed))
+
+    def delete_one(self, query):
+        found = self.find_one(query)
+        if found is not None:
+            del self.docs[found["_id"]]
+        return SimpleNamespace(deleted_count=int(found is not None))
+
+
+    def rename(self, new_name):
+        if self.name not in self.database or self.database[new_name].docs:
+            raise OperationFailure(f"cannot rename {self.name} to {new_name}")
+        # handles to the target name see the documents, as with pymongo
+        target = self.database[new_name]
+        target.docs, target.unique = self.docs, self.unique
+        del self.database[self.name]
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection(self, name)
+        return self[name]
+
+    def drop_collection(self, name):
+        self.pop(name, None)
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+@pytest.fixture
+def mongo_db():
+    return FakeDatabase()
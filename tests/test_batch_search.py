@@ -0,0 +1,140 @@
+"""POST /search/batch: NDJSON framing, msearch grouping and embed failures."""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.main as main
+import backend.search as search
+
+
+class FakeAsyncES:
+    """
+    One BM25 + one kNN hit per query (the same doc, `<query>#0`); a
+    query named "bad" gets an error sub-response, and a group holding
+    "slow" answers last.
+    """
+
+    def __init__(self):
+        self.msearch_sizes = []
+        self.mget_ids = []
+
+    async def msearch(self, searches=None, **_):
+        queries = [body["query"]["bool"]["must"][0]["match"]["chunk_text"]["query"] for body in searches[1::4]]
+        self.msearch_sizes.append(len(queries))
+        if "slow" in queries:
+            await asyncio.sleep(0.2)
+
+        responses = []
+        for query in queries:
+            if query == "bad":
+                sub = {"error": {"type": "search_phase_execution_exception"}, "status": 400}
+                responses += [sub, sub]
+            else:
+                hits = {"hits": {"hits": [{"_id": f"{query}#0", "_score": 1.0}]}}
+                responses += [{"took": 1, **hits}, {"took": 1, **hits}]
+        return {"took": 1, "responses": responses}
+
+    async def mget(self, ids=None, **_):
+        self.mget_ids.append(list(ids))
+        return {"docs": [{"_id": i, "found": True, "_source": {"chunk_text": i, "doc_id": i}} for i in ids]}
+
+
+@pytest.fixture
+def es(monkeypatch):
+    fake = FakeAsyncES()
+    monkeypatch.setattr(search, "get_async_es", lambda: fake)
+    monkeypatch.setattr(search, "TWO_PHASE_FETCH", True)
+
+    async def vectors_for(queries):
+        return [[0.0] * 4 for _ in queries]
+
+    monkeypatch.setattr(main, "async_query_vectors_for", vectors_for)
+    return fake
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def batch(client, queries):
+    return client.post("/search/batch", json={"queries": [{"query": q} for q in queries]})
+
+
+def ndjson(res):
+    assert res.text.endswith("\n")
+    return [json.loads(line) for line in res.text.splitlines()]
+
+
+def test_one_line_per_query(client, es):
+    res = batch(client, ["alpha", "beta", "gamma"])
+
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    lines = ndjson(res)
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    for line in lines:
+        assert line["results"][0]["doc_id"] == f"{line['query']}#0"
+
+    # one group: one msearch and one mget for all three queries
+    assert es.msearch_sizes == [3]
+    assert sorted(es.mget_ids[0]) == ["alpha#0", "beta#0", "gamma#0"]
+
+
+def test_large_batches_are_grouped(client, es):
+    queries = [f"q{i}" for i in range(2 * search.BATCH_MSEARCH_QUERIES + 10)]
+    lines = ndjson(batch(client, queries))
+
+    assert es.msearch_sizes == [search.BATCH_MSEARCH_QUERIES, search.BATCH_MSEARCH_QUERIES, 10]
+    assert len(es.mget_ids) == 3
+    assert sorted(line["index"] for line in lines) == list(range(len(queries)))
+    assert all(line["query"] == queries[line["index"]] for line in lines)
+
+
+def test_lines_stream_in_completion_order(client, es):
+    queries = ["slow"] + [f"q{i}" for i in range(search.BATCH_MSEARCH_QUERIES)]
+    lines = ndjson(batch(client, queries))
+
+    # the first group waits on "slow", so the second group's line comes first
+    assert [line["index"] for line in lines] == [search.BATCH_MSEARCH_QUERIES] + list(range(search.BATCH_MSEARCH_QUERIES))
+    assert all(line["query"] == queries[line["index"]] for line in lines)
+
+
+def test_failed_query_does_not_fail_the_batch(client, es):
+    lines = {line["index"]: line for line in ndjson(batch(client, ["alpha", "bad", "gamma"]))}
+
+    assert "msearch sub-query failed" in lines[1]["error"] and "results" not in lines[1]
+    assert lines[0]["results"] and lines[2]["results"]
+
+
+def test_failed_group_reports_every_query(client, es, monkeypatch):
+    async def down(**_):
+        raise ConnectionError("cluster unreachable")
+
+    monkeypatch.setattr(es, "msearch", down)
+    lines = ndjson(batch(client, ["alpha", "beta"]))
+
+    assert sorted(line["index"] for line in lines) == [0, 1]
+    assert all("cluster unreachable" in line["error"] for line in lines)
+
+
+def test_embed_failure_is_503(client, es, monkeypatch):
+    async def broken(queries):
+        raise RuntimeError("encoder crashed")
+
+    monkeypatch.setattr(main, "async_query_vectors_for", broken)
+    res = batch(client, ["alpha"])
+
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == str(int(main.BREAKER_RESET_SECONDS))
+    assert es.msearch_sizes == []
+
+
+def test_batch_limits(client, es, monkeypatch):
+    assert batch(client, []).status_code == 422
+    assert client.post("/search/batch", json={"queries": [{"query": "a", "top_n": 0}]}).status_code == 422
+
+    monkeypatch.setattr(main, "BATCH_MAX_QUERIES", 2)
+    assert batch(client, ["a", "b", "c"]).status_code == 413
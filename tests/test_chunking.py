@@ -0,0 +1,119 @@
+"""
+iter_token_chunks with a stub tokenizer (words and punctuation as
+tokens, with character offsets like the word-piece tokenizer's), so the
+windowing is tested without downloading the model's tokenizer.
+"""
+import random
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from indexing import chunk_documents
+from indexing.chunk_documents import chunk_spans, chunk_text, iter_page_chunks, iter_token_chunks
+
+WORDS = ["attention", "model", "layer", "token", "the", "of", "a", "gradient", "loss", "is"]
+
+
+class StubTokenizer:
+    def encode(self, text, add_special_tokens=False):
+        return SimpleNamespace(offsets=[m.span() for m in re.finditer(r"\w+|[^\w\s]", text)])
+
+
+TOKENIZER = StubTokenizer()
+
+
+def tokens(text):
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+def random_pages(rng, num_pages):
+    pages = []
+    for page_number in range(1, num_pages + 1):
+        sentences = []
+        for _ in range(rng.randint(0, 6)):
+            words = rng.choices(WORDS, k=rng.randint(3, 15))
+            sentences.append(" ".join(words) + rng.choice([".", "!", "?", ",", ""]))
+        pages.append((page_number, " ".join(sentences)))
+    return pages
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("sentence_breaks", [True, False])
+def test_pages_chunk_like_the_joined_text(seed, sentence_breaks):
+    rng = random.Random(seed)
+    pages = random_pages(rng, rng.randint(1, 8))
+    joined = " ".join(text for _, text in pages if text)
+
+    chunks = [chunk for chunk, _, _ in iter_token_chunks(
+        pages, max_tokens=20, overlap=4, sentence_breaks=sentence_breaks, tokenizer=TOKENIZER
+    )]
+    expected = [joined[start:end] for start, end in chunk_spans(
+        joined, max_tokens=20, overlap=4, sentence_breaks=sentence_breaks, tokenizer=TOKENIZER
+    )]
+    assert chunks == expected
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_windows_fit_and_cover_every_token(seed):
+    rng = random.Random(seed)
+    pages = random_pages(rng, 6)
+    all_tokens = [t for _, text in pages for t in tokens(text)]
+
+    chunks = list(iter_token_chunks(pages, max_tokens=16, overlap=3, tokenizer=TOKENIZER))
+    assert all(len(tokens(chunk)) <= 16 for chunk, _, _ in chunks)
+
+    # drop each chunk's overlap with the previous one: what is left is the text, in order
+    covered = []
+    for chunk, _, _ in chunks:
+        chunk_tokens = tokens(chunk)
+        k = min(len(covered), len(chunk_tokens))
+        while k and covered[-k:] != chunk_tokens[:k]:
+            k -= 1
+        covered += chunk_tokens[k:]
+    assert covered == all_tokens
+
+
+def test_overlap_without_sentence_breaks():
+    text = " ".join(f"w{i}" for i in range(50))
+    chunks = [chunk for chunk, _, _ in iter_token_chunks(
+        [(1, text)], max_tokens=10, overlap=3, sentence_breaks=False, tokenizer=TOKENIZER
+    )]
+
+    assert chunks[0] == " ".join(f"w{i}" for i in range(10))
+    assert chunks[1].split()[:3] == chunks[0].split()[-3:]
+    assert all(len(chunk.split()) == 10 for chunk in chunks[:-1])
+
+
+def test_window_ends_on_a_sentence_in_its_second_half():
+    text = "a b c d e f g. h i j k l m n o p"
+    chunk, _, _ = next(iter_token_chunks([(1, text)], max_tokens=10, overlap=2, tokenizer=TOKENIZER))
+    assert chunk == "a b c d e f g."
+
+
+def test_page_numbers_and_empty_pages():
+    pages = [(1, "one two three"), (2, ""), (3, "   "), (4, "four five six")]
+    chunks = list(iter_token_chunks(pages, max_tokens=4, overlap=1, sentence_breaks=False, tokenizer=TOKENIZER))
+
+    assert chunks[0] == ("one two three four", 1, 4)
+    assert all(start in (1, 4) and end in (1, 4) for _, start, end in chunks)
+    assert list(iter_token_chunks([(1, ""), (2, " ")], tokenizer=TOKENIZER)) == []
+
+
+def test_word_chunker_matches_chunk_text(monkeypatch):
+    monkeypatch.setattr(chunk_documents, "CHUNK_SIZE", 7)
+    monkeypatch.setattr(chunk_documents, "OVERLAP", 2)
+    pages = random_pages(random.Random(3), 5)
+
+    expected = chunk_text(" ".join(text for _, text in pages))
+    assert [chunk for chunk, _, _ in iter_page_chunks(pages)] == expected
+
+
+def test_chunker_version_tracks_params(monkeypatch):
+    monkeypatch.setattr(chunk_documents, "CHUNKER", "tokens")
+    before = chunk_documents.chunker_version()
+    monkeypatch.setattr(chunk_documents, "TOKEN_OVERLAP", chunk_documents.TOKEN_OVERLAP + 1)
+    assert chunk_documents.chunker_version() != before
+
+    monkeypatch.setattr(chunk_documents, "CHUNKER", "words")
+    assert chunk_documents.chunker_version().startswith("words:")
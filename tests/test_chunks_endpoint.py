@@ -0,0 +1,129 @@
+"""GET /chunks/{chunk_id}: ETag revalidation, content-coding and cache headers."""
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.chunks as chunks
+import backend.main as main
+
+CHUNK = {
+    "chunk_text": "Attention weights are computed per head. " * 40,
+    "title": "Transformers",
+    "doc_id": "doc-1",
+    "chunk_index": 3,
+    "page_start": 2,
+    "page_end": 3,
+    "text_hash": "abc",
+}
+
+
+@pytest.fixture
+def chunk_store(monkeypatch):
+    store = {"c1": dict(CHUNK), "short": dict(CHUNK, chunk_text="tiny")}
+
+    async def fetch(chunk_id):
+        return store.get(chunk_id)
+
+    monkeypatch.setattr(main, "fetch_chunk", fetch)
+    return store
+
+
+@pytest.fixture
+def client(chunk_store):
+    # no context manager: the lifespan (model warmup) is not needed here
+    return TestClient(main.app)
+
+
+def get(client, path, **headers):
+    return client.get(path, headers={"Accept-Encoding": "identity", **headers})
+
+
+def test_cache_headers(client):
+    res = get(client, "/chunks/c1?format=text")
+
+    assert res.status_code == 200
+    assert res.text == CHUNK["chunk_text"]
+    assert res.headers["cache-control"] == f"public, max-age={chunks.CHUNK_CACHE_MAX_AGE}"
+    assert res.headers["vary"] == "Accept-Encoding"
+    assert res.headers["etag"].startswith('"') and res.headers["etag"].endswith('-text-identity"')
+    assert "content-encoding" not in res.headers
+
+
+def test_if_none_match_gets_304(client):
+    etag = get(client, "/chunks/c1").headers["etag"]
+
+    res = get(client, "/chunks/c1", **{"If-None-Match": etag})
+    assert res.status_code == 304 and res.content == b""
+    assert res.headers["etag"] == etag
+    assert res.headers["cache-control"].startswith("public, max-age=")
+
+    assert get(client, "/chunks/c1", **{"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert get(client, "/chunks/c1", **{"If-None-Match": "*"}).status_code == 304
+    assert get(client, "/chunks/c1", **{"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_etag_follows_the_content(client, chunk_store):
+    before = get(client, "/chunks/c1?format=json").headers["etag"]
+    assert get(client, "/chunks/c1?format=text").headers["etag"] != before
+
+    # reindexed under the same id with a new title: json changes, text does not
+    text_before = get(client, "/chunks/c1?format=text").headers["etag"]
+    chunk_store["c1"]["title"] = "Attention Is All You Need"
+    assert get(client, "/chunks/c1?format=json").headers["etag"] != before
+    assert get(client, "/chunks/c1?format=text").headers["etag"] == text_before
+
+
+def test_gzip_when_accepted(client):
+    identity = get(client, "/chunks/c1?format=json")
+    res = client.get("/chunks/c1?format=json", headers={"Accept-Encoding": "gzip"})
+
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.headers["etag"].endswith('-json-gzip"') and res.headers["etag"] != identity.headers["etag"]
+    assert json.loads(res.content) == CHUNK  # decoded by the client
+    assert int(res.headers["content-length"]) < len(identity.content)
+
+
+def test_br_is_preferred_when_available(client):
+    pytest.importorskip("brotli")
+    res = client.get("/chunks/c1?format=text", headers={"Accept-Encoding": "gzip, br"})
+
+    assert res.headers["content-encoding"] == "br"
+    assert res.headers["etag"].endswith('-text-br"')
+
+
+def test_gzip_without_brotli(client, monkeypatch):
+    monkeypatch.setattr(chunks, "brotli", None)
+    res = client.get("/chunks/c1?format=text", headers={"Accept-Encoding": "br, gzip"})
+
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.text == CHUNK["chunk_text"]
+
+
+def test_small_or_refused_bodies_are_not_compressed(client):
+    small = client.get("/chunks/short?format=text", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.text == "tiny"
+    assert small.headers["etag"].endswith('-identity"')
+
+    refused = client.get("/chunks/c1?format=text", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "content-encoding" not in refused.headers
+
+
+def test_negotiate_encoding():
+    assert chunks.negotiate_encoding("") is None
+    assert chunks.negotiate_encoding("deflate") is None
+    assert chunks.negotiate_encoding("*") == "gzip"
+    assert chunks.negotiate_encoding("GZIP;q=0.5") == "gzip"
+    assert chunks.negotiate_encoding("gzip;q=bad") is None
+
+
+def test_unknown_chunk_is_404(client):
+    assert get(client, "/chunks/nope").status_code == 404
+    assert get(client, "/chunks/c1?format=pdf").status_code == 422
+
+
+def test_compress_round_trips():
+    body = CHUNK["chunk_text"].encode()
+    assert gzip.decompress(chunks.compress(body, "gzip")) == body
+    assert chunks.compress(body, None) is body
@@ -0,0 +1,58 @@
+"""Versioned index names and the alias swap (fake ES indices API)."""
+from types import SimpleNamespace
+
+import pytest
+
+from indexing import create_index
+
+
+class FakeIndices:
+    def __init__(self, concrete=(), aliases=None):
+        self.concrete = set(concrete)
+        self.aliases = aliases or {}  # alias -> [index]
+        self.actions = None
+
+    def exists_alias(self, name):
+        return name in self.aliases
+
+    def get_alias(self, name):
+        return {index: {} for index in self.aliases[name]}
+
+    def exists(self, index):
+        return index in self.concrete or index in self.aliases
+
+    def update_aliases(self, actions):
+        self.actions = actions
+
+
+@pytest.fixture
+def indices(monkeypatch):
+    holder = SimpleNamespace(indices=None)
+    monkeypatch.setattr(create_index, "get_es", lambda: holder)
+    return holder
+
+
+def test_versioned_names_do_not_collide():
+    names = {create_index.versioned_index_name() for _ in range(50)}
+    assert len(names) == 50
+
+
+def test_swap_moves_the_alias(indices):
+    indices.indices = FakeIndices(concrete={"docs_v1", "docs_v2"}, aliases={"docs": ["docs_v1"]})
+    assert create_index.swap_alias("docs_v2", alias="docs") == ["docs_v1"]
+    assert indices.indices.actions == [
+        {"remove": {"index": "docs_v1", "alias": "docs"}},
+        {"add": {"index": "docs_v2", "alias": "docs"}},
+    ]
+
+
+def test_legacy_index_is_only_dropped_when_asked(indices):
+    indices.indices = FakeIndices(concrete={"docs", "docs_v2"})
+    assert create_index.legacy_index_exists("docs")
+
+    with pytest.raises(RuntimeError, match="--drop-legacy"):
+        create_index.swap_alias("docs_v2", alias="docs")
+    assert indices.indices.actions is None
+
+    create_index.swap_alias("docs_v2", alias="docs", drop_legacy=True)
+    assert {"remove_index": {"index": "docs"}} in indices.indices.actions
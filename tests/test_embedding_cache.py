@@ -0,0 +1,36 @@
+"""The EMBED_CACHE_PATH snapshot is only reloaded by the model that wrote it."""
+import pickle
+import time
+
+from indexing.embeddings import EmbeddingCache
+
+
+def write_snapshot(path, model_key):
+    cache = EmbeddingCache(10, 3600, path=str(path), model_key=model_key)
+    cache.put("what is attention", [0.1, 0.2])
+    cache.save()
+
+
+def test_snapshot_reloads_for_the_same_model(tmp_path):
+    path = tmp_path / "cache.pkl"
+    write_snapshot(path, "all-MiniLM-L6-v2-onnx-int8")
+
+    cache = EmbeddingCache(10, 3600, path=str(path), model_key="all-MiniLM-L6-v2-onnx-int8")
+    assert cache.get("what is attention") == [0.1, 0.2]
+
+
+def test_snapshot_of_another_model_is_dropped(tmp_path):
+    path = tmp_path / "cache.pkl"
+    write_snapshot(path, "all-MiniLM-L6-v2-onnx-int8")
+
+    cache = EmbeddingCache(10, 3600, path=str(path), model_key="all-MiniLM-L6-v2")
+    assert cache.stats()["size"] == 0
+
+
+def test_snapshot_without_header_is_dropped(tmp_path):
+    path = tmp_path / "cache.pkl"
+    with open(path, "wb") as f:
+        pickle.dump({"what is attention": ([0.1, 0.2], time.time())}, f)
+
+    cache = EmbeddingCache(10, 3600, path=str(path), model_key="all-MiniLM-L6-v2")
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,102 @@
+"""EmbeddingScheduler micro-batching, with a recording encode function instead of the model."""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from indexing.embedding_scheduler import EmbeddingScheduler
+
+
+class RecordingEncoder:
+    """Records each batch; the first call can be held until `release()` so later submits pile up."""
+
+    def __init__(self, hold_first: bool = False, error: Exception = None):
+        self.batches = []
+        self.error = error
+        self.started = threading.Event()
+        self._gate = threading.Event()
+        if not hold_first:
+            self._gate.set()
+
+    def release(self):
+        self._gate.set()
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self._gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+def held_scheduler(encoder, **kwargs):
+    """A scheduler whose worker is busy on a first "warm" text, so the next submits queue up."""
+    scheduler = EmbeddingScheduler(encoder, **kwargs)
+    first = scheduler.submit("warm")
+    assert encoder.started.wait(5)
+    return scheduler, first
+
+
+def test_concurrent_submits_share_one_encode():
+    encoder = RecordingEncoder(hold_first=True)
+    scheduler, first = held_scheduler(encoder, max_batch_size=32, max_wait_ms=50)
+
+    futures = [scheduler.submit(f"query {i}") for i in range(5)]
+    encoder.release()
+
+    assert [f.result(5) for f in futures] == [[7.0, 1.0]] * 5
+    assert first.result(5) == [4.0, 1.0]
+    assert encoder.batches == [["warm"], [f"query {i}" for i in range(5)]]
+    assert scheduler.stats()["batches"] == 2
+
+
+def test_batches_are_capped_at_max_batch_size():
+    encoder = RecordingEncoder(hold_first=True)
+    scheduler, _ = held_scheduler(encoder, max_batch_size=3, max_wait_ms=50)
+
+    futures = [scheduler.submit(f"q{i}") for i in range(7)]
+    encoder.release()
+    for future in futures:
+        future.result(5)
+
+    assert [len(batch) for batch in encoder.batches[1:]] == [3, 3, 1]
+
+
+def test_a_lone_query_waits_at_most_max_wait():
+    encoder = RecordingEncoder()
+    scheduler = EmbeddingScheduler(encoder, max_batch_size=32, max_wait_ms=40)
+
+    start = time.monotonic()
+    assert scheduler.embed("alone") == [5.0, 1.0]
+    elapsed = time.monotonic() - start
+
+    # held for the window in case others arrive, then flushed on its own
+    assert 0.03 <= elapsed < 2
+    assert encoder.batches == [["alone"]]
+
+
+def test_encode_error_reaches_every_waiter():
+    encoder = RecordingEncoder(hold_first=True, error=RuntimeError("model crashed"))
+    scheduler, first = held_scheduler(encoder, max_wait_ms=50)
+
+    futures = [scheduler.submit(f"q{i}") for i in range(4)]
+    encoder.release()
+
+    for future in [first] + futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(5)
+
+
+def test_duplicates_encoded_once_and_cancelled_skipped():
+    encoder = RecordingEncoder(hold_first=True)
+    scheduler, _ = held_scheduler(encoder, max_wait_ms=50)
+
+    same = [scheduler.submit("same") for _ in range(3)]
+    gone = scheduler.submit("cancelled")
+    assert gone.cancel()
+    encoder.release()
+
+    assert [f.result(5) for f in same] == [[4.0, 1.0]] * 3
+    assert encoder.batches[1] == ["same"]
@@ -0,0 +1,98 @@
+"""EmbeddingStore: append, compaction and cross-process appends on a temp directory."""
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from indexing.embedding_store import EmbeddingStore
+
+DIMS = 8
+MODEL = "test-model"
+
+
+def vector_for(i: int) -> np.ndarray:
+    # every component encodes i, so a torn or misplaced row is visible
+    return np.full(DIMS, float(i), dtype=np.float32) + np.arange(DIMS, dtype=np.float32) / 100
+
+
+def put(store, ids):
+    store.put_many([f"h{i}" for i in ids], np.stack([vector_for(i) for i in ids]))
+
+
+def assert_resolves(store, ids):
+    found = store.get_many([f"h{i}" for i in ids])
+    assert sorted(found) == sorted(f"h{i}" for i in ids)
+    for i in ids:
+        np.testing.assert_array_equal(found[f"h{i}"], vector_for(i))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(str(tmp_path), MODEL, dims=DIMS)
+
+
+def test_put_get_round_trip(store, tmp_path):
+    put(store, range(5))
+    assert_resolves(store, range(5))
+    assert store.get_many(["unknown"]) == {}
+    assert len(store) == 5
+
+    # another handle (e.g. the next indexer run) sees the same vectors
+    assert_resolves(EmbeddingStore(str(tmp_path), MODEL, dims=DIMS), range(5))
+
+
+def test_a_stored_hash_keeps_its_first_row(store):
+    put(store, [1])
+    store.put_many(["h1"], np.stack([vector_for(99)]))  # a racing writer stored it too
+    assert_resolves(store, [1])
+
+
+def test_compact_renumbers_rows_while_readers_resolve(store, tmp_path):
+    put(store, range(6))
+    store.put_many(["h2"], np.stack([vector_for(2)]))  # unreferenced duplicate row
+
+    reader = EmbeddingStore(str(tmp_path), MODEL, dims=DIMS)
+    held = reader.get_many(["h4"])["h4"]  # a view into generation 0
+
+    kept, dropped = store.compact(live_hashes=[f"h{i}" for i in (1, 3, 4, 5)])
+    assert (kept, dropped) == (4, 3)
+
+    # the old generation's file is gone, but the reader's mapping still works
+    np.testing.assert_array_equal(held, vector_for(4))
+    # and its next lookup re-maps onto the compacted file
+    assert_resolves(reader, [1, 3, 4, 5])
+    assert reader.get_many(["h0", "h2"]) == {}
+
+    rows = os.path.getsize(os.path.join(store.dir, "vectors-1.f32")) // store.row_bytes
+    assert rows == 4
+
+    put(store, [7])  # appends continue on the new generation
+    assert_resolves(reader, [1, 3, 4, 5, 7])
+
+
+def _append_worker(root, start, batches, batch_size):
+    store = EmbeddingStore(root, MODEL, dims=DIMS)
+    for b in range(batches):
+        first = start + b * batch_size
+        put(store, range(first, first + batch_size))
+
+
+def test_two_processes_append_without_torn_rows(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    batches, batch_size = 40, 7
+    workers = [
+        ctx.Process(target=_append_worker, args=(str(tmp_path), start, batches, batch_size))
+        for start in (0, 10_000)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    store = EmbeddingStore(str(tmp_path), MODEL, dims=DIMS)
+    ids = [start + i for start in (0, 10_000) for i in range(batches * batch_size)]
+    assert len(store) == len(ids)
+    assert os.path.getsize(os.path.join(store.dir, "vectors-0.f32")) == len(ids) * store.row_bytes
+    assert_resolves(store, ids)
@@ -0,0 +1,78 @@
+import types
+
+import pytest
+from elasticsearch import ApiError
+
+import backend.search as search
+
+
+class FakeApiError(ApiError):
+    def __init__(self, status: int, body):
+        Exception.__init__(self, str(body))
+        self.message = str(body)
+        self.meta = types.SimpleNamespace(status=status)
+        self.body = body
+
+    @property
+    def status_code(self):
+        return self.meta.status
+
+    def __str__(self):
+        return f"ApiError({self.status_code}, {self.body})"
+
+
+UNKNOWN_RETRIEVER = {"error": {"type": "x_content_parse_exception", "reason": "[1:28] unknown field [retriever]"}}
+UNKNOWN_RRF = {"error": {"type": "parsing_exception", "reason": "Unknown retriever [rrf]"}}
+
+
+class RrfRejectingES:
+    def __init__(self, error: Exception):
+        self.error = error
+        self.msearch_calls = 0
+
+    def search(self, index=None, body=None, **_):
+        raise self.error
+
+    def msearch(self, searches=None, **_):
+        self.msearch_calls += 1
+        return {"took": 1, "responses": [{"took": 1, "hits": {"hits": []}}, {"took": 1, "hits": {"hits": []}}]}
+
+    def mget(self, **_):
+        return {"docs": []}
+
+
+@pytest.fixture
+def es_rrf(monkeypatch):
+    monkeypatch.setattr(search, "_es_rrf_supported", True)
+    monkeypatch.setattr(search, "query_vector_for", lambda query: [0.0] * 4)
+
+    def use(error):
+        es = RrfRejectingES(error)
+        monkeypatch.setattr(search, "get_es", lambda: es)
+        return es
+    return use
+
+
+@pytest.mark.parametrize("body", [UNKNOWN_RETRIEVER, UNKNOWN_RRF])
+def test_unsupported_rrf_latches_msearch_fallback(es_rrf, body):
+    es = es_rrf(FakeApiError(400, body))
+
+    assert search.hybrid_document_search_rrf("q", mode="es_rrf") == []
+    assert es.msearch_calls == 1
+    assert not search._es_rrf_supported
+    assert search._resolve_mode("es_rrf") == "msearch"
+
+
+@pytest.mark.parametrize("status, body", [
+    (429, {"error": {"type": "es_rejected_execution_exception", "reason": "rejected execution of rrf search"}}),
+    (503, {"error": {"type": "unavailable_shards_exception", "reason": "no shards"}}),
+    (400, {"error": {"type": "parsing_exception", "reason": "unknown field [foo]"}}),
+])
+def test_other_errors_fail_only_their_request(es_rrf, status, body):
+    es = es_rrf(FakeApiError(status, body))
+
+    with pytest.raises(ApiError):
+        search.hybrid_document_search_rrf("q", mode="es_rrf")
+
+    assert es.msearch_calls == 0
+    assert search._es_rrf_supported
@@ -0,0 +1,70 @@
+"""
+Request construction for the msearch and es_rrf modes: the bodies each
+mode builds, run through the in-memory stand-in from
+scripts.bench_retrieval, rank like the client mode's Python
+reciprocal_rank_fusion on scripts.check_hybrid_parity's fixture (with a
+bag-of-words embedder in place of the model).
+
+The stand-in implements msearch and the rrf retriever itself, so this
+catches body and plumbing mistakes, not a difference in how a real
+cluster fuses. Run scripts/check_hybrid_parity.py against Elasticsearch
+for that.
+"""
+import hashlib
+import re
+
+import numpy as np
+import pytest
+
+import backend.search as search
+import scripts.bench_retrieval as bench
+from scripts.check_hybrid_parity import FIXTURE_CHUNKS, FIXTURE_QUERIES, normalise, reference_ranking
+
+DIMS = 64
+
+
+def fake_embed(text: str) -> np.ndarray:
+    vector = np.zeros(DIMS, dtype=np.float32)
+    for token in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.md5(token.encode()).hexdigest(), 16) % DIMS] += 1.0
+    return vector
+
+
+@pytest.fixture(autouse=True)
+def in_memory_index(monkeypatch):
+    monkeypatch.setattr(bench, "embed_texts", lambda texts: np.stack([fake_embed(t) for t in texts]))
+    monkeypatch.setattr(search, "embed_text", lambda text: fake_embed(text).tolist())
+    monkeypatch.setattr(search, "query_vector_for", lambda text: fake_embed(text).tolist())
+    monkeypatch.setattr(search, "_es_rrf_supported", True)
+    monkeypatch.setattr(search, "TWO_PHASE_FETCH", True)
+
+    stand_in = bench.InMemoryES(bench.load_corpus(None))
+    monkeypatch.setattr(search, "get_es", lambda: stand_in)
+    return stand_in
+
+
+@pytest.mark.parametrize("mode", search.HYBRID_MODES)
+@pytest.mark.parametrize("query, document_type", FIXTURE_QUERIES)
+def test_mode_bodies_rank_like_python_rrf(mode, query, document_type):
+    expected = reference_ranking(query, document_type)
+    assert expected, "fixture query should match something"
+
+    got = normalise(search.hybrid_document_search_rrf(
+        query, top_n=len(FIXTURE_CHUNKS), document_type=document_type, min_rrf_score=0.0, mode=mode
+    ))
+
+    assert got == expected
+    assert search._es_rrf_supported
+
+
+@pytest.mark.parametrize("mode", search.HYBRID_MODES)
+def test_inline_sources_match_two_phase_fetch(monkeypatch, mode):
+    query, document_type = FIXTURE_QUERIES[0]
+    expected = reference_ranking(query, document_type)
+
+    monkeypatch.setattr(search, "TWO_PHASE_FETCH", False)
+    got = normalise(search.hybrid_document_search_rrf(
+        query, top_n=len(FIXTURE_CHUNKS), document_type=document_type, min_rrf_score=0.0, mode=mode
+    ))
+
+    assert got == expected
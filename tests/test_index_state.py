@@ -0,0 +1,190 @@
+"""IndexCheckpoint: per-index state, and commits only once bulk actions and chunk uploads all succeeded."""
+from concurrent.futures import Future
+
+import pytest
+
+from indexing import index_state
+from indexing.index_state import IndexCheckpoint, ShardQueue, META_ID, STATE_COLLECTION, drop_index_state, shard_bounds
+from utils.blob_store import ChunkUploader, LocalBlobStore, BlobManifest
+
+
+@pytest.fixture
+def checkpoint(mongo_db):
+    return IndexCheckpoint(mongo_db, "uuid-1")
+
+
+def index_ok(chunk_id):
+    return {"index": {"_id": chunk_id, "status": 201}}
+
+
+@pytest.mark.parametrize("upload_ok", [True, False])
+def test_upload_is_one_more_action(checkpoint, upload_ok):
+    checkpoint.begin("d1")
+    checkpoint.add_action("d1")  # the chunk's bulk action
+    checkpoint.add_action("d1")  # its upload
+    checkpoint.seal("d1", {"doc_hash": "h"})
+
+    checkpoint.ack(index_ok("d1_c0"), True)
+    assert checkpoint.committed == 0 and checkpoint.previous("d1") is None
+
+    # uploads may finish after the bulk ack
+    checkpoint.upload_done("d1", upload_ok)
+    assert checkpoint.committed == int(upload_ok)
+    assert checkpoint.failed_docs == int(not upload_ok)
+    assert (checkpoint.previous("d1") is not None) == upload_ok
+
+
+def test_chunk_url_known_before_upload(tmp_path):
+    store = LocalBlobStore(root=str(tmp_path / "blobs"), base_url="http://blobs.test")
+    uploader = ChunkUploader(store=store, manifest=BlobManifest(str(tmp_path / "manifest.sqlite")))
+
+    url = uploader.url_for("chunks/abc.html")
+    upload: Future = uploader.submit("chunks/abc.html", lambda: b"<p>x</p>")
+    assert upload.result() == url == "http://blobs.test/chunks/abc.html"
+    uploader.close()
+
+
+def commit(checkpoint, doc_id, record):
+    checkpoint.expect(doc_id, 0, record)
+
+
+def test_full_reindex_leaves_the_live_state_alone(mongo_db):
+    live = IndexCheckpoint(mongo_db, "live-uuid")
+    commit(live, "d1", {"doc_hash": "h1"})
+
+    # a blue/green reindex into a new index, aborted part-way
+    staged = IndexCheckpoint(mongo_db, "new-uuid", full=True)
+    commit(staged, "d2", {"doc_hash": "h2"})
+
+    live = IndexCheckpoint(mongo_db, "live-uuid")
+    assert live.previous("d1")["doc_hash"] == "h1"
+    assert live.previous("d2") is None
+
+    # after the swap, incremental runs resolve the alias to the new index
+    assert IndexCheckpoint(mongo_db, "new-uuid").previous("d2")["doc_hash"] == "h2"
+
+    drop_index_state(mongo_db, "live-uuid")
+    assert IndexCheckpoint(mongo_db, "live-uuid").previous("d1") is None
+
+
+def test_legacy_shared_state_is_adopted_by_its_index(mongo_db):
+    legacy = mongo_db[STATE_COLLECTION]
+    legacy.insert_one({"_id": META_ID, "index_uuid": "live-uuid"})
+    legacy.insert_one({"_id": "d1", "doc_hash": "h1"})
+
+    assert IndexCheckpoint(mongo_db, "other-uuid").previous("d1") is None
+    assert IndexCheckpoint(mongo_db, "live-uuid").previous("d1")["doc_hash"] == "h1"
+    assert STATE_COLLECTION not in mongo_db
+
+
+def test_chunk_hash_covers_the_page_range():
+    doc = {"title": "Transformers", "document_type": "paper"}
+    same = index_state.chunk_hash(doc, "attention", 2, 3)
+
+    assert index_state.chunk_hash(doc, "attention", 2, 3) == same
+    # an edit earlier in the document moved the same text to other pages
+    assert index_state.chunk_hash(doc, "attention", 3, 4) != same
+    assert index_state.chunk_hash(doc, "attention", 2, 4) != same
+    assert index_state.chunk_hash(dict(doc, title="Attention"), "attention", 2, 3) != same
+
+# =========================
+# ShardQueue leasing
+# =========================
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1_000.0}
+    monkeypatch.setattr(index_state.time, "time", lambda: now["t"])
+    return now
+
+
+def make_queue(mongo_db, num_shards=2, **kwargs):
+    queue = ShardQueue(mongo_db, "run-1", lease_seconds=30, **kwargs)
+    assert queue.create(num_shards, "docs")
+    return queue
+
+
+def test_shards_cover_every_doc_id():
+    bounds = shard_bounds(4)
+    for doc_id in ("0000", "3fff", "4000", "ffff-x", ""):
+        hits = [b for b in bounds if doc_id >= b[0] and (b[1] is None or doc_id < b[1])]
+        assert len(hits) == 1
+
+
+def test_claim_hands_out_each_shard_once(mongo_db, clock):
+    queue = make_queue(mongo_db)
+    a, b = queue.claim("w1"), queue.claim("w2")
+    assert (a["shard"], b["shard"]) == (0, 1)
+    assert a["owner"] == "w1" and a["attempts"] == 1
+    assert queue.claim("w3") is None
+
+    # joining the run again does not reset claimed shards
+    assert not ShardQueue(mongo_db, "run-1").create(2, "docs")
+    assert queue.claim("w3") is None
+
+
+def test_expired_lease_is_reclaimed(mongo_db, clock):
+    queue = make_queue(mongo_db, num_shards=1)
+    shard = queue.claim("dead-worker")
+
+    clock["t"] += 29
+    assert queue.claim("w2") is None
+    clock["t"] += 2  # lease ran out without a renewal
+
+    reclaimed = queue.claim("w2")
+    assert reclaimed["_id"] == shard["_id"] and reclaimed["owner"] == "w2" and reclaimed["attempts"] == 2
+
+    # the old owner has lost it: renew fails, complete is a no-op
+    assert not queue.renew(shard["_id"], "dead-worker")
+    queue.complete(shard["_id"], "dead-worker", {"indexed": 1})
+    assert queue.all_shards()[0]["status"] == "running"
+
+    queue.complete(shard["_id"], "w2", {"indexed": 3})
+    assert queue.all_shards()[0]["status"] == "done"
+    assert queue.totals() == {"indexed": 3}
+
+
+def test_renew_keeps_the_lease(mongo_db, clock):
+    queue = make_queue(mongo_db, num_shards=1)
+    shard = queue.claim("w1")
+
+    clock["t"] += 25
+    assert queue.renew(shard["_id"], "w1")
+    clock["t"] += 25
+    assert queue.claim("w2") is None
+    assert queue.state()["running"] == 1
+
+
+def test_failed_shards_stop_at_max_attempts(mongo_db, clock):
+    queue = make_queue(mongo_db, num_shards=1, max_attempts=2)
+
+    for _ in range(2):
+        shard = queue.claim("w1")
+        queue.fail(shard["_id"], "w1", "boom")
+
+    assert queue.claim("w1") is None
+    assert queue.state() == {"done": 0, "claimable": 0, "running": 0, "exhausted": 1}
+
+    assert queue.all_shards()[0]["error"] == "boom"
+
+
+def test_retry_exhausted_gives_a_fresh_set(mongo_db, clock):
+    queue = make_queue(mongo_db, num_shards=1, max_attempts=1)
+    shard = queue.claim("w1")
+    clock["t"] += 60  # worker died on its only attempt
+
+    assert queue.claim("w2") is None
+    assert queue.state()["exhausted"] == 1
+
+    assert queue.retry_exhausted() == 1
+    again = queue.claim("w2")
+    assert again["_id"] == shard["_id"] and again["attempts"] == 1
+
+    queue.complete(again["_id"], "w2", {})
+    assert queue.retry_exhausted() == 0  # done shards are left alone
+
+
+def test_finalize_is_claimed_once(mongo_db, clock):
+    queue = make_queue(mongo_db, num_shards=1)
+    assert queue.claim_finalize()
+    assert not queue.claim_finalize()
@@ -0,0 +1,52 @@
+"""Dedup of PDFs by file hash, including documents ingested before file_hash existed."""
+import pytest
+
+from scripts import ingest_pdfs_to_mongo as ingest
+from utils.hashing import file_hash
+
+
+@pytest.fixture
+def documents(mongo_db, monkeypatch):
+    monkeypatch.setattr(ingest, "documents", mongo_db.documents)
+    monkeypatch.setattr(ingest, "pages", mongo_db.pages)
+    ingest.ensure_indexes()
+    return mongo_db.documents
+
+
+def write_pdf(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_legacy_documents_get_their_file_hash(tmp_path, documents):
+    a = write_pdf(tmp_path, "a.pdf", b"%PDF a")
+    b = write_pdf(tmp_path, "b.pdf", b"%PDF b")
+    documents.insert_one({"doc_id": "legacy-a", "file_name": "a.pdf", "raw_text": "..."})
+    documents.insert_one({"doc_id": "legacy-gone", "file_name": "gone.pdf", "raw_text": "..."})
+
+    assert ingest.backfill_file_hashes([a, b]) == 1
+    assert documents.find_one({"doc_id": "legacy-a"})["file_hash"] == file_hash(a)
+    assert "file_hash" not in documents.find_one({"doc_id": "legacy-gone"})
+
+    # the rerun after upgrading only sees b.pdf as new
+    tasks, skipped = ingest.unique_new_files([a, b], set(documents.distinct("file_hash")), workers=2)
+    assert tasks == [(b, file_hash(b))] and skipped == 1
+
+
+def test_second_legacy_copy_is_left_alone(tmp_path, documents):
+    a = write_pdf(tmp_path, "a.pdf", b"%PDF a")
+    documents.insert_one({"doc_id": "legacy-1", "file_name": "a.pdf"})
+    documents.insert_one({"doc_id": "legacy-2", "file_name": "a.pdf"})
+
+    assert ingest.backfill_file_hashes([a]) == 1
+    assert len(documents.distinct("file_hash")) == 1
+
+
+def test_identical_files_are_one_task(tmp_path):
+    a = write_pdf(tmp_path, "a.pdf", b"same")
+    copy = write_pdf(tmp_path, "copy.pdf", b"same")
+    other = write_pdf(tmp_path, "other.pdf", b"other")
+
+    tasks, skipped = ingest.unique_new_files([a, copy, other], set(), workers=2)
+    assert [path for path, _ in tasks] == [a, other] and skipped == 1
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from elasticsearch import ConnectionTimeout
+
+import backend.search as search
+from backend.latency_budget import CircuitBreaker, Deadline
+
+
+class FetchTimesOutES:
+    """Retrieval works, the phase-two mget times out."""
+
+    async def search(self, index=None, body=None, **_):
+        return {"took": 1, "hits": {"hits": [{"_id": "d_c0", "_score": 1.0}, {"_id": "d_c1", "_score": 0.5}]}}
+
+    async def mget(self, **_):
+        raise ConnectionTimeout("mget timed out")
+
+
+@pytest.fixture
+def fresh_breakers(monkeypatch):
+    for name in ("bm25", "knn", "fetch"):
+        monkeypatch.setitem(search.breakers, name, CircuitBreaker(name, failures=2, reset_seconds=60))
+
+
+@pytest.fixture
+def fetch_times_out(monkeypatch, fresh_breakers):
+    async def query_vector(query):
+        return [0.0] * 4
+
+    monkeypatch.setattr(search, "get_async_es", lambda: FetchTimesOutES())
+    monkeypatch.setattr(search, "async_query_vector_for", query_vector)
+    monkeypatch.setattr(search, "TWO_PHASE_FETCH", True)
+
+
+def test_fetch_failure_is_unavailable_not_500(fetch_times_out):
+    with pytest.raises(search.SearchUnavailable):
+        asyncio.run(search.async_budgeted_hybrid_search("q", deadline=Deadline(500)))
+
+    assert search.breakers["fetch"].stats()["failure"] == 1
+
+
+def test_fetch_breaker_opens_and_skips_mget(fetch_times_out):
+    for _ in range(2):
+        with pytest.raises(search.SearchUnavailable):
+            asyncio.run(search.async_budgeted_hybrid_search("q", deadline=Deadline(500)))
+
+    assert search.breakers["fetch"].state() == "open"
+    with pytest.raises(search.SearchUnavailable, match="breaker open"):
+        asyncio.run(search.async_budgeted_hybrid_search("q", deadline=Deadline(500)))
+
+
+def test_breaker_half_open_probe():
+    breaker = CircuitBreaker("leg", failures=1, reset_seconds=0)
+    breaker.record_failure("boom")
+
+    assert breaker.allow()  # the one probe
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state() == "closed"
@@ -0,0 +1,84 @@
+r"""
+clean_block folds clean_text's regex passes into three precompiled ones
+and must give exactly what those passes give, line by line. (Run over
+a whole block, the old figure/table pattern's trailing [\s:\-]+ could
+swallow a newline and glue two lines together; clean_block never joins
+lines before deciding which ones are garbage.)
+"""
+import random
+import re
+
+import pytest
+
+from indexing.preprocess import (
+    clean_block,
+    clean_document,
+    clean_whitespace,
+    iter_clean_pages,
+    remove_headers_footers,
+    remove_tables_figures,
+    remove_urls,
+)
+
+WORDS = [
+    "the", "model", "attention", "Transformer", "layer", "x", "y2", "a_b", "42", "3.14", "(1)", "--", "...",
+    "Page", "page 3", "Page 7 of 12", "© 2021 ACM", "All rights reserved", "Proceedings of NeurIPS 2019",
+    "printed on paper", "Confidential draft", "Figure 2:", "fig. 3 -", "Table 1", "figures", "tablet",
+    "http://example.com/a?b=1", "https://arxiv.org/abs/1706.03762", "www.site.org", "email@site.org",
+    "#", "*", "**", "§", "·", "|", "_", "__", "12", "2019", "ok", "é", "naïve", "\t",
+]
+
+
+def reference_clean(text: str) -> str:
+    """clean_text's passes on each line, minus the references cut (tested separately)."""
+    good_lines = []
+    for line in text.splitlines():
+        line = remove_tables_figures(remove_urls(remove_headers_footers(line)))
+        line_strip = line.strip()
+        if len(line_strip) < 3:
+            continue
+        if re.fullmatch(r'[\W_]+', line_strip):
+            continue
+        if re.fullmatch(r'\d+', line_strip):
+            continue
+        good_lines.append(line_strip)
+
+    return clean_whitespace(" ".join(good_lines))
+
+
+def random_page(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.randint(1, 12)):
+        words = rng.choices(WORDS, k=rng.randint(0, 8))
+        lines.append(rng.choice([" ", "  ", "\t"]).join(words))
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_clean_block_matches_clean_text_passes(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        page = random_page(rng)
+        assert clean_block(page) == reference_clean(page), page
+
+
+@pytest.mark.parametrize("line", ["* * *", "- - -", "  ", "ab", "__", "12345", ". , ;"])
+def test_garbage_lines_dropped(line):
+    assert clean_block(f"keep this line\n{line}\nand this one") == "keep this line and this one"
+
+
+def test_references_cut_only_in_tail():
+    pages = [(i, f"body text of page {i}") for i in range(1, 11)]
+    pages[2] = (3, "early section\nReferences\nstill the body")
+    pages[8] = (9, "conclusion\n7 References\n[1] Vaswani et al.")
+
+    cleaned = list(iter_clean_pages(pages, num_pages=10))
+
+    assert [n for n, _ in cleaned] == list(range(1, 10))
+    assert "still the body" in cleaned[2][1]
+    assert cleaned[-1] == (9, "conclusion")
+
+
+def test_clean_document_single_text():
+    text = "intro line\n" * 20 + "Bibliography\n[1] someone"
+    assert clean_document(text) == " ".join(["intro line"] * 20)
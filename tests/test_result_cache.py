@@ -0,0 +1,103 @@
+"""The /search result cache in front of async_hybrid_document_search_rrf."""
+import asyncio
+
+import pytest
+from elasticsearch import ConnectionTimeout
+
+import backend.search as search
+from backend.result_cache import InProcessResultBackend, SearchResultCache
+
+OK_LEGS = {"bm25": "ok", "knn": "ok"}
+
+
+class FakeSearch:
+    """Stands in for the uncached search; counts calls, returns what it is told."""
+
+    def __init__(self):
+        self.calls = 0
+        self.legs = dict(OK_LEGS)
+
+    async def __call__(self, query, **kwargs):
+        self.calls += 1
+        return [{"chunk_id": f"{query}-{self.calls}"}], dict(self.legs)
+
+
+@pytest.fixture
+def backend_search(monkeypatch):
+    fake = FakeSearch()
+    monkeypatch.setattr(search, "async_hybrid_document_search_rrf", fake)
+    monkeypatch.setattr(search, "result_cache", SearchResultCache(InProcessResultBackend(max_size=100)))
+    return fake
+
+
+@pytest.fixture
+def generation(monkeypatch):
+    current = {"value": "1"}
+
+    async def read():
+        if isinstance(current["value"], Exception):
+            raise current["value"]
+        return current["value"]
+
+    monkeypatch.setattr(search.index_meta, "generation", read)
+    return current
+
+
+def cached_search(query="q"):
+    return asyncio.run(search.cached_hybrid_document_search_rrf(query))
+
+
+def test_generation_failure_skips_the_cache(backend_search, generation):
+    generation["value"] = ConnectionTimeout("get_mapping timed out")
+
+    results, status, legs = cached_search()
+    assert status == "bypass" and legs == OK_LEGS
+    assert results == [{"chunk_id": "q-1"}]
+
+
+def test_second_search_is_a_hit(backend_search, generation):
+    first, status, _ = cached_search()
+    assert status == "miss"
+
+    second, status, legs = cached_search()
+    assert status == "hit" and second == first and legs == OK_LEGS
+    assert backend_search.calls == 1
+
+
+def test_generation_bump_misses(backend_search, generation):
+    cached_search()
+    generation["value"] = "2"  # a reindex swapped the alias
+
+    results, status, _ = cached_search()
+    assert status == "miss" and results == [{"chunk_id": "q-2"}]
+    assert backend_search.calls == 2
+
+
+def test_degraded_results_are_not_stored(backend_search, generation):
+    backend_search.legs = {"bm25": "ok", "knn": "timeout"}
+    _, status, legs = cached_search()
+    assert status == "miss" and legs["knn"] == "timeout"
+
+    backend_search.legs = dict(OK_LEGS)
+    results, status, _ = cached_search()
+    assert status == "miss" and results == [{"chunk_id": "q-2"}]
+
+
+def test_key_depends_on_the_request(backend_search, generation):
+    cached_search("q")
+    _, status, _ = cached_search("Q  ")  # normalized to the same query
+    assert status == "hit"
+
+    _, status, _ = asyncio.run(search.cached_hybrid_document_search_rrf("q", top_n=3))
+    assert status == "miss"
+
+
+def test_backend_expires_and_evicts():
+    backend = InProcessResultBackend(max_size=2)
+    asyncio.run(backend.set("expired", [1], ttl=-1))
+    assert asyncio.run(backend.get("expired")) is None
+
+    for key in ("a", "b", "c"):
+        asyncio.run(backend.set(key, [key], ttl=60))
+    assert asyncio.run(backend.get("a")) is None  # least recently used, over max_size
+    assert asyncio.run(backend.get("c")) == ["c"]
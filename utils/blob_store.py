@@ -0,0 +1,219 @@
+"""
+Where full chunk texts are published (chunk_url), behind one interface.
+
+    cloudinary -> Cloudinary raw uploads (default)
+    local      -> files under LOCAL_BLOB_DIR, for tests and local runs
+
+ChunkUploader runs uploads on a bounded thread pool with retries, so
+the indexer does not wait one network round-trip per chunk. Keys are
+content-addressed (text hash), and a small SQLite manifest remembers
+what has been stored, so unchanged texts are never uploaded twice.
+"""
+import os
+import time
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Dict, Any, Callable
+
+# =========================
+# Config
+# =========================
+
+BLOB_STORE = os.getenv("BLOB_STORE", "cloudinary")
+LOCAL_BLOB_DIR = os.getenv("LOCAL_BLOB_DIR", "data/blobs")
+LOCAL_BLOB_BASE_URL = os.getenv("LOCAL_BLOB_BASE_URL")  # unset -> file:// URLs
+BLOB_MANIFEST_DIR = os.getenv("BLOB_MANIFEST_DIR", "data/blob_manifest")
+
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "16"))
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "4"))
+UPLOAD_BACKOFF = float(os.getenv("UPLOAD_BACKOFF", "0.5"))  # seconds, doubled per retry
+
+
+# =========================
+# Stores
+# =========================
+
+class BlobStore:
+    """
+    put() stores bytes under a key and returns a public URL for it;
+    url_for() is that URL, known before the upload has happened.
+    """
+
+    name = "base"
+
+    def url_for(self, key: str) -> str:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes, content_type: str = "text/html") -> str:
+        raise NotImplementedError
+
+
+class CloudinaryBlobStore(BlobStore):
+    name = "cloudinary"
+
+    def __init__(self):
+        import utils.cloudinary_upload  # noqa: F401  (applies cloudinary.config)
+        import cloudinary.uploader
+        import cloudinary.utils
+
+        self.uploader = cloudinary.uploader
+        self.utils = cloudinary.utils
+
+    def url_for(self, key: str) -> str:
+        # versionless delivery URL; keys are content-addressed, so the
+        # blob behind one never changes
+        return self.utils.cloudinary_url(key, resource_type="raw", secure=True)[0]
+
+    def put(self, key: str, data: bytes, content_type: str = "text/html") -> str:
+        from io import BytesIO
+
+        result = self.uploader.upload(
+            BytesIO(data),
+            resource_type="raw",
+            public_id=key,
+            overwrite=True
+        )
+        return result["secure_url"]
+
+
+class LocalBlobStore(BlobStore):
+    """Files under `root`; URLs are base_url/key, or file:// paths without one."""
+
+    name = "local"
+
+    def __init__(self, root: str = LOCAL_BLOB_DIR, base_url: Optional[str] = LOCAL_BLOB_BASE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def path_for(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Blob key escapes the store: {key!r}")
+        return path
+
+    def url_for(self, key: str) -> str:
+        if self.base_url:
+            return f"{self.base_url}/{key}"
+        return f"file://{os.path.abspath(self.path_for(key))}"
+
+    def put(self, key: str, data: bytes, content_type: str = "text/html") -> str:
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write + rename so a reader never sees a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self.url_for(key)
+
+
+def make_blob_store(name: str = BLOB_STORE) -> BlobStore:
+    if name == "cloudinary":
+        return CloudinaryBlobStore()
+    if name == "local":
+        return LocalBlobStore()
+    raise ValueError(f"Unknown BLOB_STORE '{name}', expected 'cloudinary' or 'local'")
+
+
+# =========================
+# Manifest
+# =========================
+
+class BlobManifest:
+    """key -> url of blobs already stored, shared by indexer processes on this host."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, url TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT url FROM blobs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, url: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO blobs (key, url) VALUES (?, ?)", (key, url))
+            self._conn.commit()
+
+
+# =========================
+# Uploader
+# =========================
+
+class ChunkUploader:
+    """
+    Bounded-concurrency uploads with retry and exponential backoff.
+
+    submit() returns a Future resolving to the URL, or to None when every
+    attempt failed; failures are counted, never raised, so one bad upload
+    does not stop a reindex. Keys already in the manifest resolve
+    immediately without touching the network. submit() blocks while
+    `concurrency` uploads are in flight.
+    """
+
+    def __init__(
+        self,
+        store: Optional[BlobStore] = None,
+        concurrency: int = UPLOAD_CONCURRENCY,
+        retries: int = UPLOAD_RETRIES,
+        backoff: float = UPLOAD_BACKOFF,
+        manifest: Optional[BlobManifest] = None
+    ):
+        self.store = store or make_blob_store()
+        self.retries = retries
+        self.backoff = backoff
+        self.manifest = manifest or BlobManifest(os.path.join(BLOB_MANIFEST_DIR, f"{self.store.name}.sqlite"))
+
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="uploader")
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Any] = {"uploaded": 0, "skipped": 0, "retried": 0, "failed": 0}
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _upload(self, key: str, make_data: Callable[[], bytes], content_type: str) -> Optional[str]:
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    url = self.store.put(key, make_data(), content_type)
+                    self.manifest.put(key, url)
+                    self._count("uploaded")
+                    return url
+                except Exception as e:
+                    if attempt == self.retries:
+                        print(f"[UPLOAD] giving up on {key} after {attempt + 1} attempts: {e!r}")
+                        self._count("failed")
+                        return None
+
+                    self._count("retried")
+                    # full jitter, so throttled workers do not retry in lockstep
+                    time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+        finally:
+            self._slots.release()
+
+    def url_for(self, key: str) -> str:
+        return self.store.url_for(key)
+
+    def submit(self, key: str, make_data: Callable[[], bytes], content_type: str = "text/html") -> "Future[Optional[str]]":
+        url = self.manifest.get(key)
+        if url is not None:
+            self._count("skipped")
+            done: Future = Future()
+            done.set_result(url)
+            return done
+
+        self._slots.acquire()
+        return self._pool.submit(self._upload, key, make_data, content_type)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,37 @@
+"""The HTML page a chunk_url serves; no storage or SDK imports, so the API can render it too."""
+
+
+def chunk_to_html(chunk_text: str) -> str:
+    escaped = (
+        chunk_text
+        .replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+    )
+
+    html = f"""
+    <html>
+      <head>
+        <meta charset="utf-8">
+        <title>Chunk</title>
+        <style>
+          body {{
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            padding: 20px;
+            background: #111;
+            color: #eee;
+          }}
+          pre {{
+            white-space: pre-wrap;
+            word-wrap: break-word;
+          }}
+        </style>
+      </head>
+      <body>
+        <h2>Document Chunk</h2>
+        <pre>{escaped}</pre>
+      </body>
+    </html>
+    """
+    return html
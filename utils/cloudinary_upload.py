@@ -3,6 +3,7 @@ import cloudinary
 import cloudinary.uploader
 from io import BytesIO
 from dotenv import load_dotenv
+from utils.chunk_html import chunk_to_html
 load_dotenv()
 
 cloudinary.config(
@@ -13,44 +14,6 @@ cloudinary.config(
 )
 
 
-def chunk_to_html(chunk_text: str) -> str:
-    escaped = (
-        chunk_text
-        .replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-    )
-
-    html = f"""
-    <html>
-      <head>
-        <meta charset="utf-8">
-        <title>Chunk</title>
-        <style>
-          body {{
-            font-family: Arial, sans-serif;
-            line-height: 1.6;
-            padding: 20px;
-            background: #111;
-            color: #eee;
-          }}
-          pre {{
-            white-space: pre-wrap;
-            word-wrap: break-word;
-          }}
-        </style>
-      </head>
-      <body>
-        <h2>Document Chunk</h2>
-        <pre>{escaped}</pre>
-      </body>
-    </html>
-    """
-    return html
-
-
-
-
 def upload_chunk_to_cloudinary(chunk_id: str, chunk_text: str) -> str:
     """
     Upload chunk text as a .txt file to Cloudinary.
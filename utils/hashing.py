@@ -0,0 +1,20 @@
+import hashlib
+from typing import Optional
+
+
+def content_hash(*parts: Optional[str]) -> str:
+    """Stable sha256 hex digest over one or more text parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update((part or "").encode("utf-8"))
+        h.update(b"\x00")  # separator so ("ab", "c") != ("a", "bc")
+    return h.hexdigest()
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """sha256 of a file's bytes, read in blocks so large files are not loaded at once."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from typing import Iterable, Iterator, TypeVar, Optional
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def prefetch(source: Iterable[T], maxsize: int = 8, name: Optional[str] = None) -> Iterator[T]:
+    """
+    Run `source` in a background thread and yield its items through a
+    bounded queue. A full queue blocks the producer, so a slow downstream
+    stage applies backpressure and caps how much is held in memory.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Give up if the consumer went away, instead of blocking forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in source:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_StageError(e))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name=name or "pipeline-stage", daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+class ProgressReporter:
+    """Prints docs/sec and chunks/sec every `interval` seconds and at the end."""
+
+    def __init__(self, total_docs: Optional[int] = None, interval: float = 10.0, label: Optional[str] = None):
+        self.total_docs = total_docs
+        self.label = label
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+        self.docs = 0
+        self.skipped_docs = 0
+        self.chunks = 0
+        self.indexed = 0
+        self.failed = 0
+        self.committed_docs = 0
+        self.failed_docs = 0
+
+    def maybe_report(self):
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        total = f"/{self.total_docs}" if self.total_docs is not None else ""
+        label = "DONE" if final else "PROGRESS"
+        if self.label:
+            label = f"{label} {self.label}"
+        print(
+            f"[{label}] docs {self.docs}{total} ({self.docs / elapsed:.2f}/s, {self.skipped_docs} unchanged) | "
+            f"chunks {self.chunks} ({self.chunks / elapsed:.1f}/s) | "
+            f"indexed {self.indexed} ({self.indexed / elapsed:.1f}/s) | "
+            f"failed {self.failed} | {elapsed:.1f}s"
+        )